@@ -0,0 +1,89 @@
+"""
+Chat archive benchmark: cost of ChatArchive.add on the bot's event loop, messages per second written by the
+writer thread (decoding included), and the latency of a "what did this user say in the last hour" query.
+
+Usage: python benchmarks/bench_archive.py [--messages N] [--json]
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from datetime import timedelta
+
+from common import latency_summary
+
+from kickbot.kick_archive import ChatArchive
+
+
+def chat_payloads(count: int, rng: random.Random) -> list[str]:
+    now = time.time()
+    return [
+        json.dumps({
+            'id': f'{i:08x}-0000-0000-0000-000000000000',
+            'chatroom_id': 668,
+            'content': f'message number {i} ' + 'lorem ipsum ' * rng.randint(0, 8),
+            'type': 'message',
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S+00:00', time.gmtime(now - (count - i) / 100)),
+            'sender': {'id': 1000 + i % 2000, 'username': f'viewer_{i % 2000}', 'slug': f'viewer-{i % 2000}',
+                       'identity': {'color': '#FF0000', 'badges': []}},
+        })
+        for i in range(count)
+    ]
+
+
+def run(messages: int = 200_000, queries: int = 200) -> dict:
+    rng = random.Random(1)
+    payloads = chat_payloads(messages, rng)
+    with tempfile.TemporaryDirectory() as directory:
+        archive = ChatArchive(os.path.join(directory, 'chat.db'), queue_size=messages + 1)
+        clock = time.perf_counter_ns
+        add_latencies = []
+        start = time.perf_counter()
+        for payload in payloads:
+            before = clock()
+            archive.add('streamer', payload)
+            add_latencies.append(clock() - before)
+        archive.flush()
+        write_throughput = messages / (time.perf_counter() - start)
+
+        query_latencies = []
+        for i in range(queries):
+            before = clock()
+            archive.messages(sender=f'viewer_{rng.randrange(2000)}', streamer='streamer',
+                             since=timedelta(hours=1), limit=100)
+            query_latencies.append(clock() - before)
+        stats = archive.stats()
+        archive.close()
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+    return {
+        'messages': messages,
+        'write_msg_per_s': round(write_throughput),
+        'dropped': stats['dropped'],
+        'batches': stats['batches'],
+        'add': latency_summary(add_latencies),
+        'user_query': latency_summary(query_latencies),
+        'bytes_per_message': round(size / messages, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=200_000)
+    parser.add_argument('--json', action='store_true', help="Print the results as json")
+    args = parser.parse_args()
+    result = run(args.messages)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"write:      {result['write_msg_per_s']:>10,} msg/s | {result['batches']:,} batches | "
+          f"{result['dropped']:,} dropped")
+    print(f"add:        {result['add']}")
+    print(f"user query: {result['user_query']}")
+    print(f"disk:       {result['bytes_per_message']} bytes per message")
+
+
+if __name__ == '__main__':
+    main()
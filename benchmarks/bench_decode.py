@@ -0,0 +1,111 @@
+"""
+Inbound message decode benchmark: websocket frame -> KickMessage -> sender / args, as done for every chat message.
+
+Usage: python benchmarks/bench_decode.py [--messages N] [--json]
+"""
+import argparse
+import json
+import time
+
+from common import latency_summary, memory_per_item
+
+from kickbot import kick_json
+from kickbot.kick_helper import message_from_data
+
+
+def make_frame(i: int) -> str:
+    data = {
+        'id': f'6b1e4b5c-0c49-4d7b-9a8e-{i:012d}',
+        'chatroom_id': 668,
+        'content': f'!command argument number {i} with a few more words [emote:37226:KEKW]',
+        'type': 'message',
+        'created_at': '2023-09-20T17:39:54+00:00',
+        'sender': {
+            'id': 1000 + i,
+            'username': f'viewer_{i}',
+            'slug': f'viewer-{i}',
+            'identity': {'color': '#75FD46', 'badges': [{'type': 'subscriber', 'text': 'Subscriber', 'count': 3}]},
+        },
+    }
+    return json.dumps({'event': 'App\\Events\\ChatMessageEvent', 'data': json.dumps(data), 'channel': 'chatrooms.668.v2'})
+
+
+def bench_decode(frames: list[str]) -> float:
+    """
+    :return: Messages decoded per second
+    """
+    start = time.perf_counter()
+    for frame in frames:
+        message = message_from_data(kick_json.loads(frame))
+        message.sender.username
+        message.args[0]
+    return len(frames) / (time.perf_counter() - start)
+
+
+def bench_envelope_only(frames: list[str]) -> float:
+    """
+    Frames of events with no handler: only the envelope is decoded.
+
+    :return: Frames per second
+    """
+    start = time.perf_counter()
+    for frame in frames:
+        kick_json.loads(frame).get('event')
+    return len(frames) / (time.perf_counter() - start)
+
+
+def decode_latencies(frames: list[str]) -> list[int]:
+    """
+    :return: Nanoseconds to decode each frame
+    """
+    latencies = []
+    clock = time.perf_counter_ns
+    for frame in frames:
+        start = clock()
+        message = message_from_data(kick_json.loads(frame))
+        message.sender.username
+        message.args[0]
+        latencies.append(clock() - start)
+    return latencies
+
+
+def decode_all(frames: list[str]) -> list:
+    messages = []
+    for frame in frames:
+        message = message_from_data(kick_json.loads(frame))
+        message.sender.username
+        message.args[0]
+        messages.append(message)
+    return messages
+
+
+def run(messages: int = 200_000) -> dict:
+    frames = [make_frame(i) for i in range(messages)]
+    return {
+        'json_backend': kick_json.BACKEND,
+        'messages': messages,
+        'decode_msg_per_s': round(bench_decode(frames)),
+        'envelope_only_msg_per_s': round(bench_envelope_only(frames)),
+        'decode_latency': latency_summary(decode_latencies(frames)),
+        'bytes_per_message': memory_per_item(lambda: decode_all(frames[:20_000])),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=200_000)
+    parser.add_argument('--json', action='store_true', help="Print the results as json")
+    args = parser.parse_args()
+    result = run(args.messages)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"json backend: {result['json_backend']}")
+    print(f"decode + KickMessage:  {result['decode_msg_per_s']:>12,} msg/s (one core)")
+    print(f"envelope only:         {result['envelope_only_msg_per_s']:>12,} msg/s (one core)")
+    print(f"decode latency:        {result['decode_latency']}")
+    print(f"memory per message:    {result['bytes_per_message']:>12,.0f} bytes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Import time benchmark: cost of `import kickbot` in a fresh interpreter, and which optional dependencies it loads.
+The chromedriver fallback (selenium / undetected_chromedriver / trio) should only be imported when it's used.
+
+Usage: python benchmarks/bench_import.py [--runs N] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BROWSER_MODULES = ('selenium', 'undetected_chromedriver', 'trio')
+
+LOADED_CHECK = (
+    "import sys, kickbot; "
+    f"print(','.join(sorted({{m.split('.')[0] for m in sys.modules}} & set({BROWSER_MODULES!r}))))"
+)
+
+
+def time_import(statement: str, runs: int) -> list[float]:
+    """
+    :return: Wall time in seconds of each fresh interpreter running statement, minus an empty interpreter start
+    """
+    def run(code: str) -> float:
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True, stderr=subprocess.DEVNULL)
+        return time.perf_counter() - start
+
+    baseline = min(run('pass') for _ in range(runs))
+    return [run(statement) - baseline for _ in range(runs)]
+
+
+def loaded_browser_modules() -> str:
+    result = subprocess.run([sys.executable, '-c', LOADED_CHECK], cwd=ROOT, check=True, capture_output=True, text=True)
+    return result.stdout.strip() or 'none'
+
+
+def run(runs: int = 10) -> dict:
+    result = {
+        'runs': runs,
+        'import_ms': round(statistics.median(time_import('import kickbot', runs)) * 1000, 1),
+        'import_with_browser_ms': None,
+        'browser_modules_loaded': loaded_browser_modules(),
+    }
+    try:
+        browser = time_import('import kickbot.selenium_help', runs)
+        result['import_with_browser_ms'] = round(statistics.median(browser) * 1000, 1)
+    except subprocess.CalledProcessError:
+        pass
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--json', action='store_true', help="Print the results as json")
+    args = parser.parse_args()
+    result = run(args.runs)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"import kickbot:                   {result['import_ms']:>8.1f} ms (median of {args.runs})")
+    if result['import_with_browser_ms'] is None:
+        print("import kickbot + chrome fallback: not installed (pip install kickbot[browser])")
+    else:
+        print(f"import kickbot + chrome fallback: {result['import_with_browser_ms']:>8.1f} ms "
+              f"(median of {args.runs})")
+    print(f"browser modules loaded by import kickbot: {result['browser_modules_loaded']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Outbound benchmark: bot.send_text through the outbound queue and the http executor, against a mocked tls_client
+session (no network), with the rate limit lifted to measure the overhead of the queue itself.
+
+Usage: python benchmarks/bench_outbound.py [--messages N] [--json]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from common import latency_summary, offline_bot, quiet_logging
+
+from kickbot import OutboundQueue
+
+
+async def bench(bot, messages: int, concurrency: int) -> tuple[float, list[int]]:
+    clock = time.perf_counter_ns
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(i: int) -> None:
+        async with semaphore:
+            before = clock()
+            await bot.send_text(f"message number {i}")
+            latencies.append(clock() - before)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(send(i) for i in range(messages)))
+    return messages / (time.perf_counter() - start), latencies
+
+
+def run(messages: int = 20_000, concurrency: int = 64, coalesce: bool = False) -> dict:
+    quiet_logging()
+    bot = offline_bot()
+    bot.outbound = OutboundQueue(rate=1e9, burst=1_000_000, coalesce=coalesce)
+    throughput, latencies = asyncio.run(bench(bot, messages, concurrency))
+    return {
+        'messages': messages,
+        'concurrency': concurrency,
+        'coalesce': coalesce,
+        'requests_sent': len(bot.client.scraper.posts),
+        'msg_per_s': round(throughput),
+        'latency': latency_summary(latencies),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=20_000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--coalesce', action='store_true')
+    parser.add_argument('--json', action='store_true', help="Print the results as json")
+    args = parser.parse_args()
+    result = run(args.messages, args.concurrency, args.coalesce)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"send_text: {result['msg_per_s']:>10,} msg/s | {result['requests_sent']:,} requests | "
+          f"latency {result['latency']}")
+
+
+if __name__ == '__main__':
+    main()
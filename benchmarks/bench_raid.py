@@ -0,0 +1,81 @@
+"""
+Raid detector benchmark: messages per second through RaidDetector.process, for normal chat and for a spam raid.
+
+Usage: python benchmarks/bench_raid.py [--messages N] [--json]
+"""
+import argparse
+import json
+import random
+import string
+import time
+
+from common import memory_per_item
+
+from kickbot.kick_raid import RaidDetector
+
+def normal_messages(count: int, rate: float, rng: random.Random, start: float = 0.0) -> list[tuple[float, str, str]]:
+    words = [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 8))) for _ in range(3000)]
+    return [(start + i / rate, f'viewer_{rng.randrange(2000)}', ' '.join(rng.choices(words, k=rng.randint(2, 12))))
+            for i in range(count)]
+
+
+def raid_messages(count: int, rate: float, rng: random.Random, start: float = 0.0) -> list[tuple[float, str, str]]:
+    return [(start + i / rate, f'raider_{i}', f'FREE FOLLOWERS at sp4m-site dot com {rng.choice(("!!", "", ":)", "now"))}')
+            for i in range(count)]
+
+
+def bench(messages: list[tuple[float, str, str]]) -> tuple[float, dict]:
+    """
+    :return: Messages processed per second, and amount of events by kind
+    """
+    detector = RaidDetector()
+    events = {}
+    start = time.perf_counter()
+    for at, username, content in messages:
+        for event in detector.process('streamer', username, content, now=at):
+            events[event.kind] = events.get(event.kind, 0) + 1
+    return len(messages) / (time.perf_counter() - start), events
+
+
+def run(messages: int = 100_000) -> dict:
+    rng = random.Random(1)
+    normal = normal_messages(messages, 50, rng)
+    normal_throughput, normal_events = bench(normal)
+    half = messages // 2
+    mixed = normal_messages(half, 20, rng) + raid_messages(half, 2000, rng, start=half / 20)
+    raid_throughput, raid_events = bench(mixed)
+
+    def fill_window() -> list:
+        detector = RaidDetector()
+        for at, username, content in normal[:10_000]:
+            detector.process('streamer', username, content, now=at / 100)
+        # 10k messages, all inside the window: the detector memory divided by the messages it holds
+        return [detector] * 10_000
+
+    return {
+        'messages': messages,
+        'normal_msg_per_s': round(normal_throughput),
+        'normal_events': normal_events,
+        'raid_msg_per_s': round(raid_throughput),
+        'raid_events': raid_events,
+        'bytes_per_message': memory_per_item(fill_window),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=100_000)
+    parser.add_argument('--json', action='store_true', help="Print the results as json")
+    args = parser.parse_args()
+    result = run(args.messages)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"normal chat (50 msg/s):                 {result['normal_msg_per_s']:>10,} msg/s (one core) | "
+          f"events: {result['normal_events']}")
+    print(f"chat (20 msg/s) then raid (2000 msg/s): {result['raid_msg_per_s']:>10,} msg/s (one core) | "
+          f"events: {result['raid_events']}")
+    print(f"memory: {result['bytes_per_message']:,} bytes per message in the window")
+
+if __name__ == '__main__':
+    main()
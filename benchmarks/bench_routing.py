@@ -0,0 +1,89 @@
+"""
+Routing benchmark: KickBot._handle_chat_message (decode, route, cooldowns, handler call) with 10, 1k and 10k
+registered commands, on a logged out bot (no network).
+
+Usage: python benchmarks/bench_routing.py [--messages N] [--json]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from common import latency_summary, offline_bot, quiet_logging
+
+from bench_decode import make_frame
+
+COMMAND_COUNTS = (10, 1_000, 10_000)
+
+
+async def noop(bot, message) -> None:
+    pass
+
+
+def make_bot(commands: int):
+    bot = offline_bot()
+    for i in range(commands):
+        bot.add_command_handler(f'!command{i}', noop)
+    bot.add_keyword_handler('spam', noop)
+    return bot
+
+
+def make_frames(messages: int, commands: int, rng: random.Random) -> list[dict]:
+    """
+    Decoded envelopes as _handle_chat_message receives them. Half of the messages hit a command.
+    """
+    frames = []
+    for i in range(messages):
+        envelope = json.loads(make_frame(i))
+        data = json.loads(envelope['data'])
+        if i % 2:
+            data['content'] = f'!command{rng.randrange(commands)} some arguments here'
+        else:
+            data['content'] = 'just chatting, no command in this message at all'
+        envelope['data'] = json.dumps(data)
+        frames.append(envelope)
+    return frames
+
+
+async def bench(bot, frames: list[dict]) -> tuple[float, list[int]]:
+    clock = time.perf_counter_ns
+    latencies = []
+    start = time.perf_counter()
+    for frame in frames:
+        before = clock()
+        await bot._handle_chat_message(frame)
+        latencies.append(clock() - before)
+    return len(frames) / (time.perf_counter() - start), latencies
+
+
+def run(messages: int = 50_000) -> dict:
+    quiet_logging()
+    rng = random.Random(1)
+    results = {}
+    for commands in COMMAND_COUNTS:
+        bot = make_bot(commands)
+        frames = make_frames(messages, commands, rng)
+        throughput, latencies = asyncio.run(bench(bot, frames))
+        results[f'{commands}_commands'] = {
+            'msg_per_s': round(throughput),
+            'latency': latency_summary(latencies),
+        }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=50_000)
+    parser.add_argument('--json', action='store_true', help="Print the results as json")
+    args = parser.parse_args()
+    result = run(args.messages)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    for name, figures in result.items():
+        print(f"{name:>16}: {figures['msg_per_s']:>10,} msg/s (one core) | latency {figures['latency']}")
+
+
+if __name__ == '__main__':
+    main()
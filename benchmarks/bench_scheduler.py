@@ -0,0 +1,70 @@
+"""
+Scheduler benchmark: many timed events firing at a short interval. Measures how late events run compared to their
+scheduled time, and the CPU time the scheduler spends per call.
+
+Usage: python benchmarks/bench_scheduler.py [--events N] [--interval S] [--seconds S] [--json]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from common import latency_summary, quiet_logging
+
+from kickbot.kick_scheduler import Scheduler
+
+
+async def bench(events: int, interval: float, seconds: float) -> tuple[int, list[int], float]:
+    loop = asyncio.get_running_loop()
+    scheduler = Scheduler(bot=None)
+    lateness = []
+    start = loop.time()
+
+    def make_function(event_index: int):
+        async def timed_function(bot) -> None:
+            event = timed_events[event_index]
+            scheduled = start + interval * event.runs
+            lateness.append(int(max(0.0, loop.time() - scheduled) * 1e9))
+        return timed_function
+
+    timed_events = [scheduler.add_interval(interval, make_function(i)) for i in range(events)]
+    cpu_start = time.process_time()
+    task = asyncio.create_task(scheduler.run())
+    await asyncio.sleep(seconds)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    cpu = time.process_time() - cpu_start
+    return sum(event.runs for event in timed_events), lateness, cpu
+
+
+def run(events: int = 1_000, interval: float = 0.05, seconds: float = 3.0) -> dict:
+    quiet_logging()
+    calls, lateness, cpu = asyncio.run(bench(events, interval, seconds))
+    expected = int(events * seconds / interval)
+    return {
+        'events': events,
+        'interval_s': interval,
+        'calls': calls,
+        'expected_calls': expected,
+        'cpu_us_per_call': round(cpu / max(1, calls) * 1e6, 3),
+        'lateness': latency_summary(lateness),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--events', type=int, default=1_000)
+    parser.add_argument('--interval', type=float, default=0.05)
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--json', action='store_true', help="Print the results as json")
+    args = parser.parse_args()
+    result = run(args.events, args.interval, args.seconds)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"{result['calls']:,} calls of {result['expected_calls']:,} expected | "
+          f"{result['cpu_us_per_call']} us cpu per call | lateness {result['lateness']}")
+
+
+if __name__ == '__main__':
+    main()
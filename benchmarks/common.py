@@ -0,0 +1,79 @@
+"""
+Helpers shared by the benchmarks.
+"""
+import gc
+import logging
+import os
+import sys
+import tracemalloc
+
+from typing import Callable
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# Chatroom of the frames made by bench_decode.make_frame
+CHATROOM_ID = 668
+CHANNELS = {
+    'streamer': {
+        'streamer_info': {'id': 1, 'slug': 'streamer', 'chatroom': {'id': CHATROOM_ID}},
+        'chatroom_settings': {},
+        'bot_settings': {'is_moderator': True, 'is_super_admin': False},
+    }
+}
+
+
+def quiet_logging() -> None:
+    """
+    Handlers and timed events log every call at INFO, which would dominate the timings.
+    """
+    logging.getLogger('kickbot').setLevel(logging.WARNING)
+
+
+def offline_bot(channels: dict = None):
+    """
+    Logged out KickBot with the replay client of kick_replay (no network), and the given streamers set.
+
+    :param channels: Channel info by streamer slug, see ReplayScraper. Defaults to CHANNELS
+    :return: KickBot
+    """
+    from kickbot import KickBot
+    from kickbot.kick_replay import replay_client
+
+    channels = channels if channels is not None else CHANNELS
+    bot = KickBot(client=replay_client(channels))
+    for slug in channels:
+        bot.set_streamer(slug)
+    return bot
+
+
+def latency_summary(samples_ns: list[int]) -> dict:
+    """
+    :param samples_ns: Latency of each operation in nanoseconds
+    :return: p50 / p99 / max latency in microseconds
+    """
+    if not samples_ns:
+        return {'p50_us': 0.0, 'p99_us': 0.0, 'max_us': 0.0}
+    samples = sorted(samples_ns)
+    return {
+        'p50_us': round(samples[len(samples) // 2] / 1000, 3),
+        'p99_us': round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] / 1000, 3),
+        'max_us': round(samples[-1] / 1000, 3),
+    }
+
+
+def memory_per_item(make_items: Callable[[], list]) -> float:
+    """
+    Bytes allocated per item by make_items, with every item kept alive.
+
+    :param make_items: Function returning a list of items
+    :return: Bytes per item
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    items = make_items()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return round((after - before) / max(1, len(items)), 1)
@@ -0,0 +1,156 @@
+"""
+Runs every benchmark and writes the results as json, to compare runs over time.
+
+Usage:
+    python benchmarks/run_all.py [--quick] [--output results.json]
+    python benchmarks/run_all.py --compare baseline.json [--tolerance 0.2]
+
+With --compare, throughput (msg_per_s) lower than the baseline, or latency / import time (_us / _ms) higher than the
+baseline, by more than the tolerance is reported as a regression, and the exit code is 1. Maximum latencies are a
+single sample, too noisy to compare, and are skipped.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import re
+import sys
+
+from functools import partial
+from importlib import metadata
+
+import common  # adds the repository to sys.path
+
+import bench_archive
+import bench_decode
+import bench_import
+import bench_outbound
+import bench_raid
+import bench_routing
+import bench_scheduler
+
+from kickbot import kick_json
+
+
+def kickbot_version() -> str:
+    """
+    Version of the installed package, or the version in setup.py when running from a checkout.
+    """
+    try:
+        return metadata.version('kickbot')
+    except metadata.PackageNotFoundError:
+        pass
+    try:
+        with open(os.path.join(common.ROOT, 'setup.py'), encoding='utf-8') as f:
+            match = re.search(r"version=['\"]([^'\"]+)['\"]", f.read())
+    except OSError:
+        match = None
+    return match.group(1) if match else 'unknown'
+
+
+FULL = {
+    'decode': bench_decode.run,
+    'routing': bench_routing.run,
+    'outbound': bench_outbound.run,
+    'scheduler': bench_scheduler.run,
+    'raid': bench_raid.run,
+    'import': bench_import.run,
+    'archive': bench_archive.run,
+}
+
+QUICK = {
+    'decode': partial(bench_decode.run, 20_000),
+    'routing': partial(bench_routing.run, 5_000),
+    'outbound': partial(bench_outbound.run, 2_000),
+    'scheduler': partial(bench_scheduler.run, 200, seconds=1.0),
+    'raid': partial(bench_raid.run, 20_000),
+    'import': partial(bench_import.run, 3),
+    'archive': partial(bench_archive.run, 20_000, queries=50),
+}
+
+
+def run_all(quick: bool = False, only: list[str] = None) -> dict:
+    benchmarks = QUICK if quick else FULL
+    results = {}
+    for name, bench in benchmarks.items():
+        if only and name not in only:
+            continue
+        print(f"running {name}...", file=sys.stderr)
+        results[name] = bench()
+    return {
+        'metadata': {
+            'kickbot_version': kickbot_version(),
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'json_backend': kick_json.BACKEND,
+            'quick': quick,
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        },
+        'results': results,
+    }
+
+
+def flatten(results: dict, prefix: str = '') -> dict[str, float]:
+    values = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            values.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[name] = value
+    return values
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    :return: One line per regression, empty if there is none
+    """
+    regressions = []
+    baseline_values = flatten(baseline['results'])
+    for name, value in flatten(current['results']).items():
+        before = baseline_values.get(name)
+        if not before or '.max_' in name:
+            continue
+        if name.endswith('msg_per_s'):
+            regressed = value < before * (1 - tolerance)
+        elif name.endswith(('_us', '_ms')):
+            regressed = value > before * (1 + tolerance)
+        else:
+            continue
+        if regressed:
+            regressions.append(f"{name}: {before:,} -> {value:,} ({(value - before) / before:+.0%})")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quick', action='store_true', help="Smaller runs, for a quick check")
+    parser.add_argument('--only', nargs='+', choices=list(FULL), help="Only run these benchmarks")
+    parser.add_argument('--output', help="Write the results to this file instead of stdout")
+    parser.add_argument('--compare', help="Results file to compare with")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed relative difference (default 0.2)")
+    args = parser.parse_args()
+
+    results = run_all(args.quick, args.only)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"regression: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions compared to {args.compare}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
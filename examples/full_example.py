@@ -1,3 +1,4 @@
+import asyncio
 import requests
 
 from kickbot import KickBot, KickMessage
@@ -7,7 +8,7 @@ from datetime import datetime, timedelta
 async def time_following(bot: KickBot, message: KickMessage):
     """ Reply with the amount of time the user has been following for """
     sender_username = message.sender.username
-    viewer_info = bot.moderator.get_viewer_info(sender_username)
+    viewer_info = await bot.moderator.async_get_viewer_info(sender_username)
     following_since = viewer_info.get('following_since')
     if following_since is not None:
         reply = f"You've been following since: {following_since}"
@@ -19,7 +20,7 @@ async def time_following(bot: KickBot, message: KickMessage):
 async def current_leaders(bot: KickBot, message: KickMessage):
     """ Retrieve usernames of current leaders and send in chat"""
     usernames = []
-    leaderboard = bot.moderator.get_leaderboard()
+    leaderboard = await bot.moderator.async_get_leaderboard()
     gift_leaders = leaderboard.get('gifts')
     for user in gift_leaders:
         usernames.append(user['username'])
@@ -30,7 +31,8 @@ async def current_leaders(bot: KickBot, message: KickMessage):
 async def tell_a_joke(bot: KickBot, message: KickMessage):
     """ Reply with a random joke """
     url = "https://v2.jokeapi.dev/joke/Any?type=single"
-    joke = requests.get(url).json().get('joke')
+    response = await asyncio.to_thread(requests.get, url)
+    joke = response.json().get('joke')
     await bot.reply_text(message, joke)
 
 
@@ -45,7 +47,7 @@ async def ban_if_says_gay(bot: KickBot, message: KickMessage):
     """ Ban user for 20 minutes if they say 'your gay' """
     sender_username = message.sender.username
     ban_time = 20
-    bot.moderator.timeout_user(sender_username, ban_time)
+    await bot.moderator.async_timeout_user(sender_username, ban_time)
 
 
 async def send_links_in_chat(bot: KickBot):
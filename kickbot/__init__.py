@@ -2,6 +2,16 @@ import logging
 
 from .kick_bot import KickBot
 from .kick_message import KickMessage
+from .kick_event import KickEvent
+from .kick_cooldown import Cooldown
+from .kick_policy import ChatPolicy
+from .kick_outbound import OutboundQueue
+from .kick_cache import Cache, CacheBackend, ChannelCache, MemoryCache
+from .kick_session import SessionCache
+from .kick_pool import KickClientPool
+from .kick_raid import RaidDetector, RaidEvent
+from .kick_stream import StreamState, StreamTracker
+from .kick_metrics import Metrics, PrometheusMetrics, OpenTelemetryMetrics
 
 
 logger = logging.getLogger(__name__)
@@ -10,3 +20,11 @@ stream_handler = logging.StreamHandler()
 formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 stream_handler.setFormatter(formatter)
 logger.addHandler(stream_handler)
+
+
+def __getattr__(name: str):
+    # ChatArchive (and sqlite3) is only imported when it's used
+    if name == 'ChatArchive':
+        from .kick_archive import ChatArchive
+        return ChatArchive
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
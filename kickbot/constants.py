@@ -25,3 +25,11 @@ class KickHelperException(Exception):
 class KickChromedriverException(Exception):
     ...
 
+
+class KickPolicyException(KickBotException):
+    """
+    A message was rejected locally, because the chatroom settings (i.e: emote only, followers only) don't allow it.
+    """
+    def __init__(self, reason: str, message: str) -> None:
+        super().__init__(message)
+        self.reason: str = reason
@@ -0,0 +1,435 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional, Union
+
+from . import kick_json
+from .constants import KickBotException
+
+logger = logging.getLogger(__name__)
+
+TimeArg = Union[float, datetime, timedelta]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    streamer TEXT,
+    chatroom_id INTEGER,
+    sender_id INTEGER,
+    sender TEXT,
+    sender_key TEXT,
+    content TEXT,
+    type TEXT
+);
+DROP INDEX IF EXISTS messages_sender;
+DROP INDEX IF EXISTS messages_chatroom;
+CREATE INDEX IF NOT EXISTS messages_sender_streamer ON messages (sender_key, streamer, created_at);
+CREATE INDEX IF NOT EXISTS messages_streamer ON messages (streamer, created_at);
+CREATE INDEX IF NOT EXISTS messages_created_at ON messages (created_at);
+"""
+
+_INSERT = ("INSERT OR IGNORE INTO messages "
+           "(id, created_at, streamer, chatroom_id, sender_id, sender, sender_key, content, type) "
+           "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)")
+
+_COLUMNS = "id, created_at, streamer, chatroom_id, sender_id, sender, content, type"
+
+
+class ArchivedMessage(NamedTuple):
+    id: Optional[str]
+    created_at: float
+    streamer: Optional[str]
+    chatroom_id: Optional[int]
+    sender_id: Optional[int]
+    sender: Optional[str]
+    content: Optional[str]
+    type: Optional[str]
+
+
+class _Control:
+    """
+    Queued after the messages, so the writer runs the action once the messages before it are written.
+    """
+    __slots__ = ('action', 'done', 'ok')
+
+    def __init__(self, action: str) -> None:
+        self.action: str = action
+        self.done = threading.Event()
+        self.ok: bool = True
+
+
+class ChatArchive:
+    """
+    SQLite archive of every chat message the bot receives, written behind the bot.
+
+    add() only puts the raw message on a queue, so reading from the socket is never slowed down by disk writes.
+    A writer thread decodes the queued messages and inserts them in batches (one transaction per batch),
+    in a database in WAL mode, so queries read while it writes. When the queue is full, messages are dropped
+    (counted in stats()) instead of blocking the bot.
+
+    :param path: Database file, i.e: 'chat.db'
+    :param batch_size: Maximum amount of messages inserted per transaction
+    :param queue_size: Messages waiting to be written before new ones are dropped
+    :param retention: Delete messages older than this
+    :param max_messages: Delete the oldest messages above this amount
+    :param maintenance_interval: Seconds between applying the retention, and giving the freed space back
+    """
+    def __init__(self,
+                 path: str,
+                 batch_size: int = 1000,
+                 queue_size: int = 100_000,
+                 retention: Optional[timedelta] = None,
+                 max_messages: Optional[int] = None,
+                 maintenance_interval: float = 60.0) -> None:
+        if path == ':memory:' or not path:
+            raise KickBotException("ChatArchive needs a database file, it's read and written from different threads.")
+        if batch_size < 1:
+            raise KickBotException("batch_size must be at least 1.")
+        self.path: str = path
+        self.batch_size: int = batch_size
+        self.retention: Optional[timedelta] = retention
+        self.max_messages: Optional[int] = max_messages
+        self.maintenance_interval: float = maintenance_interval
+        self.written: int = 0
+        self.dropped: int = 0
+        self.batches: int = 0
+        self.deleted: int = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._local = threading.local()
+        self._closed: bool = False
+        self._lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+        # Create the schema now, so queries work before the first message is written
+        connection = self._connect()
+        connection.close()
+
+    def add(self, streamer: str, raw_data: Union[str, bytes, dict], received_at: Optional[float] = None) -> bool:
+        """
+        Queue a chat message to be written. Called by the bot for every chat message it receives.
+
+        :param streamer: Slug of the streamer the message was sent to
+        :param raw_data: The data of the ChatMessageEvent frame (decoded by the writer thread)
+        :param received_at: Unix time the message was received, used when it has no created_at
+        :return: False if the message was dropped, because the queue is full or the archive is closed
+        """
+        if self._closed:
+            return False
+        if self._writer is None:
+            self._start()
+        try:
+            self._queue.put_nowait((streamer, raw_data, received_at or time.time()))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for the messages queued so far to be written.
+
+        :param timeout: Maximum seconds to wait
+        :return: True if they were written before the timeout. False if the timeout passed, or the archive is closed.
+        """
+        return self._control('flush', timeout)
+
+    def apply_retention(self, timeout: Optional[float] = None) -> bool:
+        """
+        Delete the messages older than retention / above max_messages now, and give the freed space back.
+        Done every maintenance_interval seconds by the writer thread.
+
+        :return: False if it failed, or didn't finish before the timeout
+        """
+        return self._control('maintenance', timeout)
+
+    def compact(self, timeout: Optional[float] = None) -> bool:
+        """
+        Rebuild the database file (VACUUM), i.e: after deleting a lot of messages. Writes wait until it's done.
+
+        :return: False if it failed, or didn't finish before the timeout
+        """
+        return self._control('vacuum', timeout)
+
+    def close(self, timeout: Optional[float] = 10.0) -> None:
+        """
+        Write the queued messages and stop the writer thread. Messages added afterwards are dropped.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._writer is not None:
+            self._control('stop', timeout, force=True)
+            self._writer.join(timeout)
+
+    def messages(self,
+                 sender: Optional[str] = None,
+                 streamer: Optional[str] = None,
+                 since: Optional[TimeArg] = None,
+                 until: Optional[TimeArg] = None,
+                 contains: Optional[str] = None,
+                 limit: Optional[int] = 100,
+                 newest_first: bool = True) -> list[ArchivedMessage]:
+        """
+        Query archived messages. Messages still queued aren't included (see flush).
+
+        :param sender: Username of the sender (case-insensitive)
+        :param streamer: Slug of the streamer
+        :param since: Only messages sent after this. A timedelta is relative to now, i.e: timedelta(hours=1)
+        :param until: Only messages sent before this. A timedelta is relative to now.
+        :param contains: Text the message contains (case-insensitive)
+        :param limit: Maximum amount of messages. None for no limit.
+        :param newest_first: Order of the messages
+        :return: List of ArchivedMessages
+        """
+        where, args = self._where(sender, streamer, since, until, contains)
+        sql = f"SELECT {_COLUMNS} FROM messages{where} ORDER BY created_at {'DESC' if newest_first else 'ASC'}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(limit)
+        rows = self._read_connection().execute(sql, args).fetchall()
+        return [ArchivedMessage(*row) for row in rows]
+
+    def count(self,
+              sender: Optional[str] = None,
+              streamer: Optional[str] = None,
+              since: Optional[TimeArg] = None,
+              until: Optional[TimeArg] = None,
+              contains: Optional[str] = None) -> int:
+        """
+        Amount of archived messages matching the filters. See messages.
+        """
+        where, args = self._where(sender, streamer, since, until, contains)
+        return self._read_connection().execute(f"SELECT COUNT(*) FROM messages{where}", args).fetchone()[0]
+
+    def stats(self) -> dict:
+        """
+        :return: {'written', 'dropped', 'queued', 'batches', 'deleted'}
+        """
+        return {
+            'written': self.written,
+            'dropped': self.dropped,
+            'queued': self._queue.qsize(),
+            'batches': self.batches,
+            'deleted': self.deleted,
+        }
+
+    ########################################################################################
+    #    WRITER THREAD
+    ########################################################################################
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run, name="kickbot-archive", daemon=True)
+                self._writer.start()
+
+    def _control(self, action: str, timeout: Optional[float], force: bool = False) -> bool:
+        if self._closed and not force:
+            return False
+        if self._writer is None:
+            self._start()
+        control = _Control(action)
+        self._queue.put(control)
+        if not self._writer.is_alive():
+            # Stopped while the control was queued
+            self._release_controls()
+        return control.done.wait(timeout) and control.ok
+
+    def _run(self) -> None:
+        connection = self._connect()
+        next_maintenance = time.monotonic() + self.maintenance_interval
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=max(0.0, next_maintenance - time.monotonic()))
+                except queue.Empty:
+                    item = None
+                rows = []
+                while item is not None and not isinstance(item, _Control):
+                    row = _row(*item)
+                    if row is not None:
+                        rows.append(row)
+                    if len(rows) >= self.batch_size:
+                        self._write(connection, rows)
+                        rows = []
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        item = None
+                if rows:
+                    self._write(connection, rows)
+                if time.monotonic() >= next_maintenance:
+                    self._run_action(connection, 'maintenance')
+                    next_maintenance = time.monotonic() + self.maintenance_interval
+                if item is None:
+                    continue
+                try:
+                    item.ok = self._run_action(connection, item.action)
+                finally:
+                    item.done.set()
+                if item.action == 'stop':
+                    return
+        except Exception:
+            logger.exception("Chat archive writer stopped, messages are no longer archived")
+            self._closed = True
+        finally:
+            connection.close()
+            self._release_controls()
+
+    def _run_action(self, connection: sqlite3.Connection, action: str) -> bool:
+        """
+        :return: False if the action failed. The writer keeps running (i.e: after the database was locked).
+        """
+        try:
+            if action == 'maintenance':
+                self._maintenance(connection)
+            elif action == 'vacuum':
+                connection.execute("VACUUM")
+        except sqlite3.Error as e:
+            logger.error("Chat archive %s failed: %s", action, e)
+            return False
+        return True
+
+    def _release_controls(self) -> None:
+        """
+        Release the controls still queued when the writer stops, so nothing waits for them forever.
+        """
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if isinstance(item, _Control):
+                item.ok = False
+                item.done.set()
+            else:
+                self.dropped += 1
+
+    def _write(self, connection: sqlite3.Connection, rows: list[tuple]) -> None:
+        changes = connection.total_changes
+        try:
+            with connection:
+                connection.executemany(_INSERT, rows)
+        except sqlite3.Error as e:
+            self.dropped += len(rows)
+            logger.error("Failed to archive %s messages: %s", len(rows), e)
+            return
+        # Messages already archived (same id) are ignored
+        self.written += connection.total_changes - changes
+        self.batches += 1
+
+    def _maintenance(self, connection: sqlite3.Connection) -> None:
+        deleted = 0
+        with connection:
+            if self.retention is not None:
+                cutoff = time.time() - self.retention.total_seconds()
+                deleted += connection.execute("DELETE FROM messages WHERE created_at < ?", (cutoff,)).rowcount
+            if self.max_messages is not None:
+                deleted += connection.execute(
+                    "DELETE FROM messages WHERE rowid IN "
+                    "(SELECT rowid FROM messages ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_messages,)
+                ).rowcount
+        if deleted:
+            self.deleted += deleted
+            connection.execute("PRAGMA incremental_vacuum")
+            logger.debug("Deleted %s archived messages", deleted)
+        connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    ########################################################################################
+    #    CONNECTIONS / QUERIES
+    ########################################################################################
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False)
+        # auto_vacuum only applies to a new database, it has to be set before the first table
+        connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        connection.executescript(_SCHEMA)
+        return connection
+
+    def _read_connection(self) -> sqlite3.Connection:
+        """
+        One read connection per thread (sqlite connections can't be shared between threads).
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30.0)
+            connection.execute("PRAGMA query_only = ON")
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def _where(sender: Optional[str],
+               streamer: Optional[str],
+               since: Optional[TimeArg],
+               until: Optional[TimeArg],
+               contains: Optional[str]) -> tuple[str, list]:
+        conditions = []
+        args = []
+        if sender is not None:
+            conditions.append("sender_key = ?")
+            args.append(sender.lstrip('@').casefold())
+        if streamer is not None:
+            conditions.append("streamer = ?")
+            args.append(streamer.replace('_', '-'))
+        if since is not None:
+            conditions.append("created_at >= ?")
+            args.append(_timestamp(since))
+        if until is not None:
+            conditions.append("created_at < ?")
+            args.append(_timestamp(until))
+        if contains is not None:
+            conditions.append("content LIKE ? ESCAPE '\\'")
+            escaped = contains.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            args.append(f"%{escaped}%")
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), args
+
+    def __repr__(self) -> str:
+        return f"ChatArchive({self.path!r}, written={self.written}, dropped={self.dropped})"
+
+
+def _row(streamer: str, raw_data: Union[str, bytes, dict], received_at: float) -> Optional[tuple]:
+    """
+    Decode a queued message into a messages table row. Runs in the writer thread.
+    """
+    try:
+        data = kick_json.loads(raw_data) if not isinstance(raw_data, dict) else raw_data
+        sender = data.get('sender') or {}
+        username = sender.get('username')
+        return (
+            data.get('id'),
+            _created_at(data.get('created_at'), received_at),
+            streamer,
+            data.get('chatroom_id'),
+            sender.get('id'),
+            username,
+            username.casefold() if username else None,
+            data.get('content'),
+            data.get('type'),
+        )
+    except (ValueError, TypeError, AttributeError):
+        logger.warning("Not archiving invalid chat message: %r", raw_data)
+        return None
+
+
+def _created_at(created_at: Optional[str], received_at: float) -> float:
+    if not created_at:
+        return received_at
+    try:
+        return datetime.fromisoformat(created_at.replace('Z', '+00:00')).timestamp()
+    except (AttributeError, ValueError):
+        return received_at
+
+
+def _timestamp(value: TimeArg) -> float:
+    if isinstance(value, timedelta):
+        return time.time() - value.total_seconds()
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return float(value)
@@ -1,51 +1,154 @@
 import asyncio
-import json
 import logging
-import threading
-import websockets
+import time
 
+from contextvars import ContextVar
 from datetime import timedelta
-from typing import Callable, Optional
+from functools import partial, wraps
+from typing import TYPE_CHECKING, Callable, Optional
 
 from .constants import KickBotException
+from .kick_cache import Cache, ChannelCache, VIEWER_COUNT_TTL
+from .kick_channel import KickChannel
 from .kick_client import KickClient
+from .kick_connection import PusherConnection, RedundantConnection
+from .kick_cooldown import Cooldown, COOLDOWN_READY, COOLDOWN_NOTIFY
+from .kick_event import KickEvent, CHAT_MESSAGE, CHATROOM_UPDATED, event_name
 from .kick_message import KickMessage
+from .kick_metrics import (
+    Metrics,
+    Sample,
+    COUNTER,
+    GAUGE,
+    ARCHIVE_DROPPED,
+    ARCHIVE_QUEUE_DEPTH,
+    ARCHIVE_WRITTEN,
+    CACHE_COALESCED,
+    CACHE_HITS,
+    CACHE_MISSES,
+    CONNECTED,
+    CONNECTS,
+    DISPATCH_QUEUE_DEPTH,
+    DUPLICATE_FRAMES,
+    HANDLER_SECONDS,
+    OUTBOUND_QUEUE_DEPTH,
+    RECONNECTS,
+    SPAN_EVENT,
+    SPAN_HANDLER,
+    SPAN_MESSAGE
+)
 from .kick_moderator import Moderator
+from .kick_router import CommandRouter, Route
+from .kick_raid import RaidDetector
+from .kick_replay import FrameRecorder
+from .kick_outbound import OutboundQueue, PRIORITY_CHAT, PRIORITY_REPLY
+from .kick_scheduler import Scheduler, TimedEvent
+from .kick_session import SessionCache
+from .kick_stream import (
+    StreamHandler,
+    StreamState,
+    StreamTracker,
+    STREAM_EVENTS,
+    STREAM_LIVE,
+    STREAM_OFFLINE,
+    VIEWER_THRESHOLD
+)
 from .kick_helper import (
     get_ws_uri,
-    get_streamer_info,
     get_current_viewers,
-    get_chatroom_settings,
-    get_bot_settings,
     message_from_data,
     send_message_in_chat,
     send_reply_in_chat
 )
 
+if TYPE_CHECKING:
+    # sqlite3 is only imported when an archive is used
+    from .kick_archive import ArchivedMessage, ChatArchive
+
 logger = logging.getLogger(__name__)
 
+_current_channel: ContextVar[Optional[KickChannel]] = ContextVar('_current_channel', default=None)
+
 
 class KickBot:
     """
     Main class for interacting with the Bot API.
+
+    The bot can monitor many streamers at once, on a single login and websocket (call set_streamer for each).
+    Streamer / chatroom attributes (streamer_name, chatroom_id, moderator, ...) refer to the channel of the
+    message or timed event being handled, or to the first streamer set when used outside a handler.
     """
-    def __init__(self, username: str, password: str) -> None:
-        self.client: KickClient = KickClient(username, password)
-        self._ws_uri = get_ws_uri()
-        self._socket_id: Optional[str] = None
-        self.streamer_name: Optional[str] = None
-        self.streamer_slug: Optional[str] = None
-        self.streamer_info: Optional[dict] = None
-        self.chatroom_info: Optional[dict] = None
-        self.chatroom_settings: Optional[dict] = None
-        self.chatroom_id: Optional[int] = None
-        self.bot_settings: Optional[dict] = None
-        self.is_mod: bool = False
-        self.is_super_admin: bool = False
-        self.moderator: Optional[Moderator] = None
-        self.handled_commands: dict[str, Callable] = {}
-        self.handled_messages: dict[str, Callable] = {}
+    def __init__(self,
+                 username: Optional[str] = None,
+                 password: Optional[str] = None,
+                 max_workers: int = 16,
+                 handler_timeout: Optional[float] = 30.0,
+                 dispatch_queue_size: int = 1000,
+                 cache: Optional[Cache] = None,
+                 session_cache: Optional[SessionCache] = None,
+                 client: Optional[KickClient] = None,
+                 metrics: Optional[Metrics] = None,
+                 channel_cache: Optional[ChannelCache] = None,
+                 enforce_chat_settings: bool = True,
+                 archive: Optional['ChatArchive'] = None,
+                 redundant_connection: bool = False) -> None:
+        """
+        :param username: Email / username of the user bot
+        :param password: Password of the user bot
+        :param max_workers: Maximum amount of handler functions running at the same time
+        :param handler_timeout: Seconds before a handler function is cancelled. None to disable.
+        :param dispatch_queue_size: Amount of inbound messages to buffer before reading from the socket is paused
+        :param cache: Cache for viewer info, leaderboard, and viewer count lookups. Defaults to an in-process cache.
+        :param session_cache: Encrypted on-disk cache of the login session, reused on restarts
+        :param client: Already logged in client (i.e: from a KickClientPool), instead of username and password
+        :param metrics: Metrics / tracing exporter, i.e: PrometheusMetrics() or OpenTelemetryMetrics().
+                        Defaults to recording nothing.
+        :param channel_cache: Persistent cache of the channel ids, so set_streamer waits for fewer requests on restarts
+        :param enforce_chat_settings: Pace messages to the slow mode interval, and reject messages the chatroom settings
+                                      don't allow without sending them (see KickChannel.policy)
+        :param archive: SQLite archive every received chat message is written to, i.e: ChatArchive('chat.db')
+        :param redundant_connection: Keep a second websocket subscribed to the same channels, and handle each message
+                                     from whichever socket receives it first (see RedundantConnection)
+        """
+        if max_workers < 1:
+            raise KickBotException("max_workers must be at least 1.")
+        if client is None:
+            if username is None or password is None:
+                raise KickBotException("Either username and password, or a logged in client must be given.")
+            client = KickClient(username, password, session_cache=session_cache, metrics=metrics)
+        elif metrics is not None:
+            client.metrics = metrics
+        self.client: KickClient = client
+        self.metrics: Metrics = metrics if metrics is not None else Metrics()
+        self.channels: dict[str, KickChannel] = {}
+        self._pusher_channels: dict[str, KickChannel] = {}
+        self.router: CommandRouter = CommandRouter()
+        self.raid_handlers: list[Callable] = []
+        self.raid_options: dict = {}
+        self.stream_handlers: list[StreamHandler] = []
+        self.stream_options: Optional[dict] = None
+        self.shard = None  # kick_shard.ShardLink, when running in a ShardSupervisor worker
+        self._event_handlers: dict[str, list[tuple[Callable, Optional[KickChannel]]]] = {}
+        self.max_workers: int = max_workers
+        self.handler_timeout: Optional[float] = handler_timeout
+        self.dispatch_queue_size: int = dispatch_queue_size
+        self._dispatch_queue: Optional[asyncio.Queue] = None
+        self.outbound: OutboundQueue = OutboundQueue(metrics=self.metrics)
+        self.cache: Cache = cache if cache is not None else Cache()
+        self.channel_cache: Optional[ChannelCache] = channel_cache
+        self.enforce_chat_settings: bool = enforce_chat_settings
+        self.archive: Optional['ChatArchive'] = archive
+        self.scheduler: Scheduler = Scheduler(self)
+        connection_class = RedundantConnection if redundant_connection else PusherConnection
+        self.connection: PusherConnection | RedundantConnection = connection_class(
+            get_ws_uri(),
+            channels=lambda: list(self._pusher_channels),
+            on_frame=self._handle_frame,
+            metrics=self.metrics
+        )
+        self.metrics.add_collector(self._collect_metrics)
         self._is_active = True
+        self._polling: bool = False
 
     def poll(self):
         """
@@ -57,27 +160,135 @@ class KickBot:
             logger.info("Bot stopped.")
             return
 
-    def set_streamer(self, streamer_name: str) -> None:
+    async def async_poll(self) -> None:
+        """
+        Async version of poll, to run several bots on one event loop, i.e: asyncio.gather(*(bot.async_poll() ...))
         """
-        Set the streamer for the bot to monitor.
+        await self._poll()
+
+    def start_recording(self, path: str) -> FrameRecorder:
+        """
+        Record every websocket frame the bot receives to a file, for replaying offline with kick_replay.
+        Call after set_streamer, so the info of the streamers is recorded too.
+
+        :param path: File to append the frames to, i.e: 'chat.jsonl.gz'
+        :return: FrameRecorder
+        """
+        self.stop_recording()
+        recorder = FrameRecorder(path)
+        recorder.write_channels(self.channels)
+        self.connection.recorder = recorder
+        return recorder
+
+    def stop_recording(self) -> None:
+        if self.connection.recorder is not None:
+            self.connection.recorder.close()
+            self.connection.recorder = None
+
+    def set_streamer(self, streamer_name: str) -> KickChannel:
+        """
+        Set a streamer for the bot to monitor. Can be called multiple times to monitor multiple streamers,
+        all of them share the bots login and websocket connection.
 
         :param streamer_name: Username of the streamer for the bot to monitor
+        :return: KickChannel of the streamer
         """
-        if self.streamer_name is not None:
-            raise KickBotException("Streamer already set. Only able to set one streamer at a time.")
-        self.streamer_name = streamer_name
-        self.streamer_slug = streamer_name.replace('_', '-')
-        get_streamer_info(self)
-        get_chatroom_settings(self)
-        get_bot_settings(self)
-        if self.is_mod:
-            self.moderator = Moderator(self)
-            logger.info(f"Bot is confirmed as a moderator for {self.streamer_name}")
-        else:
-            logger.warning("Bot is not a moderator in the stream. To access moderator functions, make the bot a mod."
-                           "(You can still send messages and reply's, bot moderator status is recommended)")
+        channel = self._new_channel(streamer_name)
+        channel.load()
+        return self._add_channel(channel)
+
+    async def async_set_streamer(self, streamer_name: str) -> KickChannel:
+        """
+        Non-blocking version of set_streamer. Streamers set at the same time load concurrently, i.e:
+        await asyncio.gather(*(bot.async_set_streamer(name) for name in streamers))
+
+        :param streamer_name: Username of the streamer for the bot to monitor
+        :return: KickChannel of the streamer
+        """
+        channel = self._new_channel(streamer_name)
+        await channel.async_load()
+        return self._add_channel(channel)
+
+    def get_channel(self, streamer_name: Optional[str] = None) -> KickChannel:
+        """
+        Retrieve the channel of a streamer set with set_streamer.
 
-    def add_message_handler(self, message: str, message_function: Callable) -> None:
+        :param streamer_name: Username of the streamer. Defaults to the channel currently being handled,
+                              or the first streamer set.
+        :return: KickChannel of the streamer
+        """
+        if streamer_name is not None:
+            channel = self.channels.get(streamer_name.replace('_', '-'))
+            if channel is None:
+                raise KickBotException(f"Streamer {streamer_name} is not set.")
+            return channel
+        channel = _current_channel.get()
+        if channel is not None and channel.bot is self:
+            return channel
+        if not self.channels:
+            raise KickBotException("Must set streamer name to monitor first.")
+        return next(iter(self.channels.values()))
+
+    @property
+    def channel(self) -> Optional[KickChannel]:
+        """
+        Channel currently being handled, or the first streamer set. None if no streamer is set.
+        """
+        return self.get_channel() if self.channels else None
+
+    @property
+    def streamer_name(self) -> Optional[str]:
+        return self.channel.streamer_name if self.channels else None
+
+    @property
+    def streamer_slug(self) -> Optional[str]:
+        return self.channel.streamer_slug if self.channels else None
+
+    @property
+    def streamer_info(self) -> Optional[dict]:
+        return self.channel.streamer_info if self.channels else None
+
+    @property
+    def chatroom_info(self) -> Optional[dict]:
+        return self.channel.chatroom_info if self.channels else None
+
+    @property
+    def chatroom_settings(self) -> Optional[dict]:
+        return self.channel.chatroom_settings if self.channels else None
+
+    @property
+    def chatroom_id(self) -> Optional[int]:
+        return self.channel.chatroom_id if self.channels else None
+
+    @property
+    def bot_settings(self) -> Optional[dict]:
+        return self.channel.bot_settings if self.channels else None
+
+    @property
+    def is_mod(self) -> bool:
+        return self.channel.is_mod if self.channels else False
+
+    @property
+    def is_super_admin(self) -> bool:
+        return self.channel.is_super_admin if self.channels else False
+
+    @property
+    def moderator(self) -> Optional[Moderator]:
+        return self.channel.moderator if self.channels else None
+
+    @property
+    def handled_commands(self) -> dict[str, Callable]:
+        return self.router.commands
+
+    @property
+    def handled_messages(self) -> dict[str, Callable]:
+        return self.router.messages
+
+    def add_message_handler(self,
+                            message: str,
+                            message_function: Callable,
+                            streamer: Optional[str] = None,
+                            cooldown: Optional[Cooldown] = None) -> None:
         """
         Add a message to be handled, and the asynchronous function to handle that message.
 
@@ -85,15 +296,17 @@ class KickBot:
 
         :param message: Message to be handled i.e: 'hello world'
         :param message_function: Async function to handle the message
+        :param streamer: Only handle the message in this streamers chat. Defaults to all streamers.
+        :param cooldown: Optional Cooldown limiting how often the function is called
         """
-        if self.streamer_name is None:
-            raise KickBotException("Must set streamer name to monitor first.")
-        message = message.casefold()
-        if self.handled_messages.get(message) is not None:
-            raise KickBotException(f"Message: {message} already set in handled messages")
-        self.handled_messages[message] = message_function
-
-    def add_command_handler(self, command: str, command_function: Callable) -> None:
+        self._get_router(streamer).add_message(message, message_function, cooldown=cooldown)
+
+    def add_command_handler(self,
+                            command: str,
+                            command_function: Callable,
+                            streamer: Optional[str] = None,
+                            aliases: Optional[list[str]] = None,
+                            cooldown: Optional[Cooldown] = None) -> None:
         """
         Add a command to be handled, and the asynchronous function to handle that command.
 
@@ -101,42 +314,248 @@ class KickBot:
 
         :param command: Command to be handled i.e: '!time'
         :param command_function: Async function to handle the command
+        :param streamer: Only handle the command in this streamers chat. Defaults to all streamers.
+        :param aliases: Other commands calling the same function i.e: ['!t', '!clock']
+        :param cooldown: Optional Cooldown limiting how often the function is called (shared with the aliases)
         """
-        if self.streamer_name is None:
+        self._get_router(streamer).add_command(command, command_function, aliases=aliases, cooldown=cooldown)
+
+    def add_prefix_handler(self,
+                           prefix: str,
+                           prefix_function: Callable,
+                           streamer: Optional[str] = None,
+                           cooldown: Optional[Cooldown] = None) -> None:
+        """
+        Add a handler called when a message starts with the prefix (case-insensitive)
+
+        :param prefix: Start of the message to be handled i.e: '!so @'
+        :param prefix_function: Async function to handle the message
+        :param streamer: Only handle the message in this streamers chat. Defaults to all streamers.
+        :param cooldown: Optional Cooldown limiting how often the function is called
+        """
+        self._get_router(streamer).add_prefix(prefix, prefix_function, cooldown=cooldown)
+
+    def add_keyword_handler(self,
+                            keyword: str,
+                            keyword_function: Callable,
+                            streamer: Optional[str] = None,
+                            cooldown: Optional[Cooldown] = None) -> None:
+        """
+        Add a handler called when the keyword appears anywhere in a message (case-insensitive).
+        Any amount of keywords can be added, all of them are matched in a single pass over the message.
+
+        :param keyword: Text to look for i.e: 'free followers'
+        :param keyword_function: Async function to handle the message
+        :param streamer: Only handle the message in this streamers chat. Defaults to all streamers.
+        :param cooldown: Optional Cooldown limiting how often the function is called
+        """
+        self._get_router(streamer).add_keyword(keyword, keyword_function, cooldown=cooldown)
+
+    def add_regex_handler(self,
+                          pattern: str,
+                          regex_function: Callable,
+                          streamer: Optional[str] = None,
+                          cooldown: Optional[Cooldown] = None) -> None:
+        """
+        Add a handler called when the regex pattern matches anywhere in a message (case-insensitive).
+
+        :param pattern: Regex pattern i.e: r'https?://\\S+'
+        :param regex_function: Async function to handle the message
+        :param streamer: Only handle the message in this streamers chat. Defaults to all streamers.
+        :param cooldown: Optional Cooldown limiting how often the function is called
+        """
+        self._get_router(streamer).add_regex(pattern, regex_function, cooldown=cooldown)
+
+    def add_glob_handler(self,
+                         pattern: str,
+                         glob_function: Callable,
+                         streamer: Optional[str] = None,
+                         cooldown: Optional[Cooldown] = None) -> None:
+        """
+        Add a handler called when the glob pattern (* ? [seq]) matches the whole message (case-insensitive).
+
+        :param pattern: Glob pattern i.e: '*follow*for*follow*'
+        :param glob_function: Async function to handle the message
+        :param streamer: Only handle the message in this streamers chat. Defaults to all streamers.
+        :param cooldown: Optional Cooldown limiting how often the function is called
+        """
+        self._get_router(streamer).add_glob(pattern, glob_function, cooldown=cooldown)
+
+    def add_event_handler(self, event_type: str, event_function: Callable, streamer: Optional[str] = None) -> None:
+        """
+        Add a handler for a pusher event, i.e: subscriptions, gifted subs, bans, pinned messages, follows.
+        The bot subscribes to the other pusher channels of the streamers (channel.{id}) when the first one is added.
+
+        :param event_type: Event name, with or without the 'App\\Events\\' prefix. i.e: 'GiftedSubscriptionsEvent',
+                           or a constant from kick_event, i.e: kick_event.GIFTED_SUBSCRIPTIONS
+        :param event_function: Async function to handle the event, i.e: async def on_gift(bot, event: KickEvent)
+        :param streamer: Only handle the event for this streamer. Defaults to all streamers.
+        """
+        channel = self.get_channel(streamer) if streamer is not None else None
+        self._event_handlers.setdefault(event_name(event_type), []).append((event_function, channel))
+        for subscribe_channel in ([channel] if channel is not None else self.channels.values()):
+            self._subscribe_event_channels(subscribe_channel)
+
+    def add_raid_handler(self, raid_function: Callable, streamer: Optional[str] = None, **detector_options) -> None:
+        """
+        Add a handler called with a RaidEvent when the raid detector sees a spike of messages, duplicate messages,
+        or new chatters (see RaidDetector). Each streamer gets its own detector.
+
+        :param raid_function: Async function to handle the event, i.e: async def on_raid(bot, event)
+        :param streamer: Only detect raids in this streamers chat. Defaults to all streamers.
+        :param detector_options: RaidDetector thresholds, i.e: window=10, duplicate_ratio=0.4
+        """
+        if streamer is not None:
+            channel = self.get_channel(streamer)
+            if channel.raid_detector is None or detector_options:
+                channel.raid_detector = RaidDetector(**detector_options)
+            channel.raid_handlers.append(raid_function)
+            return
+        RaidDetector(**detector_options)  # validate the options now
+        if detector_options:
+            self.raid_options = detector_options
+        self.raid_handlers.append(raid_function)
+
+    def track_stream(self, streamer: Optional[str] = None, **tracker_options) -> None:
+        """
+        Poll the live status, viewers and title of a stream in the background (see StreamTracker), so
+        stream_state and current_viewers are read from memory. Called by the live / offline / viewer threshold
+        handlers, only needed to change the poll intervals, or to track streams without handlers.
+
+        :param streamer: Streamer to track. Defaults to every streamer, including streamers set later.
+        :param tracker_options: StreamTracker options, i.e: live_interval=15, offline_interval=60
+        """
+        if not self.channels:
             raise KickBotException("Must set streamer name to monitor first.")
-        command = command.casefold()
-        if self.handled_commands.get(command) is not None:
-            raise KickBotException(f"Command: {command} already set in handled commands")
-        self.handled_commands[command] = command_function
+        if streamer is not None:
+            self._track_stream(self.get_channel(streamer), tracker_options)
+            return
+        if tracker_options or self.stream_options is None:
+            self.stream_options = tracker_options
+        for channel in self.channels.values():
+            self._track_stream(channel, tracker_options)
+
+    def add_live_handler(self, live_function: Callable, streamer: Optional[str] = None) -> None:
+        """
+        Add a handler called when a stream goes live, i.e: to announce it.
+
+        :param live_function: Async function to handle the change, i.e: async def on_live(bot, state: StreamState)
+        :param streamer: Only for this streamer. Defaults to all streamers.
+        """
+        self._add_stream_handler(StreamHandler(STREAM_LIVE, live_function), streamer)
+
+    def add_offline_handler(self, offline_function: Callable, streamer: Optional[str] = None) -> None:
+        """
+        Add a handler called when a stream goes offline.
+
+        :param offline_function: Async function to handle the change, i.e: async def on_offline(bot, state: StreamState)
+        :param streamer: Only for this streamer. Defaults to all streamers.
+        """
+        self._add_stream_handler(StreamHandler(STREAM_OFFLINE, offline_function), streamer)
+
+    def add_viewer_threshold_handler(self,
+                                     viewers: int,
+                                     threshold_function: Callable,
+                                     streamer: Optional[str] = None) -> None:
+        """
+        Add a handler called when the viewer count of a stream rises to the threshold. It's called again
+        the next time the count goes from below the threshold to above it.
 
-    def add_timed_event(self, frequency_time: timedelta, timed_function: Callable):
+        :param viewers: Viewer count threshold, i.e: 1000
+        :param threshold_function: Async function to handle the change, i.e: async def on_1k(bot, state: StreamState)
+        :param streamer: Only for this streamer. Defaults to all streamers.
+        """
+        self._add_stream_handler(StreamHandler(VIEWER_THRESHOLD, threshold_function, viewers), streamer)
+
+    def stream_state(self, streamer: Optional[str] = None) -> Optional[StreamState]:
+        """
+        Latest state (live, viewers, title, category) of a tracked stream, from memory.
+
+        :param streamer: Streamer of the stream. Defaults to the chat being handled, or the first streamer.
+        :return: StreamState, or None if the stream isn't tracked or wasn't polled yet
+        """
+        tracker = self.get_channel(streamer).stream
+        return tracker.state if tracker is not None else None
+
+    def add_timed_event(self,
+                        frequency_time: timedelta,
+                        timed_function: Callable,
+                        jitter: Optional[timedelta] = None,
+                        streamer: Optional[str] = None) -> TimedEvent:
         """
         Add an event function to be called with a frequency of frequency_time.
+        Calls happen at a fixed rate, the time taken by timed_function doesn't push back the next call.
 
         :param frequency_time: Time interval between function calls.
         :param timed_function: Async function to be called.
+        :param jitter: Optional maximum random delay added to each call.
+        :param streamer: Streamer the event is for (bot.send_text etc. go to this chat). Defaults to the first streamer.
+        :return: TimedEvent, which can be passed to cancel_timed_event
         """
-        if self.streamer_name is None:
+        if not self.channels:
             raise KickBotException("Must set streamer name to monitor first.")
         if frequency_time.total_seconds() <= 0:
             raise KickBotException("Frequency time must be greater than 0.")
-        event_thread = threading.Thread(target=asyncio.run,
-                                        args=(self._run_timed_event(frequency_time, timed_function),),
-                                        daemon=True,
-                                        )
-        event_thread.start()
+        jitter_seconds = jitter.total_seconds() if jitter is not None else 0.0
+        timed_function = self._bind_channel(timed_function, streamer)
+        return self.scheduler.add_interval(frequency_time.total_seconds(), timed_function, jitter=jitter_seconds)
+
+    def add_cron_event(self,
+                       cron_spec: str,
+                       timed_function: Callable,
+                       jitter: Optional[timedelta] = None,
+                       streamer: Optional[str] = None) -> TimedEvent:
+        """
+        Add an event function to be called at times matching a cron spec (local time).
 
-    async def send_text(self, message: str) -> None:
+        :param cron_spec: 'minute hour day-of-month month day-of-week' i.e: '0 */2 * * *' for every 2 hours
+        :param timed_function: Async function to be called.
+        :param jitter: Optional maximum random delay added to each call.
+        :param streamer: Streamer the event is for (bot.send_text etc. go to this chat). Defaults to the first streamer.
+        :return: TimedEvent, which can be passed to cancel_timed_event
+        """
+        if not self.channels:
+            raise KickBotException("Must set streamer name to monitor first.")
+        jitter_seconds = jitter.total_seconds() if jitter is not None else 0.0
+        timed_function = self._bind_channel(timed_function, streamer)
+        return self.scheduler.add_cron(cron_spec, timed_function, jitter=jitter_seconds)
+
+    def cancel_timed_event(self, timed_event: TimedEvent | int) -> bool:
+        """
+        Cancel a timed event added with add_timed_event / add_cron_event.
+
+        :param timed_event: TimedEvent or its id
+        :return: True if the event was cancelled, False if it wasn't scheduled
+        """
+        return self.scheduler.cancel(timed_event)
+
+    def timed_events(self) -> list[TimedEvent]:
+        """
+        :return: List of scheduled timed events, ordered by next run
+        """
+        return self.scheduler.events()
+
+    async def send_text(self, message: str, priority: int = PRIORITY_CHAT, streamer: Optional[str] = None) -> None:
         """
         Used to send text in the chat.
         reply_text below is used to reply to a specific users message.
 
+        Messages go through the outbound queue (bot.outbound), which handles rate limiting.
+        Messages the chatroom settings don't allow raise KickPolicyException without being sent, and in slow mode
+        they wait for the interval (see KickChannel.policy).
+
         :param message: Message to be sent in the chat
+        :param priority: Outbound queue priority. Defaults to PRIORITY_CHAT
+        :param streamer: Streamer to send the message to. Defaults to the chat being handled, or the first streamer.
         """
         if not type(message) == str or message.strip() == "":
             raise KickBotException("Invalid message. Must be a non empty string.")
-        logger.debug(f"Sending message: {message!r}")
-        r = send_message_in_chat(self, message)
+        channel = self.get_channel(streamer)
+        channel.policy.check(message)
+        logger.debug("Sending message to %s: %r", channel.streamer_name, message)
+        async with channel.policy.pacing():
+            r = await self.outbound.submit_text(message, partial(send_message_in_chat, channel),
+                                                key=channel.chatroom_id, priority=priority)
         if r.status_code != 200:
             raise KickBotException(f"An error occurred while sending message {message!r}")
 
@@ -149,20 +568,80 @@ class KickBot:
         """
         if not type(reply_message) == str or reply_message.strip() == "":
             raise KickBotException("Invalid reply message. Must be a non empty string.")
-        logger.debug(f"Sending reply: {reply_message!r}")
-        r = send_reply_in_chat(self, original_message, reply_message)
+        channel = self._pusher_channels.get(f"chatrooms.{original_message.chatroom_id}.v2") or self.get_channel()
+        channel.policy.check(reply_message)
+        logger.debug("Sending reply to %s: %r", channel.streamer_name, reply_message)
+        send = partial(send_reply_in_chat, channel, original_message, reply_message)
+        async with channel.policy.pacing():
+            r = await self.outbound.submit(send, priority=PRIORITY_REPLY)
         if r.status_code != 200:
             raise KickBotException(f"An error occurred while sending reply {reply_message!r}")
 
-    def current_viewers(self) -> int:
+    def current_viewers(self, streamer: Optional[str] = None) -> int:
         """
-        Retrieve current viewer count for the stream
+        Retrieve current viewer count for the stream. Read from memory if the stream is tracked (see track_stream),
+        otherwise cached for VIEWER_COUNT_TTL seconds.
 
+        :param streamer: Streamer to retrieve the viewer count for. Defaults to the chat being handled, or the first streamer.
         :return: Viewer count as an integer
         """
-        viewer_count = get_current_viewers(self)
+        channel = self.get_channel(streamer)
+        if channel.stream is not None and channel.stream.state is not None:
+            return channel.stream.state.viewers
+        viewer_count = self.cache.get_or_load(f"viewers:{channel.streamer_slug}",
+                                              partial(get_current_viewers, channel),
+                                              ttl=VIEWER_COUNT_TTL)
         return viewer_count
 
+    async def async_current_viewers(self, streamer: Optional[str] = None) -> int:
+        """
+        Non-blocking version of current_viewers, for use inside handler / timed event functions.
+
+        :param streamer: Streamer to retrieve the viewer count for. Defaults to the chat being handled, or the first streamer.
+        :return: Viewer count as an integer
+        """
+        channel = self.get_channel(streamer)
+        if channel.stream is not None and channel.stream.state is not None:
+            return channel.stream.state.viewers
+        viewer_count = await self.cache.async_get_or_load(f"viewers:{channel.streamer_slug}",
+                                                          partial(self.client.run_async, get_current_viewers, channel),
+                                                          ttl=VIEWER_COUNT_TTL)
+        return viewer_count
+
+    def chat_history(self,
+                     sender: Optional[str] = None,
+                     since: Optional[timedelta] = None,
+                     contains: Optional[str] = None,
+                     streamer: Optional[str] = None,
+                     limit: Optional[int] = 100) -> list['ArchivedMessage']:
+        """
+        Query the chat archive, newest messages first. See ChatArchive.messages for more filters.
+
+        :param sender: Only messages of this user
+        :param since: How far back to look, i.e: timedelta(hours=1)
+        :param contains: Only messages containing this text (case-insensitive)
+        :param streamer: Streamer of the chat. Defaults to the chat being handled, or the first streamer.
+        :param limit: Maximum amount of messages
+        :return: List of ArchivedMessages
+        """
+        if self.archive is None:
+            raise KickBotException("No chat archive. Create the bot with archive=ChatArchive(path)")
+        channel = self.get_channel(streamer)
+        return self.archive.messages(sender=sender, streamer=channel.streamer_slug, since=since,
+                                     contains=contains, limit=limit)
+
+    async def async_chat_history(self,
+                                 sender: Optional[str] = None,
+                                 since: Optional[timedelta] = None,
+                                 contains: Optional[str] = None,
+                                 streamer: Optional[str] = None,
+                                 limit: Optional[int] = 100) -> list['ArchivedMessage']:
+        """
+        Non-blocking version of chat_history, for use inside handler / timed event functions.
+        """
+        streamer = self.get_channel(streamer).streamer_name
+        return await self.client.run_async(self.chat_history, sender, since, contains, streamer, limit)
+
     @staticmethod
     def set_log_level(log_level: str) -> None:
         """
@@ -174,7 +653,7 @@ class KickBot:
         if log_level in valid_levels:
             logger.setLevel(log_level)
         else:
-            logger.warning(f"Invalid log level: {log_level}")
+            logger.warning("Invalid log level: %s", log_level)
 
     ########################################################################################
     #    INTERNAL FUNCTIONS
@@ -184,96 +663,353 @@ class KickBot:
         """
         Main internal function to poll the streamers chat and respond to messages/commands.
         """
-        if self.streamer_name is None:
+        if not self.channels:
             raise KickBotException("Must set streamer name before polling.")
-        async with websockets.connect(self._ws_uri) as self.sock:
-            connection_response = await self._recv()
-            await self._handle_first_connect(connection_response)
-            await self._join_chatroom(self.chatroom_id)
-            while True:
-                try:
-                    response = await self._recv()
-                    if response.get('event') == 'App\\Events\\ChatMessageEvent':
-                        await self._handle_chat_message(response)
-                except asyncio.exceptions.CancelledError:
-                    break
-        logger.info(f"Disconnected from websocket {self._socket_id}")
+        self._dispatch_queue = asyncio.Queue(maxsize=self.dispatch_queue_size)
+        background_tasks = [asyncio.create_task(self._dispatch_worker()) for _ in range(self.max_workers)]
+        background_tasks.append(asyncio.create_task(self.scheduler.run()))
+        self._polling = True
+        for channel in self.channels.values():
+            if channel.stream is not None:
+                channel.stream.start()
+        try:
+            await self.connection.run()
+        except asyncio.exceptions.CancelledError:
+            pass
+        finally:
+            self._polling = False
+            for channel in self.channels.values():
+                if channel.stream is not None:
+                    channel.stream.stop()
+            for task in background_tasks:
+                task.cancel()
+            await asyncio.gather(*background_tasks, return_exceptions=True)
+            self.stop_recording()
+            if self.archive is not None:
+                self.archive.flush(timeout=5.0)
         self._is_active = False
 
-    async def _handle_chat_message(self, inbound_message: dict) -> None:
+    async def _handle_frame(self, frame: dict) -> bool:
         """
-        Handles incoming messages, checks if the message.content is in dict of handled commands / messages
+        Called by the connection for every inbound frame that isn't part of the pusher protocol.
 
-        :param inbound_message: Raw inbound message from socket
+        :param frame: Inbound frame from the socket
+        :return: Whether the frame was queued for the handlers
         """
-        message: KickMessage = message_from_data(inbound_message)
-        if message.sender.username == self.client.bot_name:
+        event = frame.get('event')
+        # Dispatch table lookup on the event name. Events without handlers are dropped before their data is decoded.
+        if event == CHAT_MESSAGE:
+            channel = self._pusher_channels.get(frame.get('channel'))
+            if channel is None or frame.get('channel') != channel.pusher_channel:
+                return False
+            if self.archive is not None:
+                self.archive.add(channel.streamer_slug, frame.get('data'))
+            if not self._has_chat_handlers(channel) and event not in self._event_handlers:
+                return False
+        else:
+            if event == CHATROOM_UPDATED:
+                self._update_chatroom_settings(frame)
+            elif event in STREAM_EVENTS:
+                self._update_stream_state(frame)
+            if event not in self._event_handlers or frame.get('channel') not in self._pusher_channels:
+                return False
+        await self._dispatch_queue.put(frame)
+        return True
+
+    def _update_chatroom_settings(self, frame: dict) -> None:
+        """
+        Keep the chatroom settings (and the chat policy) of a channel current, as soon as the update is received.
+        """
+        channel = self._pusher_channels.get(frame.get('channel'))
+        if channel is None:
             return
+        event = KickEvent(frame.get('event'), frame.get('channel'), channel.streamer_slug, frame.get('data'))
+        try:
+            channel.policy.update(event.data)
+        except (ValueError, TypeError, AttributeError):
+            logger.warning("Ignoring invalid chatroom settings update for %s: %r", channel.streamer_name, frame)
 
-        content = message.content.casefold()
-        command = message.args[0].casefold()
-        logger.debug(f"New Message from {message.sender.username} | MESSAGE: {content!r}")
-
-        if content in self.handled_messages:
-            message_func = self.handled_messages[content]
-            await message_func(self, message)
-            logger.info(f"Handled Message: {content!r} from user {message.sender.username} ({message.sender.user_id}) | "
-                        f"Called Function: '{message_func.__name__}'")
-
-        elif command in self.handled_commands:
-            command_func = self.handled_commands[command]
-            await command_func(self, message)
-            logger.info(f"Handled Command: {command!r} from user {message.sender.username} ({message.sender.user_id}) | "
-                        f"Called Function: '{command_func.__name__}'")
-
-    async def _join_chatroom(self, chatroom_id: int) -> None:
+    def _update_stream_state(self, frame: dict) -> None:
+        """
+        Pass a live / offline / livestream update event to the stream tracker of the channel.
         """
-         Join the chatroom websocket.
+        channel = self._pusher_channels.get(frame.get('channel'))
+        if channel is None or channel.stream is None:
+            return
+        event = KickEvent(frame.get('event'), frame.get('channel'), channel.streamer_slug, frame.get('data'))
+        try:
+            channel.stream.handle_event(event.event, event.data)
+        except (ValueError, TypeError, AttributeError):
+            logger.warning("Ignoring invalid stream update for %s: %r", channel.streamer_name, frame)
 
-         :param chatroom_id: ID of the chatroom, mainly the streamer to monitor
-         """
-        join_command = {'event': 'pusher:subscribe', 'data': {'auth': '', 'channel': f"chatrooms.{chatroom_id}.v2"}}
-        await self._send(join_command)
-        join_response = await self._recv()
-        if join_response.get('event') != "pusher_internal:subscription_succeeded":
-            raise KickBotException(f"Error when attempting to join chatroom {chatroom_id}. Response: {join_response}")
-        logger.info(f"Bot Joined chatroom {chatroom_id} ({self.streamer_name})")
+    async def _handle_stream_change(self, channel: KickChannel, handler: Callable, state: StreamState,
+                                    trigger: str) -> None:
+        """
+        Call a live / offline / viewer threshold handler. Runs in its own task, started by the stream tracker.
+        """
+        _current_channel.set(channel)
+        try:
+            await self._call_handler(handler, state, trigger=trigger)
+        except Exception:
+            logger.exception("Error in stream handler '%s'", handler.__name__)
+            return
+        logger.info("Handled Stream change: %r in %s | Called Function: '%s'",
+                    trigger, channel.streamer_name, handler.__name__)
 
-    async def _handle_first_connect(self, connection_response: dict) -> None:
+    def _collect_metrics(self) -> list[Sample]:
+        """
+        Values the bot already keeps track of, read when the metrics are exported.
+        """
+        labels = {'bot': self.client.bot_name or self.client.username}
+        cache = self.cache.stats()
+        samples = [
+            Sample(CONNECTS, COUNTER, self.connection.connects, labels),
+            Sample(RECONNECTS, COUNTER, self.connection.reconnects, labels),
+            Sample(CONNECTED, GAUGE, int(self.connection.is_connected), labels),
+            Sample(DISPATCH_QUEUE_DEPTH, GAUGE, self._dispatch_queue.qsize() if self._dispatch_queue else 0, labels),
+            Sample(CACHE_HITS, COUNTER, cache['hits'], labels),
+            Sample(CACHE_MISSES, COUNTER, cache['misses'], labels),
+            Sample(CACHE_COALESCED, COUNTER, cache['coalesced'], labels),
+        ]
+        if isinstance(self.connection, RedundantConnection):
+            samples.append(Sample(DUPLICATE_FRAMES, COUNTER, self.connection.duplicates, labels))
+        if self.archive is not None:
+            archive = self.archive.stats()
+            samples += [
+                Sample(ARCHIVE_WRITTEN, COUNTER, archive['written'], labels),
+                Sample(ARCHIVE_DROPPED, COUNTER, archive['dropped'], labels),
+                Sample(ARCHIVE_QUEUE_DEPTH, GAUGE, archive['queued'], labels),
+            ]
+        for priority, depth in self.outbound.depths().items():
+            samples.append(Sample(OUTBOUND_QUEUE_DEPTH, GAUGE, depth, {**labels, 'priority': priority}))
+        return samples
+
+    def _has_chat_handlers(self, channel: KickChannel) -> bool:
         """
-        Handle the initial response received from the websocket.
+        Whether any handler could be called for a chat message in the channel. If not, the message payload
+        doesn't need to be decoded.
+        """
+        return bool(self.router or channel.router or self.raid_handlers or channel.raid_handlers)
 
-        :param connection_response: Initial response when connecting to the socket
+    async def _dispatch_worker(self) -> None:
+        """
+        Takes inbound messages off the dispatch queue and runs their handlers.
+        self.max_workers of these run at once, so slow handlers don't stop the bot from reading the socket.
+        Once the queue is full, _poll waits on put() until a worker frees up a slot (backpressure).
+        """
+        while True:
+            inbound_message = await self._dispatch_queue.get()
+            try:
+                event = inbound_message.get('event')
+                if event in self._event_handlers:
+                    await self._handle_event(inbound_message)
+                if event == CHAT_MESSAGE:
+                    await self._handle_chat_message(inbound_message)
+            except Exception:
+                logger.exception("Unhandled error while handling inbound message")
+            finally:
+                self._dispatch_queue.task_done()
+
+    async def _handle_event(self, frame: dict) -> None:
         """
-        if connection_response.get('event') != 'pusher:connection_established':
-            raise Exception('Error establishing connection to socket.')
-        self._socket_id = json.loads(connection_response.get('data')).get('socket_id')
-        logger.info(f"Successfully Connected to socket... Socket ID: {self._socket_id}")
+        Call the event handlers of an inbound pusher event.
 
-    async def _run_timed_event(self, frequency_time: timedelta, timed_function: Callable):
+        :param frame: Raw inbound frame from socket
+        """
+        channel = self._pusher_channels.get(frame.get('channel'))
+        if channel is None:
+            return
+        handlers = [handler for handler, handler_channel in self._event_handlers.get(frame.get('event'), [])
+                    if handler_channel is None or handler_channel is channel]
+        if not handlers:
+            return
+        _current_channel.set(channel)
+        event = KickEvent(frame.get('event'), frame.get('channel'), channel.streamer_slug, frame.get('data'))
+        with self.metrics.span(SPAN_EVENT, {'event': event.name, 'streamer': channel.streamer_slug}):
+            for handler in handlers:
+                await self._call_handler(handler, event, trigger=event.name)
+                logger.info("Handled Event: %r in %s | Called Function: '%s'",
+                            event.name, channel.streamer_name, handler.__name__)
+
+    def _subscribe_event_channels(self, channel: KickChannel) -> None:
+        """
+        Add the event channels of a streamer to the subscribed pusher channels. If already connected,
+        they're subscribed to right away, else on connect.
+        """
+        for pusher_channel in channel.event_channels:
+            if pusher_channel in self._pusher_channels:
+                continue
+            self._pusher_channels[pusher_channel] = channel
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                continue
+            if self.connection.is_connected:
+                loop.create_task(self.connection.subscribe(pusher_channel))
+
+    async def _call_handler(self, handler: Callable, *args, trigger: str = '') -> None:
         """
-        Launched in a thread when a user calls bot.add_timed_event, runs until bot is inactive
+        Call a handler function, cancelling it if it runs longer than self.handler_timeout.
 
-        :param frequency_time: Frequency to call the timed function
-        :param timed_function: timed function to be called
+        :param handler: Async handler function
+        :param trigger: Command / message / event that triggered the handler, for metrics
         """
-        while self._is_active:
-            await asyncio.sleep(frequency_time.total_seconds())
-            await timed_function(self)
-            logger.info(f"Timed Event | Called Function: {timed_function}")
+        metrics = self.metrics
+        if not metrics.enabled:
+            try:
+                await asyncio.wait_for(handler(self, *args), timeout=self.handler_timeout)
+            except asyncio.TimeoutError:
+                logger.error("Handler '%s' timed out after %s seconds.", handler.__name__, self.handler_timeout)
+            return
+        status = 'error'
+        start = time.perf_counter()
+        try:
+            with metrics.span(SPAN_HANDLER, {'handler': handler.__name__, 'trigger': trigger}):
+                await asyncio.wait_for(handler(self, *args), timeout=self.handler_timeout)
+            status = 'ok'
+        except asyncio.TimeoutError:
+            status = 'timeout'
+            logger.error("Handler '%s' timed out after %s seconds.", handler.__name__, self.handler_timeout)
+        finally:
+            metrics.observe(HANDLER_SECONDS, time.perf_counter() - start,
+                            labels={'handler': handler.__name__, 'trigger': trigger, 'status': status})
 
-    async def _send(self, command: dict) -> None:
+    async def _handle_chat_message(self, inbound_message: dict) -> None:
         """
-        Json dumps command and sends over socket.
+        Handles incoming messages, checks if the message.content is in dict of handled commands / messages
 
-        :param command: dictionary to convert to json command
+        :param inbound_message: Raw inbound message from socket
+        """
+        channel = self._pusher_channels.get(inbound_message.get('channel'))
+        if channel is None or not self._has_chat_handlers(channel):
+            return
+        message: KickMessage = message_from_data(inbound_message)
+        if message.sender.username == self.client.bot_name:
+            return
+        _current_channel.set(channel)
+        if self.raid_handlers or channel.raid_handlers:
+            await self._detect_raid(channel, message)
+
+        logger.debug("New Message in %s from %s | MESSAGE: %r",
+                     channel.streamer_name, message.sender.username, message.content)
+        routes = self._match_routes(channel, message.content)
+        if not routes:
+            return
+        with self.metrics.span(SPAN_MESSAGE, {'streamer': channel.streamer_slug, 'message.id': message.id or ''}):
+            for route in routes:
+                if route.cooldown is not None and not await self._check_cooldown(route, message):
+                    continue
+                await self._call_handler(route.handler, message, trigger=route.trigger)
+                logger.info("Handled %s: %r from user %s (%s) | Called Function: '%s'", route.kind.capitalize(),
+                            route.trigger, message.sender.username, message.sender.user_id, route.handler.__name__)
+
+    async def _detect_raid(self, channel: KickChannel, message: KickMessage) -> None:
+        """
+        Add the message to the raid detector of the channel, and call the raid handlers for any event.
         """
-        await self.sock.send(json.dumps(command))
+        if channel.raid_detector is None:
+            channel.raid_detector = RaidDetector(**self.raid_options)
+        events = channel.raid_detector.process(channel.streamer_slug, message.sender.username, message.content)
+        for event in events:
+            logger.warning("Raid detected in %s: %s %.2f (threshold %.2f), %s users", channel.streamer_name,
+                           event.kind, event.value, event.threshold, len(event.usernames))
+            for handler in channel.raid_handlers + self.raid_handlers:
+                await self._call_handler(handler, event, trigger=event.kind)
+
+    async def _check_cooldown(self, route: Route, message: KickMessage) -> bool:
+        """
+        Check the cooldown of a route. When on cooldown, the cooldown message is sent once per user.
 
-    async def _recv(self) -> dict:
+        :return: True if the handler can be called
+        """
+        status = route.cooldown.hit(message.sender.user_id)
+        if status == COOLDOWN_READY:
+            return True
+        if status == COOLDOWN_NOTIFY:
+            await self.reply_text(message, route.cooldown.message)
+        logger.debug("%s %r on cooldown for %s", route.kind.capitalize(), route.trigger, message.sender.username)
+        return False
+
+    def _match_routes(self, channel: KickChannel, content: str) -> list[Route]:
+        """
+        Match a message with the channels handlers and the handlers set for all streamers.
+        The channels message / command handler is used over one set for all streamers. Every other matching
+        handler is called once.
+        """
+        channel_routes = channel.router.match(content) if channel.router else []
+        bot_routes = self.router.match(content) if self.router else []
+        routes = []
+        handlers = set()
+        has_primary = False
+        for route in channel_routes + bot_routes:
+            is_primary = route.kind in ('message', 'command')
+            if (is_primary and has_primary) or route.handler in handlers:
+                continue
+            has_primary = has_primary or is_primary
+            handlers.add(route.handler)
+            routes.append(route)
+        return routes
+
+    def _new_channel(self, streamer_name: str) -> KickChannel:
+        channel = KickChannel(self, streamer_name)
+        if channel.streamer_slug in self.channels:
+            raise KickBotException(f"Streamer {streamer_name} already set.")
+        return channel
+
+    def _add_channel(self, channel: KickChannel) -> KickChannel:
+        if channel.streamer_slug in self.channels:
+            raise KickBotException(f"Streamer {channel.streamer_name} already set.")
+        self.channels[channel.streamer_slug] = channel
+        self._pusher_channels[channel.pusher_channel] = channel
+        if self._event_handlers:
+            self._subscribe_event_channels(channel)
+        if self.stream_options is not None:
+            self._track_stream(channel, self.stream_options)
+        if self.connection.is_connected:
+            # streamer set while the bot is running (async_set_streamer from a handler)
+            asyncio.get_running_loop().create_task(self.connection.subscribe(channel.pusher_channel))
+        return channel
+
+    def _track_stream(self, channel: KickChannel, tracker_options: dict) -> StreamTracker:
+        """
+        Create the stream tracker of a channel (or update its options), and subscribe to its live / offline events.
         """
-        Json loads command received from socket.
+        if channel.stream is None:
+            channel.stream = StreamTracker(channel, **tracker_options)
+            self._subscribe_event_channels(channel)
+            if self._polling:
+                channel.stream.start()
+        else:
+            for option, value in tracker_options.items():
+                if option not in ('live_interval', 'offline_interval', 'max_interval', 'event_delay'):
+                    raise KickBotException(f"Invalid stream tracker option: {option}")
+                setattr(channel.stream, option, value)
+        return channel.stream
+
+    def _add_stream_handler(self, handler: StreamHandler, streamer: Optional[str]) -> None:
+        if streamer is not None:
+            self._track_stream(self.get_channel(streamer), {}).handlers.append(handler)
+            return
+        self.track_stream()
+        self.stream_handlers.append(handler)
 
-        :return: dict / json inbound socket command
+    def _get_router(self, streamer: Optional[str]) -> CommandRouter:
+        if not self.channels:
+            raise KickBotException("Must set streamer name to monitor first.")
+        if streamer is not None:
+            return self.get_channel(streamer).router
+        return self.router
+
+    def _bind_channel(self, timed_function: Callable, streamer: Optional[str]) -> Callable:
+        """
+        Wrap a timed function so bot.send_text etc. go to the streamers chat when it's called.
         """
-        return json.loads(await self.sock.recv())
+        if streamer is None:
+            return timed_function
+        channel = self.get_channel(streamer)
+
+        @wraps(timed_function)
+        async def channel_timed_function(bot):
+            _current_channel.set(channel)
+            await timed_function(bot)
+        return channel_timed_function
@@ -0,0 +1,247 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+VIEWER_INFO_TTL = 60.0
+LEADERBOARD_TTL = 30.0
+VIEWER_COUNT_TTL = 15.0
+
+
+def default_cache_directory() -> str:
+    """
+    :return: $XDG_CACHE_HOME/kickbot, or ~/.cache/kickbot
+    """
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'kickbot')
+
+
+class CacheBackend(ABC):
+    """
+    Storage used by Cache. Subclass to share cached lookups between processes (i.e: redis, memcached).
+    Values are json compatible dicts / lists / numbers. None is never stored, so get returning None means a miss.
+    """
+    @abstractmethod
+    def get(self, key: str) -> Any:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+    def __len__(self) -> int:
+        return 0
+
+
+class MemoryCache(CacheBackend):
+    """
+    In-process cache backend, with a ttl per entry, and least recently used eviction past max_size entries.
+
+    :param max_size: Entries kept before the least recently used one is evicted
+    :param clock: Function returning the current time in seconds
+    """
+    def __init__(self, max_size: int = 10_000, clock: Callable[[], float] = time.monotonic) -> None:
+        self.max_size: int = max_size
+        self.clock: Callable[[], float] = clock
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: str) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= self.clock():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        self._data[key] = (self.clock() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class Cache:
+    """
+    Cache in front of the kick api lookups (viewer info, leaderboard, viewer count).
+
+    Concurrent async lookups of the same key are coalesced: one request is sent, and every caller waits for it.
+    Failed lookups (None) aren't cached.
+    """
+    def __init__(self, backend: Optional[CacheBackend] = None, enabled: bool = True) -> None:
+        self.backend: CacheBackend = backend if backend is not None else MemoryCache()
+        self.enabled: bool = enabled
+        self.hits: int = 0
+        self.misses: int = 0
+        self.coalesced: int = 0
+        self._in_flight: dict[Hashable, asyncio.Future] = {}
+
+    def get_or_load(self, key: str, loader: Callable[[], Any], ttl: float) -> Any:
+        """
+        Return the cached value of key, or call loader and cache its result for ttl seconds.
+
+        :param key: Cache key
+        :param loader: Function returning the value
+        :param ttl: Seconds to cache the value for
+        :return: Cached or loaded value
+        """
+        if not self.enabled:
+            return loader()
+        value = self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = loader()
+        if value is not None:
+            self.backend.set(key, value, ttl)
+        return value
+
+    async def async_get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: float) -> Any:
+        """
+        Async version of get_or_load. While a lookup of key is in flight, other lookups of key wait for it
+        instead of sending their own request.
+
+        :param key: Cache key
+        :param loader: Async function returning the value
+        :param ttl: Seconds to cache the value for
+        :return: Cached or loaded value
+        """
+        if not self.enabled:
+            return await loader()
+        value = self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(in_flight)
+        self.misses += 1
+        # The loader runs in its own task, so a caller being cancelled (i.e: by handler_timeout) doesn't cancel
+        # the lookup the other callers are waiting for
+        task = asyncio.ensure_future(self._load(key, loader, ttl))
+        self._in_flight[key] = task
+        task.add_done_callback(lambda done: self._loaded(key, done))
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: float) -> Any:
+        value = await loader()
+        if value is not None:
+            self.backend.set(key, value, ttl)
+        return value
+
+    def _loaded(self, key: str, task: asyncio.Future) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            # Retrieved, so an error isn't logged as never retrieved when every caller was cancelled
+            task.exception()
+
+    def invalidate(self, key: str) -> None:
+        self.backend.delete(key)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        """
+        :return: Hits, misses, coalesced lookups, hit rate, and amount of cached entries
+        """
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'hit_rate': round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            'size': len(self.backend),
+        }
+
+
+class ChannelCache:
+    """
+    Persistent cache of the ids of channels (channel id, chatroom id, user id and slug), which don't change.
+    With a cached entry, set_streamer doesn't wait for the streamer info request: it subscribes to the chatroom
+    right away, and the streamer info is refreshed in the background.
+
+    :param path: Json file the ids are stored in. Defaults to ~/.cache/kickbot/channels.json
+    """
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path: str = path or os.path.join(default_cache_directory(), 'channels.json')
+        self._channels: Optional[dict[str, dict]] = None
+        self._lock = threading.Lock()
+
+    def get(self, streamer_slug: str) -> Optional[dict]:
+        """
+        :param streamer_slug: Slug of the streamer, i.e: 'streamer-name'
+        :return: {'channel_id', 'chatroom_id', 'user_id', 'slug'}, or None if it isn't cached
+        """
+        with self._lock:
+            return self._load().get(streamer_slug)
+
+    def set(self, streamer_slug: str, ids: dict) -> None:
+        """
+        Store the ids of a channel, and write the file if they changed.
+
+        :param streamer_slug: Slug of the streamer, i.e: 'streamer-name'
+        :param ids: {'channel_id', 'chatroom_id', 'user_id', 'slug'}
+        """
+        with self._lock:
+            channels = self._load()
+            if channels.get(streamer_slug) == ids:
+                return
+            channels[streamer_slug] = ids
+            try:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w') as f:
+                    json.dump(channels, f)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.warning("Failed to write channel cache: %s", e)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._channels = {}
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    def _load(self) -> dict[str, dict]:
+        if self._channels is None:
+            try:
+                with open(self.path, 'r') as f:
+                    self._channels = json.load(f)
+            except FileNotFoundError:
+                self._channels = {}
+            except (OSError, ValueError) as e:
+                logger.warning("Ignoring unreadable channel cache %s: %r", self.path, e)
+                self._channels = {}
+        return self._channels
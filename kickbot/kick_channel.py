@@ -0,0 +1,166 @@
+import asyncio
+import logging
+
+from types import SimpleNamespace
+from typing import Callable, Optional
+
+from .kick_moderator import Moderator
+from .kick_policy import ChatPolicy
+from .kick_raid import RaidDetector
+from .kick_router import CommandRouter
+from .kick_helper import (
+    get_streamer_info,
+    get_chatroom_settings,
+    get_bot_settings,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class KickChannel:
+    """
+    A streamer / chatroom monitored by the bot. Holds the info, settings, moderator status and handlers of one channel.
+
+    Has the same client / streamer / chatroom attributes the kick_helper functions read from the bot,
+    so a channel can be passed to them in place of the bot.
+    """
+    def __init__(self, bot, streamer_name: str) -> None:
+        self.bot = bot
+        self.client = bot.client
+        self.streamer_name: str = streamer_name
+        self.streamer_slug: str = streamer_name.replace('_', '-')
+        self.streamer_info: Optional[dict] = None
+        self.chatroom_info: Optional[dict] = None
+        self.chatroom_settings: Optional[dict] = None
+        self.chatroom_id: Optional[int] = None
+        self.bot_settings: Optional[dict] = None
+        self.is_mod: bool = False
+        self.is_super_admin: bool = False
+        self.moderator: Optional[Moderator] = None
+        self.router: CommandRouter = CommandRouter()
+        self.raid_detector: Optional[RaidDetector] = None
+        self.raid_handlers: list[Callable] = []
+        self.stream = None  # kick_stream.StreamTracker, once the stream is tracked
+        self.policy: ChatPolicy = ChatPolicy(self, enabled=bot.enforce_chat_settings)
+
+    @property
+    def outbound(self):
+        return self.bot.outbound
+
+    @property
+    def cache(self):
+        return self.bot.cache
+
+    @property
+    def archive(self):
+        return self.bot.archive
+
+    @property
+    def pusher_channel(self) -> str:
+        """
+        Name of the pusher channel the chat messages of this channel are sent on.
+        """
+        return f"chatrooms.{self.chatroom_id}.v2"
+
+    @property
+    def event_channels(self) -> list[str]:
+        """
+        Other pusher channels of this channel, with events like subscriptions, follows, and the stream going live.
+        Only subscribed to when an event handler is added.
+        """
+        return [f"channel.{self.streamer_info.get('id')}", f"chatrooms.{self.chatroom_id}"]
+
+    def load(self) -> None:
+        """
+        Retrieve the streamer info, chatroom settings, and bot settings of the channel, all at the same time.
+        When the channel ids are in the bot's channel cache, the streamer info is refreshed in the background instead.
+        """
+        cached = self._load_cached_ids()
+        futures = [self.client.submit(request, self) for request in self._load_requests(cached)]
+        for future in futures:
+            future.result()
+        self._loaded(cached)
+
+    async def async_load(self) -> None:
+        """
+        Non-blocking version of load.
+        """
+        cached = self._load_cached_ids()
+        await asyncio.gather(*(self.client.run_async(request, self) for request in self._load_requests(cached)))
+        self._loaded(cached)
+
+    @staticmethod
+    def _load_requests(cached: bool) -> list[Callable]:
+        if cached:
+            return [get_chatroom_settings, get_bot_settings]
+        return [get_streamer_info, get_chatroom_settings, get_bot_settings]
+
+    def _load_cached_ids(self) -> bool:
+        """
+        Set the channel / chatroom ids from the channel cache. streamer_info only has the ids until it's refreshed.
+
+        :return: True if the ids were cached
+        """
+        cache = self.bot.channel_cache
+        ids = cache.get(self.streamer_slug) if cache is not None else None
+        if not ids or ids.get('chatroom_id') is None:
+            return False
+        self.chatroom_id = ids['chatroom_id']
+        self.chatroom_info = {'id': self.chatroom_id}
+        self.streamer_info = {'id': ids.get('channel_id'), 'user_id': ids.get('user_id'), 'slug': ids.get('slug'),
+                              'chatroom': self.chatroom_info}
+        return True
+
+    def _cache_ids(self, streamer_info: dict) -> None:
+        cache = self.bot.channel_cache
+        if cache is None:
+            return
+        cache.set(self.streamer_slug, {
+            'channel_id': streamer_info.get('id'),
+            'chatroom_id': (streamer_info.get('chatroom') or {}).get('id'),
+            'user_id': streamer_info.get('user_id'),
+            'slug': streamer_info.get('slug'),
+        })
+
+    def _refresh_streamer_info(self) -> None:
+        """
+        Retrieve the full streamer info of a channel loaded from the channel cache (runs in the http executor).
+        """
+        info = SimpleNamespace(client=self.client, streamer_slug=self.streamer_slug, streamer_name=self.streamer_name)
+        try:
+            get_streamer_info(info)
+        except Exception as e:
+            logger.warning("Failed to refresh the streamer info of %s: %s", self.streamer_name, e)
+            return
+        if info.chatroom_id != self.chatroom_id:
+            logger.warning("Chatroom id of %s changed from %s to %s. Restart the bot to follow the new chatroom.",
+                           self.streamer_name, self.chatroom_id, info.chatroom_id)
+        else:
+            self.streamer_info = info.streamer_info
+            self.chatroom_info = info.chatroom_info
+        self._cache_ids(info.streamer_info)
+
+    def _loaded(self, cached: bool) -> None:
+        if cached:
+            self.client.submit(self._refresh_streamer_info)
+        else:
+            self._cache_ids(self.streamer_info)
+        self.policy.refresh()
+        if self.is_mod:
+            self.moderator = Moderator(self)
+            logger.info("Bot is confirmed as a moderator for %s", self.streamer_name)
+        else:
+            logger.warning("Bot is not a moderator in the stream of %s. To access moderator functions, make the "
+                           "bot a mod. (You can still send messages and reply's, bot moderator status is recommended)",
+                           self.streamer_name)
+
+    @property
+    def handled_commands(self) -> dict[str, Callable]:
+        return self.router.commands
+
+    @property
+    def handled_messages(self) -> dict[str, Callable]:
+        return self.router.messages
+
+    def __repr__(self) -> str:
+        return f"KickChannel({self.streamer_name!r}, chatroom_id={self.chatroom_id})"
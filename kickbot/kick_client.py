@@ -1,33 +1,263 @@
+import asyncio
+import re
 import requests
 import logging
+import time
 import tls_client
 
-from typing import Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+from urllib.parse import urlsplit
 from requests.cookies import RequestsCookieJar
 
 from .constants import BASE_HEADERS, KickAuthException
-from .selenium_help import get_cookies_and_tokens_via_selenium
+from .kick_metrics import Metrics, HTTP_REQUEST_SECONDS, HTTP_RESPONSES, SPAN_HTTP
+from .kick_session import SessionCache, cookies_from_list, cookies_to_list
 
 logger = logging.getLogger(__name__)
 
+_ID_SEGMENT_RE = re.compile(r'/\d+(?=/|$)')
+
 
 class KickClient:
     """
     Class mainly for authenticating user, and handling http requests using tls_client to bypass cloudflare
     """
-    def __init__(self, username: str, password: str) -> None:
+    def __init__(self,
+                 username: str,
+                 password: str,
+                 http_workers: int = 8,
+                 session_cache: Optional[SessionCache] = None,
+                 executor: Optional[ThreadPoolExecutor] = None,
+                 cookies: Optional[RequestsCookieJar] = None,
+                 login: bool = True,
+                 metrics: Optional[Metrics] = None) -> None:
+        """
+        :param username: Email / username of the user bot
+        :param password: Password of the user bot
+        :param http_workers: Threads used for non-blocking requests
+        :param session_cache: Reuse the login session of the last run, stored (encrypted) on disk
+        :param executor: Executor for non-blocking requests, to share one between clients (instead of http_workers)
+        :param cookies: Cookies sent with the first login request, i.e: cloudflare clearance cookies
+        :param login: Log in now. If False, call login() before making requests.
+        :param metrics: Records the latency and status code of requests
+        """
         self.username: str = username
         self.password: str = password
         self.scraper = tls_client.Session(
             client_identifier="chrome_116",
             random_tls_extension_order=True
         )
+        self._executor = executor or ThreadPoolExecutor(max_workers=http_workers, thread_name_prefix="kickbot-http")
         self.xsrf: Optional[str] = None
-        self.cookies: Optional[RequestsCookieJar] = None
+        self.cookies: Optional[RequestsCookieJar] = cookies
         self.auth_token: Optional[str] = None
         self.user_data: Optional[dict] = None
         self.user_id: Optional[int] = None
-        self._login()
+        self.bot_name: Optional[str] = None
+        self.session_cache: Optional[SessionCache] = session_cache
+        self.metrics: Metrics = metrics if metrics is not None else Metrics()
+        self._session_created_at: Optional[float] = None
+        if login:
+            self.login()
+
+    def login(self) -> None:
+        """
+        Authenticate the user bot, reusing the cached session if there is a valid one.
+        """
+        if not self._restore_session():
+            self._login()
+            self._save_session()
+
+    async def run_async(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        """
+        Run a blocking function (normally a request made with self.scraper) in the client's http executor,
+        so the event loop can keep reading from the websocket while the request is in flight.
+
+        :param func: Blocking function to call
+        :return: Return value of the function
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    def submit(self, func: Callable, *args: Any, **kwargs: Any) -> Future:
+        """
+        Start a blocking function in the client's http executor, without waiting for it.
+        For requests that can run at the same time outside an event loop.
+
+        :param func: Blocking function to call
+        :return: Future of the return value
+        """
+        return self._executor.submit(func, *args, **kwargs)
+
+    def get(self, url: str, endpoint: Optional[str] = None, **kwargs: Any) -> requests.Response:
+        """
+        Blocking GET request with the scraper (tls-client), recorded in the http metrics.
+
+        :param url: Url to request
+        :param endpoint: Endpoint name for metrics. Defaults to the url path, with numeric ids replaced by {id}
+        :return: Response from the request
+        """
+        return self._request('GET', self.scraper.get, url, endpoint, **kwargs)
+
+    def post(self, url: str, endpoint: Optional[str] = None, **kwargs: Any) -> requests.Response:
+        """
+        Blocking POST request with the scraper (tls-client), recorded in the http metrics.
+
+        :param url: Url to request
+        :param endpoint: Endpoint name for metrics. Defaults to the url path, with numeric ids replaced by {id}
+        :return: Response from the request
+        """
+        return self._request('POST', self.scraper.post, url, endpoint, **kwargs)
+
+    async def async_get(self, url: str, endpoint: Optional[str] = None, **kwargs: Any) -> requests.Response:
+        """
+        Non-blocking GET request with the scraper (tls-client).
+
+        :param url: Url to request
+        :param endpoint: Endpoint name for metrics. Defaults to the url path, with numeric ids replaced by {id}
+        :return: Response from the request
+        """
+        return await self._async_request('GET', self.scraper.get, url, endpoint, **kwargs)
+
+    async def async_post(self, url: str, endpoint: Optional[str] = None, **kwargs: Any) -> requests.Response:
+        """
+        Non-blocking POST request with the scraper (tls-client).
+
+        :param url: Url to request
+        :param endpoint: Endpoint name for metrics. Defaults to the url path, with numeric ids replaced by {id}
+        :return: Response from the request
+        """
+        return await self._async_request('POST', self.scraper.post, url, endpoint, **kwargs)
+
+    def _request(self,
+                 method: str,
+                 request: Callable,
+                 url: str,
+                 endpoint: Optional[str],
+                 **kwargs: Any) -> requests.Response:
+        metrics = self.metrics
+        if not metrics.enabled:
+            return request(url, **kwargs)
+        endpoint = _endpoint_name(url, endpoint)
+        status = 'error'
+        start = time.perf_counter()
+        try:
+            with metrics.span(SPAN_HTTP, {'http.method': method, 'http.route': endpoint}):
+                response = request(url, **kwargs)
+            status = str(response.status_code)
+            return response
+        finally:
+            self._record_request(method, endpoint, status, start)
+
+    async def _async_request(self,
+                             method: str,
+                             request: Callable,
+                             url: str,
+                             endpoint: Optional[str],
+                             **kwargs: Any) -> requests.Response:
+        metrics = self.metrics
+        if not metrics.enabled:
+            return await self.run_async(request, url, **kwargs)
+        endpoint = _endpoint_name(url, endpoint)
+        status = 'error'
+        start = time.perf_counter()
+        try:
+            with metrics.span(SPAN_HTTP, {'http.method': method, 'http.route': endpoint}):
+                response = await self.run_async(request, url, **kwargs)
+            status = str(response.status_code)
+            return response
+        finally:
+            self._record_request(method, endpoint, status, start)
+
+    def _record_request(self, method: str, endpoint: str, status: str, start: float) -> None:
+        labels = {'method': method, 'endpoint': endpoint}
+        self.metrics.observe(HTTP_REQUEST_SECONDS, time.perf_counter() - start, labels=labels)
+        self.metrics.inc(HTTP_RESPONSES, labels={**labels, 'status': status})
+
+    def refresh_session(self) -> None:
+        """
+        Request the token provider again for fresh xsrf / session cookies, keeping the auth token.
+        """
+        response = self._request_token_provider()
+        if response.status_code != 200 or 'XSRF-TOKEN' not in response.cookies:
+            raise KickAuthException(f"Error refreshing session cookies. Status Code: {response.status_code}")
+        self.cookies.update(response.cookies)
+        self.xsrf = response.cookies['XSRF-TOKEN']
+        self._save_session()
+        logger.info("Refreshed session cookies")
+
+    def export_session(self) -> dict:
+        """
+        Login state of the client (auth token, xsrf token, cookies, and user data), i.e: to hand a login
+        to another process. Contains credentials, keep it private.
+
+        :return: Session dictionary, for import_session
+        """
+        if self._session_created_at is None:
+            self._session_created_at = time.time()
+        return {
+            'auth_token': self.auth_token,
+            'xsrf': self.xsrf,
+            'cookies': cookies_to_list(self.cookies) if self.cookies is not None else [],
+            'user_data': self.user_data,
+            'created_at': self._session_created_at,
+        }
+
+    def import_session(self, session: dict) -> None:
+        """
+        Use the login state exported by another client (see export_session), without sending any request.
+
+        :param session: Session dictionary from export_session
+        """
+        self.auth_token = session.get('auth_token')
+        self.xsrf = session.get('xsrf')
+        self.cookies = cookies_from_list(session.get('cookies', []))
+        self.user_data = session.get('user_data') or {}
+        self.bot_name = self.user_data.get('username')
+        self.user_id = self.user_data.get('id')
+        self._session_created_at = session.get('created_at')
+
+    def _restore_session(self) -> bool:
+        """
+        Load the cached session, and validate it with a single user info request.
+
+        :return: True if the cached session is valid, False if a login is required
+        """
+        if self.session_cache is None:
+            return False
+        session = self.session_cache.load(self.username, self.password)
+        if session is None:
+            return False
+        self.auth_token = session.get('auth_token')
+        self.xsrf = session.get('xsrf')
+        cookies = cookies_from_list(session.get('cookies', []))
+        if self.cookies is not None:
+            cookies.update(self.cookies)
+        self.cookies = cookies
+        try:
+            self._get_user_info()
+        except KickAuthException:
+            logger.info("Cached session is no longer valid. Logging in...")
+            self.session_cache.clear(self.username)
+            return False
+        logger.info("Restored cached login session...")
+        self._session_created_at = session.get('created_at')
+        if self.session_cache.needs_refresh(session):
+            try:
+                self.refresh_session()
+            except (KickAuthException, requests.exceptions.RequestException) as e:
+                logger.warning("Failed to refresh session cookies: %s", e)
+        return True
+
+    def _save_session(self) -> None:
+        if self.session_cache is None:
+            return
+        try:
+            self.session_cache.save(self.username, self.password, self.export_session())
+        except OSError as e:
+            logger.warning("Failed to write session cache: %s", e)
 
     def _login(self) -> None:
         """
@@ -49,6 +279,12 @@ class KickClient:
 
         except (requests.exceptions.HTTPError, requests.exceptions.JSONDecodeError):
             logger.info("Cloudflare Block. Getting tokens and cookies with chromedriver...")
+            # Imported here, selenium / undetected_chromedriver are optional (pip install kickbot[browser])
+            try:
+                from .selenium_help import get_cookies_and_tokens_via_selenium
+            except ImportError as e:
+                raise KickAuthException(f"Cloudflare blocked the token provider request, and the chromedriver "
+                                        f"fallback isn't installed ({e}). Install it with: pip install kickbot[browser]")
             token_data, cookies = get_cookies_and_tokens_via_selenium()
             logger.info("Done retrieving data via selenium")
             self.cookies = cookies
@@ -89,7 +325,7 @@ class KickClient:
         headers = BASE_HEADERS.copy()
         headers['Authorization'] = "Bearer " + self.auth_token
         headers['X-Xsrf-Token'] = self.xsrf
-        user_info_response = self.scraper.get(url, cookies=self.cookies, headers=headers)
+        user_info_response = self.get(url, cookies=self.cookies, headers=headers)
         if user_info_response.status_code != 200:
             raise KickAuthException(f"Error fetching user info from {url}")
         data = user_info_response.json()
@@ -107,7 +343,7 @@ class KickClient:
         headers = BASE_HEADERS.copy()
         headers['Referer'] = "https://kick.com"
         headers['path'] = "/kick-token-provider"
-        return self.scraper.get(url, cookies=self.cookies, headers=headers)
+        return self.get(url, cookies=self.cookies, headers=headers)
 
     def _send_login_request(self, name_field_name: str, token_field: str, login_token: str) -> requests.Response:
         """
@@ -128,4 +364,11 @@ class KickClient:
             "isMobileRequest": True,
             "password": self.password,
         }
-        return self.scraper.post(url, json=payload, cookies=self.cookies, headers=headers)
+        return self.post(url, json=payload, cookies=self.cookies, headers=headers)
+
+
+def _endpoint_name(url: str, endpoint: Optional[str]) -> str:
+    """
+    Endpoint label of a request: the url path, with numeric ids replaced by {id}, unless given.
+    """
+    return endpoint or _ID_SEGMENT_RE.sub('/{id}', urlsplit(url).path)
@@ -0,0 +1,422 @@
+import asyncio
+import logging
+import random
+import time
+import websockets
+
+from functools import partial
+from typing import Awaitable, Callable, Hashable, Optional
+from websockets.exceptions import WebSocketException
+
+from . import kick_json
+from .constants import KickBotException
+from .kick_cooldown import ExpiringDict
+from .kick_metrics import Metrics, FRAMES_RECEIVED, FRAME_DECODE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class _DeadConnection(Exception):
+    ...
+
+
+class PusherConnection:
+    """
+    Supervised connection to the pusher websocket.
+
+    Subscribes to every channel returned by `channels`, passes inbound frames to `on_frame`, and keeps the
+    connection alive: pusher:ping / pusher:pong heartbeats after `activity_timeout` seconds without frames,
+    reconnecting (with exponential backoff and jitter) and re-subscribing when the connection is closed or dead.
+    Handlers don't see reconnects, apart from any messages sent while disconnected.
+    """
+    def __init__(self,
+                 uri: str,
+                 channels: Callable[[], list[str]],
+                 on_frame: Callable[[dict], Awaitable[None]],
+                 pong_timeout: float = 30.0,
+                 min_backoff: float = 1.0,
+                 max_backoff: float = 60.0,
+                 metrics: Optional[Metrics] = None) -> None:
+        self.uri: str = uri
+        self.channels = channels
+        self.on_frame = on_frame
+        self.pong_timeout: float = pong_timeout
+        self.min_backoff: float = min_backoff
+        self.max_backoff: float = max_backoff
+        self.sock = None
+        self.socket_id: Optional[str] = None
+        self.activity_timeout: float = 120.0
+        self.subscribed: set[str] = set()
+        self.connects: int = 0
+        self.reconnects: int = 0
+        self.reconnect_seconds: float = 0.0
+        self.last_frame_at: Optional[float] = None
+        self.recorder = None
+        self.metrics: Metrics = metrics if metrics is not None else Metrics()
+        self._disconnected_at: Optional[float] = None
+        self._closed: bool = False
+        self._subscribe_attempts: dict[str, int] = {}
+        self._retry_tasks: set[asyncio.Task] = set()
+
+    @property
+    def is_connected(self) -> bool:
+        return self.sock is not None and self.socket_id is not None
+
+    def stats(self) -> dict:
+        """
+        :return: Connection metrics: connects, reconnects, and total seconds spent reconnecting
+        """
+        return {
+            'connected': self.is_connected,
+            'socket_id': self.socket_id,
+            'connects': self.connects,
+            'reconnects': self.reconnects,
+            'reconnect_seconds': round(self.reconnect_seconds, 3),
+            'subscribed_channels': len(self.subscribed),
+        }
+
+    async def run(self) -> None:
+        """
+        Connect and read frames until close() is called, reconnecting whenever the connection drops.
+        """
+        attempt = 0
+        while not self._closed:
+            try:
+                async with websockets.connect(self.uri) as self.sock:
+                    await self._handle_first_connect(await self._recv())
+                    attempt = 0
+                    await self._subscribe_all()
+                    await self._read_frames()
+            except (WebSocketException, OSError, asyncio.TimeoutError, _DeadConnection) as e:
+                if self._closed:
+                    break
+                logger.warning("Websocket connection lost (%r). Reconnecting...", e)
+            finally:
+                self._mark_disconnected()
+            if self._closed:
+                break
+            delay = min(self.max_backoff, self.min_backoff * 2 ** attempt)
+            delay = random.uniform(delay / 2, delay)
+            attempt += 1
+            logger.info("Reconnecting to websocket in %.1f seconds (attempt %s)", delay, attempt)
+            await asyncio.sleep(delay)
+
+    async def close(self) -> None:
+        """
+        Stop reconnecting and close the websocket.
+        """
+        self._closed = True
+        if self.sock is not None:
+            await self.sock.close()
+
+    async def subscribe(self, channel: str) -> None:
+        """
+        Subscribe to a pusher channel now, if connected. Channels returned by `channels` are
+        (re-)subscribed on every connect anyway.
+
+        :param channel: Pusher channel name, i.e: chatrooms.{id}.v2
+        """
+        if self.is_connected and channel not in self.subscribed:
+            await self.send({'event': 'pusher:subscribe', 'data': {'auth': '', 'channel': channel}})
+
+    async def send(self, command: dict) -> None:
+        """
+        Json dumps command and sends over socket.
+
+        :param command: dictionary to convert to json command
+        """
+        await self.sock.send(kick_json.dumps(command))
+
+    async def _recv(self) -> dict:
+        """
+        Read the next frame. Frames that can't be decoded are logged and skipped.
+        """
+        while True:
+            raw_frame = await self.sock.recv()
+            if self.recorder is not None:
+                self.recorder.record(raw_frame)
+            self.last_frame_at = time.monotonic()
+            metrics = self.metrics
+            try:
+                if metrics.enabled:
+                    start = time.perf_counter()
+                    frame = kick_json.loads(raw_frame)
+                    metrics.observe(FRAME_DECODE_SECONDS, time.perf_counter() - start)
+                else:
+                    frame = kick_json.loads(raw_frame)
+            except ValueError as e:
+                logger.warning("Skipping frame that can't be decoded (%s): %.200r", e, raw_frame)
+                continue
+            if not isinstance(frame, dict):
+                logger.warning("Skipping frame that isn't an object: %.200r", raw_frame)
+                continue
+            if metrics.enabled:
+                metrics.inc(FRAMES_RECEIVED, labels={'event': frame.get('event')})
+            return frame
+
+    async def _handle_first_connect(self, connection_response: dict) -> None:
+        """
+        Handle the initial response received from the websocket.
+
+        :param connection_response: Initial response when connecting to the socket
+        """
+        if connection_response.get('event') != 'pusher:connection_established':
+            raise _DeadConnection(f"Error establishing connection to socket. Response: {connection_response}")
+        data = kick_json.loads(connection_response.get('data'))
+        self.socket_id = data.get('socket_id')
+        self.activity_timeout = float(data.get('activity_timeout') or self.activity_timeout)
+        self.connects += 1
+        if self._disconnected_at is not None:
+            self.reconnects += 1
+            self.reconnect_seconds += time.monotonic() - self._disconnected_at
+            self._disconnected_at = None
+        logger.info("Successfully Connected to socket... Socket ID: %s", self.socket_id)
+
+    async def _subscribe_all(self) -> None:
+        for channel in self.channels():
+            await self.send({'event': 'pusher:subscribe', 'data': {'auth': '', 'channel': channel}})
+
+    async def _read_frames(self) -> None:
+        """
+        Read frames until the connection is closed, handling pusher protocol events, and passing everything else
+        to on_frame. After activity_timeout seconds without frames, send a ping. No frame within pong_timeout
+        after that means the connection is dead.
+        """
+        while True:
+            try:
+                frame = await asyncio.wait_for(self._recv(), timeout=self.activity_timeout)
+            except asyncio.TimeoutError:
+                await self.send({'event': 'pusher:ping', 'data': {}})
+                try:
+                    frame = await asyncio.wait_for(self._recv(), timeout=self.pong_timeout)
+                except asyncio.TimeoutError:
+                    raise _DeadConnection(f"No pong received within {self.pong_timeout} seconds")
+            event = frame.get('event')
+            match event:
+                case 'pusher:ping':
+                    await self.send({'event': 'pusher:pong', 'data': {}})
+                case 'pusher:pong':
+                    pass
+                case 'pusher_internal:subscription_succeeded':
+                    self.subscribed.add(frame.get('channel'))
+                    self._subscribe_attempts.pop(frame.get('channel'), None)
+                    logger.info("Subscribed to %s", frame.get('channel'))
+                case 'pusher:subscription_error':
+                    self._retry_subscribe(frame)
+                case 'pusher:error':
+                    self._handle_error(frame)
+                case _:
+                    await self.on_frame(frame)
+
+    def _retry_subscribe(self, frame: dict) -> None:
+        """
+        A failed subscription only affects its channel: subscribe to it again after a backoff, while the
+        connection stays up for the other channels.
+        """
+        channel = frame.get('channel')
+        attempt = self._subscribe_attempts.get(channel, 0)
+        self._subscribe_attempts[channel] = attempt + 1
+        delay = min(self.max_backoff, self.min_backoff * 2 ** attempt)
+        delay = random.uniform(delay / 2, delay)
+        logger.warning("Error when attempting to join %s, retrying in %.1f seconds. Response: %s", channel, delay, frame)
+
+        async def retry() -> None:
+            await asyncio.sleep(delay)
+            if channel in self.channels():
+                try:
+                    await self.subscribe(channel)
+                except (WebSocketException, OSError):
+                    # Lost the connection, every channel is subscribed again on reconnect
+                    pass
+
+        task = asyncio.get_running_loop().create_task(retry())
+        self._retry_tasks.add(task)
+        task.add_done_callback(self._retry_tasks.discard)
+
+    def _handle_error(self, frame: dict) -> None:
+        """
+        Pusher error codes: 4000-4099 mean don't reconnect, 4100-4299 mean reconnect.
+        """
+        data = frame.get('data') or {}
+        try:
+            if isinstance(data, str):
+                data = kick_json.loads(data)
+            code = int(data.get('code') or 0)
+        except (ValueError, TypeError, AttributeError):
+            logger.warning("Ignoring pusher error that can't be read: %.200r", frame)
+            return
+        if 4000 <= code < 4100:
+            raise KickBotException(f"Pusher error, not reconnecting: {data}")
+        if 4100 <= code < 4300:
+            raise _DeadConnection(f"Pusher error: {data}")
+        logger.warning("Pusher error: %s", data)
+
+    def _mark_disconnected(self) -> None:
+        if self.socket_id is not None:
+            logger.info("Disconnected from websocket %s", self.socket_id)
+            self._disconnected_at = time.monotonic()
+        self.sock = None
+        self.socket_id = None
+        self.subscribed.clear()
+        # Every channel is subscribed again on connect
+        for task in self._retry_tasks:
+            task.cancel()
+        self._subscribe_attempts.clear()
+
+
+class RedundantConnection:
+    """
+    Hot-standby pusher connections: `copies` PusherConnections, each subscribed to every channel.
+
+    Every frame is passed to `on_frame` once, from whichever connection received it first, so handlers get the
+    latency of the fastest connection, and a stalled or reconnecting connection doesn't lose messages while another
+    one is up. Later copies are dropped: chat messages are matched by their channel and message id (read from the raw
+    data without decoding it), other events by their channel, name and data. Frames are remembered for `window`
+    seconds, up to `max_seen` of them.
+
+    Has the same interface as PusherConnection, the totals (connects, reconnects, ...) are summed over the connections.
+    """
+    def __init__(self,
+                 uri: str,
+                 channels: Callable[[], list[str]],
+                 on_frame: Callable[[dict], Awaitable[None]],
+                 copies: int = 2,
+                 window: float = 60.0,
+                 max_seen: int = 100_000,
+                 metrics: Optional[Metrics] = None,
+                 **connection_options) -> None:
+        if copies < 2:
+            raise KickBotException("A redundant connection needs at least 2 copies.")
+        self.channels = channels
+        self.on_frame = on_frame
+        self.metrics: Metrics = metrics if metrics is not None else Metrics()
+        self.connections: list[PusherConnection] = [
+            PusherConnection(uri, channels, partial(self._on_frame, index), metrics=self.metrics, **connection_options)
+            for index in range(copies)
+        ]
+        self.firsts: list[int] = [0] * copies
+        self.duplicates: int = 0
+        self.recorder = None
+        self._seen: ExpiringDict = ExpiringDict(window, max_size=max_seen)
+
+    @property
+    def uri(self) -> str:
+        return self.connections[0].uri
+
+    @uri.setter
+    def uri(self, uri: str) -> None:
+        for connection in self.connections:
+            connection.uri = uri
+
+    @property
+    def is_connected(self) -> bool:
+        return any(connection.is_connected for connection in self.connections)
+
+    @property
+    def socket_id(self) -> Optional[str]:
+        return next((connection.socket_id for connection in self.connections if connection.is_connected), None)
+
+    @property
+    def subscribed(self) -> set[str]:
+        return set().union(*(connection.subscribed for connection in self.connections))
+
+    @property
+    def connects(self) -> int:
+        return sum(connection.connects for connection in self.connections)
+
+    @property
+    def reconnects(self) -> int:
+        return sum(connection.reconnects for connection in self.connections)
+
+    @property
+    def reconnect_seconds(self) -> float:
+        return sum(connection.reconnect_seconds for connection in self.connections)
+
+    @property
+    def last_frame_at(self) -> Optional[float]:
+        return max((connection.last_frame_at for connection in self.connections
+                    if connection.last_frame_at is not None), default=None)
+
+    def stats(self) -> dict:
+        """
+        :return: Connection metrics summed over the connections, the amount of duplicate frames dropped, and the
+                 metrics of each connection, with the amount of frames it received first
+        """
+        return {
+            'connected': self.is_connected,
+            'socket_id': self.socket_id,
+            'connects': self.connects,
+            'reconnects': self.reconnects,
+            'reconnect_seconds': round(self.reconnect_seconds, 3),
+            'subscribed_channels': len(self.subscribed),
+            'duplicates': self.duplicates,
+            'connections': [{**connection.stats(), 'firsts': firsts}
+                            for connection, firsts in zip(self.connections, self.firsts)],
+        }
+
+    async def run(self) -> None:
+        """
+        Run every connection until close() is called. An error one of them doesn't reconnect from stops all of them.
+        """
+        tasks = [asyncio.create_task(connection.run()) for connection in self.connections]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if task.exception() is not None:
+                    raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def close(self) -> None:
+        for connection in self.connections:
+            await connection.close()
+
+    async def subscribe(self, channel: str) -> None:
+        for connection in self.connections:
+            await connection.subscribe(channel)
+
+    async def send(self, command: dict) -> None:
+        """
+        Send a command on the first connected connection.
+        """
+        for connection in self.connections:
+            if connection.is_connected:
+                await connection.send(command)
+                return
+        raise KickBotException("Not connected.")
+
+    async def _on_frame(self, index: int, frame: dict) -> None:
+        key = _frame_key(frame)
+        now = time.monotonic()
+        counts = self._seen.get(key, now=now)
+        if counts is None:
+            counts = [0] * len(self.connections)
+        # Copies delivered so far. A frame is new if this connection has now seen it more times than that.
+        delivered = max(counts)
+        counts[index] += 1
+        self._seen.set(key, counts, now=now)
+        if counts[index] <= delivered:
+            self.duplicates += 1
+            return
+        self.firsts[index] += 1
+        if self.recorder is not None:
+            self.recorder.record(kick_json.dumps(frame))
+        await self.on_frame(frame)
+
+
+def _frame_key(frame: dict) -> Hashable:
+    """
+    Key matching the copies of a frame received on different connections.
+    """
+    data = frame.get('data')
+    if isinstance(data, str):
+        # Chat messages (and most other events with an id) start with their uuid: {"id":"...", ...
+        # Ids are only unique within a channel, the same event can be sent to several channels.
+        if data.startswith('{"id":"'):
+            end = data.find('"', 7)
+            if end > 7:
+                return frame.get('channel'), data[7:end]
+        return frame.get('event'), frame.get('channel'), data
+    return frame.get('event'), frame.get('channel'), kick_json.dumps(data)
@@ -0,0 +1,145 @@
+import time
+
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from .constants import KickBotException
+
+COOLDOWN_READY = 0
+COOLDOWN_NOTIFY = 1
+COOLDOWN_SILENT = 2
+
+
+class ExpiringDict:
+    """
+    Bounded mapping whose entries expire `ttl` seconds after they were last set.
+
+    Entries are kept in the order they were set, which (with a single ttl) is also the order they expire in,
+    so expired entries are removed from the front in amortized O(1). When full, the oldest entry is dropped.
+    """
+    __slots__ = ('ttl', 'max_size', '_data')
+
+    def __init__(self, ttl: float, max_size: int = 100_000) -> None:
+        self.ttl: float = ttl
+        self.max_size: int = max_size
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not None
+
+    def get(self, key: Hashable, default: Any = None, now: Optional[float] = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        now = time.monotonic() if now is None else now
+        if entry[0] <= now:
+            del self._data[key]
+            return default
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, now: Optional[float] = None) -> None:
+        now = time.monotonic() if now is None else now
+        self._data[key] = (now + self.ttl, value)
+        self._data.move_to_end(key)
+        self.expire(now)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def expire(self, now: Optional[float] = None) -> None:
+        """
+        Remove expired entries from the front.
+        """
+        now = time.monotonic() if now is None else now
+        data = self._data
+        while data:
+            key, (expires_at, _) = next(iter(data.items()))
+            if expires_at > now:
+                break
+            del data[key]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+class Cooldown:
+    """
+    Cooldown / rate limit for a handler. Pass to add_command_handler, add_message_handler, etc.
+
+    :param seconds: Global cooldown. The handler is called at most once every `seconds`, for all users.
+    :param per_user: Per user cooldown. Each user can trigger the handler once every `per_user` seconds.
+    :param rate: Per user rate limit: each user can trigger the handler `rate` times every `per` seconds.
+    :param per: Window of the rate limit in seconds.
+    :param message: Reply sent once when a user hits the cooldown. The bot stays silent for that user until
+                    the cooldown ends.
+    :param max_users: Maximum amount of users tracked. Least recently seen users are dropped first.
+    """
+    def __init__(self,
+                 seconds: float = 0,
+                 per_user: float = 0,
+                 rate: Optional[int] = None,
+                 per: Optional[float] = None,
+                 message: Optional[str] = None,
+                 max_users: int = 100_000) -> None:
+        if seconds < 0 or per_user < 0:
+            raise KickBotException("Cooldown seconds can't be negative.")
+        if (rate is None) != (per is None) or (rate is not None and (rate < 1 or per <= 0)):
+            raise KickBotException("Cooldown rate and per must be set together, with rate >= 1 and per > 0.")
+        self.seconds: float = seconds
+        self.per_user: float = per_user
+        self.rate: Optional[int] = rate
+        self.per: Optional[float] = per
+        self.message: Optional[str] = message
+        self._ready_at: float = 0.0
+        self._user_ready_at = ExpiringDict(per_user, max_users) if per_user else None
+        # Generic cell rate algorithm: a single "theoretical arrival time" per user is enough for the rate limit.
+        self._interval: float = per / rate if rate else 0.0
+        self._user_arrival = ExpiringDict(per, max_users) if rate else None
+        self._notified = ExpiringDict(max(seconds, per_user, per or 0), max_users)
+
+    def hit(self, user_id: Hashable, now: Optional[float] = None) -> int:
+        """
+        Record a trigger of the handler by a user.
+
+        :param user_id: User triggering the handler
+        :return: COOLDOWN_READY if the handler can be called, COOLDOWN_NOTIFY if it's on cooldown and the user
+                 should be told (once), COOLDOWN_SILENT if it's on cooldown and the user was already told.
+        """
+        now = time.monotonic() if now is None else now
+        remaining = self._remaining(user_id, now)
+        if remaining <= 0:
+            self._record(user_id, now)
+            return COOLDOWN_READY
+        if self.message is None or self._notified.get(user_id, 0.0, now) > now:
+            return COOLDOWN_SILENT
+        self._notified.set(user_id, now + remaining, now)
+        return COOLDOWN_NOTIFY
+
+    def _remaining(self, user_id: Hashable, now: float) -> float:
+        remaining = self._ready_at - now
+        if self._user_ready_at is not None:
+            remaining = max(remaining, self._user_ready_at.get(user_id, 0.0, now) - now)
+        if self._user_arrival is not None:
+            arrival = self._user_arrival.get(user_id, now, now)
+            remaining = max(remaining, arrival - (self.per - self._interval) - now)
+        return remaining
+
+    def _record(self, user_id: Hashable, now: float) -> None:
+        if self.seconds:
+            self._ready_at = now + self.seconds
+        if self._user_ready_at is not None:
+            self._user_ready_at.set(user_id, now + self.per_user, now)
+        if self._user_arrival is not None:
+            arrival = self._user_arrival.get(user_id, now, now)
+            self._user_arrival.set(user_id, max(arrival, now) + self._interval, now)
+        self._notified.pop(user_id)
+
+    def __repr__(self) -> str:
+        return (f"Cooldown(seconds={self.seconds}, per_user={self.per_user}, rate={self.rate}, per={self.per}, "
+                f"message={self.message!r})")
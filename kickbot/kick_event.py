@@ -0,0 +1,71 @@
+from typing import Optional
+
+from . import kick_json
+
+EVENT_PREFIX = 'App\\Events\\'
+
+# chatrooms.{chatroom_id}.v2
+CHAT_MESSAGE = 'App\\Events\\ChatMessageEvent'
+MESSAGE_DELETED = 'App\\Events\\MessageDeletedEvent'
+USER_BANNED = 'App\\Events\\UserBannedEvent'
+USER_UNBANNED = 'App\\Events\\UserUnbannedEvent'
+PINNED_MESSAGE_CREATED = 'App\\Events\\PinnedMessageCreatedEvent'
+PINNED_MESSAGE_DELETED = 'App\\Events\\PinnedMessageDeletedEvent'
+CHATROOM_UPDATED = 'App\\Events\\ChatroomUpdatedEvent'
+CHATROOM_CLEAR = 'App\\Events\\ChatroomClearEvent'
+SUBSCRIPTION = 'App\\Events\\SubscriptionEvent'
+GIFTED_SUBSCRIPTIONS = 'App\\Events\\GiftedSubscriptionsEvent'
+POLL_UPDATE = 'App\\Events\\PollUpdateEvent'
+POLL_DELETE = 'App\\Events\\PollDeleteEvent'
+STREAM_HOST = 'App\\Events\\StreamHostEvent'
+
+# channel.{channel_id}
+STREAMER_IS_LIVE = 'App\\Events\\StreamerIsLive'
+STOP_STREAM_BROADCAST = 'App\\Events\\StopStreamBroadcast'
+FOLLOWERS_UPDATED = 'App\\Events\\FollowersUpdated'
+CHANNEL_SUBSCRIPTION = 'App\\Events\\ChannelSubscriptionEvent'
+LUCKY_USERS_GIFTED = 'App\\Events\\LuckyUsersWhoGotGiftSubscriptionsEvent'
+LIVESTREAM_UPDATED = 'App\\Events\\LivestreamUpdated'
+
+
+def event_name(event_type: str) -> str:
+    """
+    Full pusher event name of an event type. Accepts the full name, or the name without the 'App\\Events\\' prefix.
+
+    :param event_type: i.e: 'App\\Events\\SubscriptionEvent' or 'SubscriptionEvent'
+    :return: i.e: 'App\\Events\\SubscriptionEvent'
+    """
+    if '\\' in event_type or '.' in event_type or ':' in event_type:
+        return event_type
+    return EVENT_PREFIX + event_type
+
+
+class KickEvent:
+    """
+    Pusher event received on one of the channels of a streamer. The data is decoded on first access.
+    """
+    __slots__ = ('event', 'pusher_channel', 'streamer', '_raw_data', '_data')
+
+    def __init__(self, event: str, pusher_channel: str, streamer: str, raw_data) -> None:
+        self.event: str = event
+        self.pusher_channel: str = pusher_channel
+        self.streamer: str = streamer
+        self._raw_data = raw_data
+        self._data: Optional[dict] = None
+
+    @property
+    def name(self) -> str:
+        """
+        Event name without the 'App\\Events\\' prefix, i.e: 'SubscriptionEvent'
+        """
+        return self.event.removeprefix(EVENT_PREFIX)
+
+    @property
+    def data(self) -> dict:
+        if self._data is None:
+            raw = self._raw_data
+            self._data = kick_json.loads(raw) if isinstance(raw, (str, bytes)) else (raw or {})
+        return self._data
+
+    def __repr__(self) -> str:
+        return f"KickEvent({self.name!r}, streamer={self.streamer!r})"
@@ -14,7 +14,7 @@ def get_streamer_info(bot) -> None:
     :param bot: Main KickBor
     """
     url = f"https://kick.com/api/v2/channels/{bot.streamer_slug}"
-    response = bot.client.scraper.get(url, cookies=bot.client.cookies, headers=BASE_HEADERS)
+    response = bot.client.get(url, cookies=bot.client.cookies, headers=BASE_HEADERS)
     status = response.status_code
     match status:
         case 403 | 429:
@@ -34,7 +34,7 @@ def get_chatroom_settings(bot) -> None:
     :param bot: Main KickBot
     """
     url = f"https://kick.com/api/internal/v1/channels/{bot.streamer_slug}/chatroom/settings"
-    response = bot.client.scraper.get(url, cookies=bot.client.cookies, headers=BASE_HEADERS)
+    response = bot.client.get(url, cookies=bot.client.cookies, headers=BASE_HEADERS)
     if response.status_code != 200:
         raise KickHelperException(f"Error retrieving chatroom settings. Response Status: {response.status_code}")
     data = response.json()
@@ -51,7 +51,7 @@ def get_bot_settings(bot) -> None:
     headers = BASE_HEADERS.copy()
     headers['Authorization'] = "Bearer " + bot.client.auth_token
     headers['X-Xsrf-Token'] = bot.client.xsrf
-    response = bot.client.scraper.get(url, cookies=bot.client.cookies, headers=headers)
+    response = bot.client.get(url, cookies=bot.client.cookies, headers=headers)
     if response.status_code != 200:
         raise KickHelperException(f"Error retrieving bot settings. Response Status: {response.status_code}")
     data = response.json()
@@ -69,14 +69,28 @@ def get_current_viewers(bot) -> int:
     """
     id = bot.streamer_info.get('id')
     url = f"https://api.kick.com/private/v0/channels/{id}/viewer-count"
-    response = bot.client.scraper.get(url, cookies=bot.client.cookies, headers=BASE_HEADERS)
+    response = bot.client.get(url, cookies=bot.client.cookies, headers=BASE_HEADERS)
     if response.status_code != 200:
-        logger.error(f"Error retrieving current viewer count. Response Status: {response.status_code}")
+        logger.error("Error retrieving current viewer count. Response Status: %s", response.status_code)
     data = response.json()
     try:
         return int(data.get('data').get('viewer_count'))
     except ValueError:
-        logger.error(f"Error parsing viewer count. Response Status: {response.status_code}")
+        logger.error("Error parsing viewer count. Response Status: %s", response.status_code)
+
+
+def get_livestream(bot) -> dict | None:
+    """
+    Retrieve the current livestream of the streamer (title, viewers, category, start time).
+
+    :param bot: Main KickBot
+    :return: Livestream dictionary, or None if the streamer is offline
+    """
+    url = f"https://kick.com/api/v2/channels/{bot.streamer_slug}/livestream"
+    response = bot.client.get(url, cookies=bot.client.cookies, headers=BASE_HEADERS)
+    if response.status_code != 200:
+        raise KickHelperException(f"Error retrieving livestream. Response Status: {response.status_code}")
+    return (response.json() or {}).get('data')
 
 
 def message_from_data(message: dict) -> KickMessage:
@@ -92,7 +106,7 @@ def message_from_data(message: dict) -> KickMessage:
     return KickMessage(data)
 
 
-def send_message_in_chat(bot, message: str) -> requests.Response:
+async def send_message_in_chat(bot, message: str) -> requests.Response:
     """
     Send a message in a chatroom. Uses v1 API, was having csrf issues using v2 API (code 419).
 
@@ -106,10 +120,10 @@ def send_message_in_chat(bot, message: str) -> requests.Response:
     headers['Authorization'] = "Bearer " + bot.client.auth_token
     payload = {"message": message,
                "chatroom_id": bot.chatroom_id}
-    return bot.client.scraper.post(url, json=payload, cookies=bot.client.cookies, headers=headers)
+    return await bot.client.async_post(url, json=payload, cookies=bot.client.cookies, headers=headers)
 
 
-def send_reply_in_chat(bot, message: KickMessage, reply_message: str) -> requests.Response:
+async def send_reply_in_chat(bot, message: KickMessage, reply_message: str) -> requests.Response:
     """
     Reply to a users message.
 
@@ -136,7 +150,7 @@ def send_reply_in_chat(bot, message: KickMessage, reply_message: str) -> request
             }
         }
     }
-    return bot.client.scraper.post(url, json=payload, cookies=bot.client.cookies, headers=headers)
+    return await bot.client.async_post(url, json=payload, cookies=bot.client.cookies, headers=headers)
 
 
 def get_ws_uri() -> str:
@@ -166,6 +180,35 @@ def ban_user(bot, username: str, minutes: int = 0, is_permanent: bool = False) -
     :param minutes: Minutes to ban user for
     :param is_permanent: Is a permanent ban. Defaults to False.
     """
+    url, payload, headers = _ban_request_args(bot, username, minutes, is_permanent)
+    response = bot.client.post(url, json=payload, cookies=bot.client.cookies, headers=headers)
+    if response.status_code != 200:
+        logger.error("An error occurred when setting timeout for %s | Status Code: %s",
+                     username, response.status_code)
+        return False
+    return True
+
+
+async def send_ban_request(bot, username: str, minutes: int = 0, is_permanent: bool = False) -> requests.Response:
+    """
+    Non-blocking ban request, returning the response so the outbound queue can handle rate limits.
+    Used by the async_ Moderator ban functions.
+
+    :param bot: Main KickBot
+    :param username: Username to ban
+    :param minutes: Minutes to ban user for
+    :param is_permanent: Is a permanent ban. Defaults to False.
+    :return: Response from the ban post request
+    """
+    url, payload, headers = _ban_request_args(bot, username, minutes, is_permanent)
+    return await bot.client.async_post(url, endpoint='/api/v2/channels/{slug}/bans',
+                                       json=payload, cookies=bot.client.cookies, headers=headers)
+
+
+def _ban_request_args(bot, username: str, minutes: int, is_permanent: bool) -> tuple[str, dict, dict]:
+    """
+    Build the url, payload and headers of a ban request.
+    """
     url = f"https://kick.com/api/v2/channels/{bot.streamer_slug}/bans"
     headers = BASE_HEADERS.copy()
     headers['path'] = f"/api/v2/channels/{bot.streamer_slug}/bans"
@@ -182,12 +225,7 @@ def ban_user(bot, username: str, minutes: int = 0, is_permanent: bool = False) -
             "duration": minutes,
             "permanent": is_permanent
         }
-    response = bot.client.scraper.post(url, json=payload, cookies=bot.client.cookies, headers=headers)
-    if response.status_code != 200:
-        logger.error(f"An error occurred when setting timeout for {username} | "
-                     f"Status Code: {response.status_code}")
-        return False
-    return True
+    return url, payload, headers
 
 
 def get_viewer_info(bot, username: str) -> dict | None:
@@ -200,13 +238,13 @@ def get_viewer_info(bot, username: str) -> dict | None:
     :return: Dictionary containing viewer info, or None, indicating failure
     """
     slug = username.replace('_', '-')
-    url = f"https://kick.com/api/v2/channels/lukemvc/users/{slug}"
+    url = f"https://kick.com/api/v2/channels/{bot.streamer_slug}/users/{slug}"
     headers = BASE_HEADERS.copy()
     headers['Authorization'] = bot.client.auth_token
     headers['X-Xsrf-Token'] = bot.client.xsrf
-    response = bot.client.scraper.get(url, cookies=bot.client.cookies, headers=headers)
+    response = bot.client.get(url, cookies=bot.client.cookies, headers=headers)
     if response.status_code != 200:
-        logger.error(f"Error retrieving viewer info for {username} | Status code: {response.status_code}")
+        logger.error("Error retrieving viewer info for %s | Status code: %s", username, response.status_code)
         return None
     return response.json()
 
@@ -219,8 +257,8 @@ def get_streamer_leaderboard(bot) -> dict | None:
     :return: Dictionary containing leaderboard. Will return None and log error if it fails.
     """
     url = f"https://kick.com/api/v2/channels/{bot.streamer_slug}/leaderboards"
-    response = bot.client.scraper.get(url, cookies=bot.client.cookies, headers=BASE_HEADERS)
+    response = bot.client.get(url, cookies=bot.client.cookies, headers=BASE_HEADERS)
     if response.status_code != 200:
-        logger.warning(f"An error occurred while retrieving leaderboard. Status Code: {response.status_code}")
+        logger.warning("An error occurred while retrieving leaderboard. Status Code: %s", response.status_code)
         return None
     return response.json()
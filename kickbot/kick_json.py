@@ -0,0 +1,26 @@
+"""
+Json backend used for inbound websocket frames and message payloads.
+Uses orjson when it's installed (pip install kickbot[fast]), which decodes a lot faster, otherwise the json module.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    loads = orjson.loads
+    JSONDecodeError = orjson.JSONDecodeError
+else:
+    loads = json.loads
+    JSONDecodeError = json.JSONDecodeError
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+
+def dumps(obj) -> str:
+    """
+    Serialize obj to a json string. Outbound frames are rare, so this always uses the json module.
+    """
+    return json.dumps(obj)
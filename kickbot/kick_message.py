@@ -1,30 +1,56 @@
-import json
+from . import kick_json
 
 
 class KickMessage:
-    def __init__(self, raw_data: str):
-        data = json.loads(raw_data)
-        self.data = data
+    """
+    Chat message received from the websocket.
+
+    args (the message content split into words) and sender are only built when first accessed.
+    """
+    __slots__ = ('data', 'id', 'chatroom_id', 'content', 'type', 'created_at', '_args', '_sender')
+
+    def __init__(self, raw_data: str | bytes | dict):
+        data = kick_json.loads(raw_data) if not isinstance(raw_data, dict) else raw_data
+        self.data: dict = data
         self.id: str | None = data.get('id')
         self.chatroom_id: int | None = data.get('chatroom_id')
         self.content: str | None = data.get('content')
-        self.args: list[str] | None = self.content.split()
         self.type: str | None = data.get('type')
         self.created_at: str | None = data.get('created_at')
-        self.sender: _Sender | None = _Sender(data.get('sender'))
+        self._args: list[str] | None = None
+        self._sender: _Sender | None = None
+
+    @property
+    def args(self) -> list[str] | None:
+        if self._args is None and self.content is not None:
+            self._args = self.content.split()
+        return self._args
+
+    @property
+    def sender(self) -> '_Sender | None':
+        if self._sender is None:
+            raw_sender = self.data.get('sender')
+            if raw_sender is not None:
+                self._sender = _Sender(raw_sender)
+        return self._sender
 
     def __repr__(self) -> str:
         return f"KickMessage({self.data})"
 
 
 class _Sender:
+    __slots__ = ('raw_sender', 'user_id', 'username', 'slug', 'identity')
+
     def __init__(self, raw_sender: dict) -> None:
         self.raw_sender = raw_sender
         self.user_id: int | None = raw_sender.get('id')
         self.username: str | None = raw_sender.get('username')
         self.slug: str | None = raw_sender.get('slug')
         self.identity: dict = raw_sender.get('identity')
-        self.badges: list = self.identity.get('badges')
+
+    @property
+    def badges(self) -> list:
+        return self.identity.get('badges') if self.identity is not None else None
 
     def __repr__(self) -> str:
         return f"KickMessage.sender({self.raw_sender})"
@@ -0,0 +1,301 @@
+import bisect
+import logging
+import threading
+
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Callable, ContextManager, Iterable, NamedTuple, Optional
+
+from .constants import KickBotException
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Pushed by the bot while running
+FRAMES_RECEIVED = 'kickbot_frames_received_total'
+FRAME_DECODE_SECONDS = 'kickbot_frame_decode_seconds'
+HANDLER_SECONDS = 'kickbot_handler_seconds'
+OUTBOUND_SECONDS = 'kickbot_outbound_seconds'
+OUTBOUND_RATE_LIMITED = 'kickbot_outbound_rate_limited_total'
+HTTP_REQUEST_SECONDS = 'kickbot_http_request_seconds'
+HTTP_RESPONSES = 'kickbot_http_responses_total'
+POLICY_REJECTED = 'kickbot_policy_rejected_total'
+
+# Collected from the bot on export
+CONNECTS = 'kickbot_websocket_connects_total'
+RECONNECTS = 'kickbot_websocket_reconnects_total'
+DUPLICATE_FRAMES = 'kickbot_websocket_duplicate_frames_total'
+CONNECTED = 'kickbot_websocket_connected'
+DISPATCH_QUEUE_DEPTH = 'kickbot_dispatch_queue_depth'
+OUTBOUND_QUEUE_DEPTH = 'kickbot_outbound_queue_depth'
+CACHE_HITS = 'kickbot_cache_hits_total'
+CACHE_MISSES = 'kickbot_cache_misses_total'
+CACHE_COALESCED = 'kickbot_cache_coalesced_total'
+ARCHIVE_WRITTEN = 'kickbot_archive_written_total'
+ARCHIVE_DROPPED = 'kickbot_archive_dropped_total'
+ARCHIVE_QUEUE_DEPTH = 'kickbot_archive_queue_depth'
+
+# Spans
+SPAN_MESSAGE = 'kickbot.message'
+SPAN_EVENT = 'kickbot.event'
+SPAN_HANDLER = 'kickbot.handler'
+SPAN_HTTP = 'kickbot.http'
+
+COUNTER = 'counter'
+GAUGE = 'gauge'
+
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_NULL_SPAN = nullcontext()
+
+
+class Sample(NamedTuple):
+    name: str
+    kind: str
+    value: float
+    labels: dict
+
+
+class Metrics:
+    """
+    Instrumentation hooks of the bot: counters, histograms and spans along receive -> dispatch -> send.
+
+    This base class records nothing, and is what the bot uses when no metrics are given. Call sites check
+    `enabled` before timing anything, so it costs one attribute lookup per hook.
+    Use PrometheusMetrics or OpenTelemetryMetrics, or subclass it to send the data somewhere else.
+    """
+    enabled: bool = False
+
+    def inc(self, name: str, value: float = 1.0, labels: Optional[dict] = None) -> None:
+        """
+        Increase a counter.
+
+        :param name: Metric name, i.e: kick_metrics.FRAMES_RECEIVED
+        :param value: Amount to add
+        :param labels: Label values, i.e: {'event': 'App\\Events\\ChatMessageEvent'}
+        """
+
+    def observe(self, name: str, value: float, labels: Optional[dict] = None) -> None:
+        """
+        Record a value in a histogram.
+
+        :param name: Metric name, i.e: kick_metrics.HANDLER_SECONDS
+        :param value: Observed value, in seconds for durations
+        :param labels: Label values, i.e: {'trigger': '!time', 'handler': 'time_command'}
+        """
+
+    def span(self, name: str, attributes: Optional[dict] = None) -> ContextManager:
+        """
+        Context manager around a unit of work, i.e: handling a message, or an http request.
+
+        :param name: Span name, i.e: kick_metrics.SPAN_HANDLER
+        :param attributes: Span attributes
+        """
+        return _NULL_SPAN
+
+    def add_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        """
+        Add a function returning samples read on export, for values the bot already keeps track of
+        (reconnects, queue depths, cache hits).
+
+        :param collector: Function returning Samples
+        """
+
+
+class PrometheusMetrics(Metrics):
+    """
+    Metrics kept in memory, exported in the prometheus text format with render(), or served over http with serve().
+
+    :param buckets: Upper bounds of the histogram buckets
+    """
+    enabled = True
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets: tuple[float, ...] = tuple(sorted(buckets))
+        self._counters: dict[tuple[str, tuple], float] = {}
+        self._histograms: dict[tuple[str, tuple], list] = {}
+        self._collectors: list[Callable[[], Iterable[Sample]]] = []
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1.0, labels: Optional[dict] = None) -> None:
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, labels: Optional[dict] = None) -> None:
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # bucket counts (the last one is +Inf), sum
+                histogram = self._histograms[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            histogram[0][bisect.bisect_left(self.buckets, value)] += 1
+            histogram[1] += value
+
+    def add_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """
+        :return: Every metric in the prometheus text exposition format
+        """
+        with self._lock:
+            counters = list(self._counters.items())
+            histograms = [(key, (list(counts), total)) for key, (counts, total) in self._histograms.items()]
+        lines = []
+        types = set()
+
+        def add_type(name: str, kind: str) -> None:
+            if name not in types:
+                types.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in sorted(counters):
+            add_type(name, COUNTER)
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for (name, labels), (counts, total) in sorted(histograms):
+            add_type(name, 'histogram')
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                bucket_labels = labels + (('le', _format_value(bound)),)
+                lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+        for sample in sorted(self._collect(), key=lambda s: s.name):
+            add_type(sample.name, sample.kind)
+            lines.append(f"{sample.name}{_format_labels(tuple(sample.labels.items()))} {_format_value(sample.value)}")
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port: int = 8000, host: str = '0.0.0.0') -> 'ThreadingHTTPServer':
+        """
+        Serve render() at http://host:port/metrics from a background thread.
+
+        :param port: Port to listen on
+        :param host: Address to listen on
+        :return: The http server, call shutdown() on it to stop serving
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args) -> None:
+                logger.debug("Metrics request: " + format, *args)
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, name="kickbot-metrics", daemon=True).start()
+        logger.info("Serving metrics on http://%s:%s/metrics", host, server.server_address[1])
+        return server
+
+    def _collect(self) -> list[Sample]:
+        samples = []
+        for collector in self._collectors:
+            try:
+                samples.extend(collector())
+            except Exception:
+                logger.exception("Metrics collector failed")
+        return samples
+
+
+class OpenTelemetryMetrics(Metrics):
+    """
+    Metrics and spans recorded with the OpenTelemetry api, exported by whatever meter / tracer provider the
+    application configured (i.e: OTLP, or the OpenTelemetry prometheus exporter).
+    Requires the opentelemetry-api package: pip install kickbot[otel]
+
+    :param meter_provider: Meter provider, defaults to the global one
+    :param tracer_provider: Tracer provider, defaults to the global one
+    """
+    enabled = True
+
+    def __init__(self, meter_provider=None, tracer_provider=None) -> None:
+        try:
+            from opentelemetry import metrics as otel_metrics, trace as otel_trace
+        except ImportError as e:
+            raise KickBotException("OpenTelemetry metrics require the opentelemetry-api package. "
+                                   "Install it with: pip install kickbot[otel]") from e
+        self._otel_metrics = otel_metrics
+        self._meter = otel_metrics.get_meter('kickbot', meter_provider=meter_provider)
+        self._tracer = otel_trace.get_tracer('kickbot', tracer_provider=tracer_provider)
+        self._counters: dict = {}
+        self._histograms: dict = {}
+
+    def inc(self, name: str, value: float = 1.0, labels: Optional[dict] = None) -> None:
+        counter = self._counters.get(name)
+        if counter is None:
+            counter = self._counters[name] = self._meter.create_counter(_otel_name(name))
+        counter.add(value, labels)
+
+    def observe(self, name: str, value: float, labels: Optional[dict] = None) -> None:
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            histogram = self._histograms[name] = self._meter.create_histogram(
+                _otel_name(name), unit='s' if name.endswith('_seconds') else '')
+        histogram.record(value, labels)
+
+    def span(self, name: str, attributes: Optional[dict] = None) -> ContextManager:
+        return self._tracer.start_as_current_span(name, attributes=attributes)
+
+    def add_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        """
+        Register an observable instrument for each metric the collector returns now. The collector is called again
+        on each export.
+        """
+        for name, kind in {(sample.name, sample.kind) for sample in collector()}:
+            def observe(options, name=name):
+                return [self._otel_metrics.Observation(sample.value, sample.labels)
+                        for sample in collector() if sample.name == name]
+            if kind == COUNTER:
+                self._meter.create_observable_counter(_otel_name(name), callbacks=[observe])
+            else:
+                self._meter.create_observable_gauge(_otel_name(name), callbacks=[observe])
+
+
+def _otel_name(name: str) -> str:
+    """
+    OpenTelemetry exporters add the _total suffix of counters themselves.
+    """
+    return name.removesuffix('_total')
+
+
+def _label_key(labels: Optional[dict]) -> tuple:
+    """
+    Labels as a tuple of strings (None as an empty string), so the metrics of a name can be sorted.
+    """
+    if not labels:
+        return ()
+    return tuple((key, '' if value is None else str(value)) for key, value in labels.items())
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ''
+    escaped = (f'{key}="{_escape(value)}"' for key, value in labels)
+    return '{' + ','.join(escaped) + '}'
+
+
+def _escape(value) -> str:
+    if value is None:
+        return ''
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
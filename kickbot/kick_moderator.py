@@ -1,14 +1,61 @@
+import asyncio
 import logging
+import time
 
+from datetime import timedelta
+from functools import partial
+from typing import TYPE_CHECKING, Iterable, NamedTuple, Optional
+
+from .constants import KickBotException
+from .kick_cache import VIEWER_INFO_TTL, LEADERBOARD_TTL
+from .kick_outbound import PRIORITY_MODERATOR
 from .kick_helper import (
     ban_user,
+    send_ban_request,
     get_viewer_info,
     get_streamer_leaderboard
 )
 
+if TYPE_CHECKING:
+    # sqlite3 is only imported when an archive is used
+    from .kick_archive import ArchivedMessage, ChatArchive
+
 logger = logging.getLogger(__name__)
 
 
+class BulkResult(NamedTuple):
+    username: str
+    ok: bool
+    status_code: Optional[int] = None
+    error: Optional[str] = None
+
+
+class BulkReport:
+    """
+    Result of a bulk moderation action: one BulkResult per (deduplicated) username.
+    """
+    def __init__(self, action: str) -> None:
+        self.action: str = action
+        self.results: dict[str, BulkResult] = {}
+        self.duplicates: list[str] = []
+        self.seconds: float = 0.0
+
+    @property
+    def succeeded(self) -> list[str]:
+        return [result.username for result in self.results.values() if result.ok]
+
+    @property
+    def failed(self) -> list[BulkResult]:
+        return [result for result in self.results.values() if not result.ok]
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    def __repr__(self) -> str:
+        return (f"BulkReport({self.action!r}, succeeded={len(self.succeeded)}, failed={len(self.failed)}, "
+                f"duplicates={len(self.duplicates)}, seconds={self.seconds:.2f})")
+
+
 class Moderator:
     def __init__(self, bot) -> None:
         self.bot = bot
@@ -16,11 +63,14 @@ class Moderator:
     def get_viewer_info(self, username) -> dict | None:
         """
         Returns Dictionary of user info containing things like 'following_since', 'subscribed_for', etc.
+        Cached for VIEWER_INFO_TTL seconds (see bot.cache).
 
         :param username: User to retrieve info for
         :return: Dictionary of user info, will return None and log error if error fetching info
         """
-        data = get_viewer_info(self.bot, username)
+        data = self.bot.cache.get_or_load(self._viewer_info_key(username),
+                                          partial(get_viewer_info, self.bot, username),
+                                          ttl=VIEWER_INFO_TTL)
         return data
 
     def timeout_user(self, username: str, minutes: int) -> None:
@@ -31,7 +81,7 @@ class Moderator:
         :param minutes: Amount of time in minutes to ban user for
         """
         if ban_user(self.bot, username, minutes=minutes):
-            logger.info(f"Banned user: {username} for {minutes} minutes.")
+            logger.info("Banned user: %s for %s minutes.", username, minutes)
 
     def permaban(self, username) -> None:
         """
@@ -40,13 +90,174 @@ class Moderator:
         :param username: Username to ban
         """
         if ban_user(self.bot, username, is_permanent=True):
-            logger.info(f"Permanently banned user: {username}")
+            logger.info("Permanently banned user: %s", username)
 
     def get_leaderboard(self) -> dict | None:
         """
         Retrieve the current leaderboard for chat.
 
+        Cached for LEADERBOARD_TTL seconds (see bot.cache).
+
+        :returns: Dictionary containing chat leaderboard stats. Will return None and log error if it fails.
+        """
+        leaderboard = self.bot.cache.get_or_load(self._leaderboard_key(),
+                                                 partial(get_streamer_leaderboard, self.bot),
+                                                 ttl=LEADERBOARD_TTL)
+        return leaderboard
+
+    def get_user_messages(self,
+                          username: str,
+                          since: Optional[timedelta] = timedelta(hours=1),
+                          limit: Optional[int] = 100) -> list['ArchivedMessage']:
+        """
+        Messages a user sent in this chat, from the bots chat archive (see ChatArchive), newest first.
+
+        :param username: User to retrieve the messages of
+        :param since: How far back to look. None for every archived message.
+        :param limit: Maximum amount of messages
+        :return: List of ArchivedMessages
+        """
+        return self._archive().messages(sender=username, streamer=self.bot.streamer_slug, since=since, limit=limit)
+
+    def _archive(self) -> 'ChatArchive':
+        if self.bot.archive is None:
+            raise KickBotException("No chat archive. Create the bot with archive=ChatArchive(path)")
+        return self.bot.archive
+
+    def _viewer_info_key(self, username: str) -> str:
+        return f"viewer_info:{self.bot.streamer_slug}:{username.casefold()}"
+
+    def _leaderboard_key(self) -> str:
+        return f"leaderboard:{self.bot.streamer_slug}"
+
+    ########################################################################################
+    #    NON-BLOCKING VERSIONS (run the request in the client's http executor)
+    ########################################################################################
+
+    async def async_get_viewer_info(self, username: str) -> dict | None:
+        """
+        Non-blocking version of get_viewer_info.
+        Concurrent lookups of the same user share one request.
+
+        :param username: User to retrieve info for
+        :return: Dictionary of user info, will return None and log error if error fetching info
+        """
+        data = await self.bot.cache.async_get_or_load(self._viewer_info_key(username),
+                                                      partial(self.bot.client.run_async, get_viewer_info,
+                                                              self.bot, username),
+                                                      ttl=VIEWER_INFO_TTL)
+        return data
+
+    async def async_timeout_user(self, username: str, minutes: int) -> None:
+        """
+        Non-blocking version of timeout_user.
+        Sent through the bots outbound queue, ahead of any queued chat messages.
+
+        :param username: Username to ban
+        :param minutes: Amount of time in minutes to ban user for
+        """
+        send = partial(send_ban_request, self.bot, username, minutes=minutes)
+        response = await self.bot.outbound.submit(send, priority=PRIORITY_MODERATOR)
+        if response.status_code != 200:
+            logger.error("An error occurred when setting timeout for %s | Status Code: %s",
+                         username, response.status_code)
+            return
+        logger.info("Banned user: %s for %s minutes.", username, minutes)
+
+    async def async_permaban(self, username: str) -> None:
+        """
+        Non-blocking version of permaban.
+        Sent through the bots outbound queue, ahead of any queued chat messages.
+
+        :param username: Username to ban
+        """
+        send = partial(send_ban_request, self.bot, username, is_permanent=True)
+        response = await self.bot.outbound.submit(send, priority=PRIORITY_MODERATOR)
+        if response.status_code != 200:
+            logger.error("An error occurred when permanently banning %s | Status Code: %s",
+                         username, response.status_code)
+            return
+        logger.info("Permanently banned user: %s", username)
+
+    async def async_get_user_messages(self,
+                                      username: str,
+                                      since: Optional[timedelta] = timedelta(hours=1),
+                                      limit: Optional[int] = 100) -> list['ArchivedMessage']:
+        """
+        Non-blocking version of get_user_messages.
+        """
+        return await self.bot.client.run_async(self.get_user_messages, username, since=since, limit=limit)
+
+    async def async_get_leaderboard(self) -> dict | None:
+        """
+        Non-blocking version of get_leaderboard.
+        Concurrent lookups share one request.
+
         :returns: Dictionary containing chat leaderboard stats. Will return None and log error if it fails.
         """
-        leaderboard = get_streamer_leaderboard(self.bot)
+        leaderboard = await self.bot.cache.async_get_or_load(self._leaderboard_key(),
+                                                             partial(self.bot.client.run_async,
+                                                                     get_streamer_leaderboard, self.bot),
+                                                             ttl=LEADERBOARD_TTL)
         return leaderboard
+
+    ########################################################################################
+    #    BULK MODERATION
+    ########################################################################################
+
+    async def bulk_timeout(self, usernames: Iterable[str], minutes: int, concurrency: int = 20) -> BulkReport:
+        """
+        Ban many users for a set amount of time, i.e: during a bot raid.
+        Usernames are deduplicated (case-insensitive), and up to `concurrency` bans are in flight at once,
+        through the outbound queue (which handles rate limiting and 429s).
+
+        :param usernames: Usernames to ban
+        :param minutes: Amount of time in minutes to ban users for
+        :param concurrency: Maximum amount of ban requests in flight
+        :return: BulkReport with the result for each user
+        """
+        return await self._bulk_ban(f"timeout {minutes}m", usernames, concurrency, minutes=minutes)
+
+    async def bulk_ban(self, usernames: Iterable[str], concurrency: int = 20) -> BulkReport:
+        """
+        Permanently ban many users. See bulk_timeout.
+
+        :param usernames: Usernames to ban
+        :param concurrency: Maximum amount of ban requests in flight
+        :return: BulkReport with the result for each user
+        """
+        return await self._bulk_ban("permaban", usernames, concurrency, is_permanent=True)
+
+    async def _bulk_ban(self, action: str, usernames: Iterable[str], concurrency: int, **ban_args) -> BulkReport:
+        report = BulkReport(action)
+        unique: dict[str, str] = {}
+        for username in usernames:
+            username = username.strip().lstrip('@')
+            key = username.casefold()
+            if not key:
+                continue
+            if key in unique:
+                report.duplicates.append(username)
+            else:
+                unique[key] = username
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def ban(username: str) -> None:
+            async with semaphore:
+                send = partial(send_ban_request, self.bot, username, **ban_args)
+                try:
+                    response = await self.bot.outbound.submit(send, priority=PRIORITY_MODERATOR)
+                except Exception as e:
+                    report.results[username] = BulkResult(username, False, error=repr(e))
+                    return
+                ok = response.status_code == 200
+                report.results[username] = BulkResult(username, ok, response.status_code,
+                                                       None if ok else f"Status Code: {response.status_code}")
+
+        start = time.monotonic()
+        await asyncio.gather(*(ban(username) for username in unique.values()))
+        report.seconds = time.monotonic() - start
+        report.results = {username: report.results[username] for username in unique.values()}
+        logger.info("Bulk %s: %s banned, %s failed in %.1f seconds",
+                    action, len(report.succeeded), len(report.failed), report.seconds)
+        return report
@@ -0,0 +1,320 @@
+import asyncio
+import collections
+import contextvars
+import logging
+import time
+import requests
+
+from email.utils import parsedate_to_datetime
+from functools import partial
+from typing import Awaitable, Callable, Optional
+
+from .kick_metrics import Metrics, OUTBOUND_SECONDS, OUTBOUND_RATE_LIMITED
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_MODERATOR = 0
+PRIORITY_REPLY = 1
+PRIORITY_CHAT = 2
+PRIORITY_NAMES = ('moderator', 'reply', 'chat')
+
+MAX_MESSAGE_LENGTH = 500
+
+
+class _OutboundRequest:
+    __slots__ = ('send', 'futures', 'priority', 'text', 'text_sender', 'key', 'retries', 'context')
+
+    def __init__(self,
+                 send: Callable[[], Awaitable[requests.Response]],
+                 future: asyncio.Future,
+                 priority: int,
+                 text: Optional[str] = None,
+                 text_sender: Optional[Callable[[str], Awaitable[requests.Response]]] = None,
+                 key: Optional[int] = None) -> None:
+        self.send = send
+        self.futures: list[asyncio.Future] = [future]
+        self.priority = priority
+        self.text = text
+        self.text_sender = text_sender
+        self.key = key
+        self.retries = 0
+        # Context of the caller, so the request is sent inside its trace span instead of the worker's
+        self.context = contextvars.copy_context()
+
+
+class _TokenBucket:
+    __slots__ = ('rate', 'burst', 'tokens', 'last_refill')
+
+    def __init__(self, rate: float, burst: int) -> None:
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be greater than 0, and burst at least 1.")
+        self.rate: float = rate
+        self.burst: int = burst
+        self.tokens: float = float(burst)
+        self.last_refill: float = time.monotonic()
+
+    def take(self, now: float) -> float:
+        """
+        Take a token if there is one.
+
+        :return: 0 if a token was taken, else seconds until the next token
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class OutboundQueue:
+    """
+    Queue for outbound http requests (messages, replies, bans).
+
+    Requests are sent in priority order (moderator actions, then replies, then chat messages), limited by a
+    token bucket of `rate` requests per second with bursts of up to `burst` requests. Moderator actions use a
+    separate bucket (`moderator_rate` / `moderator_burst`), so bans aren't limited to the chat message rate.
+    A 429 response pauses the whole queue for the Retry-After time, and the request is put back at the front of its lane.
+
+    When coalesce is enabled, queued send_text messages for the same chatroom are merged into a single
+    message, up to max_message_length.
+    """
+    def __init__(self,
+                 rate: float = 2.0,
+                 burst: int = 5,
+                 coalesce: bool = False,
+                 max_retries: int = 3,
+                 max_message_length: int = MAX_MESSAGE_LENGTH,
+                 moderator_rate: float = 20.0,
+                 moderator_burst: int = 20,
+                 metrics: Optional[Metrics] = None) -> None:
+        self._bucket = _TokenBucket(rate, burst)
+        self._moderator_bucket = _TokenBucket(moderator_rate, moderator_burst)
+        self.coalesce: bool = coalesce
+        self.max_retries: int = max_retries
+        self.max_message_length: int = max_message_length
+        self.metrics: Metrics = metrics if metrics is not None else Metrics()
+        self._lanes: list[collections.deque] = [collections.deque() for _ in range(PRIORITY_CHAT + 1)]
+        self._blocked_until: float = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._in_flight: set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return sum(len(lane) for lane in self._lanes)
+
+    def depths(self) -> dict[str, int]:
+        """
+        :return: Amount of queued requests of each priority, i.e: {'moderator': 0, 'reply': 2, 'chat': 5}
+        """
+        return {name: len(lane) for name, lane in zip(PRIORITY_NAMES, self._lanes)}
+
+    @property
+    def rate(self) -> float:
+        return self._bucket.rate
+
+    @rate.setter
+    def rate(self, rate: float) -> None:
+        self._bucket.rate = rate
+
+    @property
+    def burst(self) -> int:
+        return self._bucket.burst
+
+    @burst.setter
+    def burst(self, burst: int) -> None:
+        self._bucket.burst = burst
+
+    @property
+    def moderator_rate(self) -> float:
+        return self._moderator_bucket.rate
+
+    @moderator_rate.setter
+    def moderator_rate(self, rate: float) -> None:
+        self._moderator_bucket.rate = rate
+
+    @property
+    def moderator_burst(self) -> int:
+        return self._moderator_bucket.burst
+
+    @moderator_burst.setter
+    def moderator_burst(self, burst: int) -> None:
+        self._moderator_bucket.burst = burst
+
+    async def submit(self,
+                     send: Callable[[], Awaitable[requests.Response]],
+                     priority: int = PRIORITY_CHAT) -> requests.Response:
+        """
+        Queue a request and wait for its response.
+
+        :param send: Async function sending the request and returning the response
+        :param priority: PRIORITY_MODERATOR, PRIORITY_REPLY, or PRIORITY_CHAT
+        :return: Response of the request
+        """
+        return await self._enqueue(lambda future: _OutboundRequest(send, future, priority))
+
+    async def submit_text(self,
+                          text: str,
+                          text_sender: Callable[[str], Awaitable[requests.Response]],
+                          key: Optional[int] = None,
+                          priority: int = PRIORITY_CHAT) -> requests.Response:
+        """
+        Queue a chat message that can be merged with other queued messages for the same key (chatroom).
+
+        :param text: Message to send
+        :param text_sender: Async function sending a message string and returning the response
+        :param key: Messages are only merged with messages of the same key
+        :param priority: PRIORITY_MODERATOR, PRIORITY_REPLY, or PRIORITY_CHAT
+        :return: Response of the (possibly merged) message
+        """
+        return await self._enqueue(
+            lambda future: _OutboundRequest(partial(text_sender, text), future, priority, text, text_sender, key)
+        )
+
+    async def _enqueue(self, make_request: Callable[[asyncio.Future], _OutboundRequest]) -> requests.Response:
+        loop = asyncio.get_running_loop()
+        if self._loop is not None and self._loop is not loop and self._loop.is_running():
+            # Called from another thread's event loop. Hand it to the loop that owns the queue.
+            owner_future = asyncio.run_coroutine_threadsafe(self._enqueue(make_request), self._loop)
+            return await asyncio.wrap_future(owner_future)
+        self._ensure_worker(loop)
+        future = loop.create_future()
+        request = make_request(future)
+        self._lanes[request.priority].append(request)
+        self._wakeup.set()
+        if not self.metrics.enabled:
+            return await future
+        start = time.perf_counter()
+        try:
+            return await future
+        finally:
+            self.metrics.observe(OUTBOUND_SECONDS, time.perf_counter() - start,
+                                 labels={'priority': PRIORITY_NAMES[request.priority]})
+
+    def _ensure_worker(self, loop: asyncio.AbstractEventLoop) -> None:
+        if self._loop is not loop:
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._worker = None
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        """
+        Worker sending queued requests, as fast as the token buckets allow.
+
+        The lanes are checked again whenever a request is queued, so a ban queued while the chat lane waits for a token
+        is sent right away, and messages queued meanwhile are still merged into the waiting one.
+        """
+        while True:
+            self._wakeup.clear()
+            delay = self._send_next()
+            if delay == 0:
+                continue
+            if delay is None:
+                await self._wakeup.wait()
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _send_next(self) -> Optional[float]:
+        """
+        Send the first request of the highest priority lane that has a token in its bucket.
+
+        :return: 0 if a request was sent, else seconds until one can be (None when the queue is empty)
+        """
+        now = time.monotonic()
+        if not len(self):
+            return None
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        delay = None
+        for priority, lane in enumerate(self._lanes):
+            if not lane:
+                continue
+            wait = self._bucket_for(priority).take(now)
+            if wait:
+                delay = wait if delay is None else min(delay, wait)
+                continue
+            request = self._next_request(lane)
+            task = request.context.run(asyncio.create_task, self._send(request))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+            return 0
+        return delay
+
+    def _bucket_for(self, priority: int) -> _TokenBucket:
+        return self._moderator_bucket if priority == PRIORITY_MODERATOR else self._bucket
+
+    def _next_request(self, lane: collections.deque) -> _OutboundRequest:
+        request = lane.popleft()
+        if self.coalesce and request.text is not None:
+            self._coalesce(request, lane)
+        return request
+
+    def _coalesce(self, request: _OutboundRequest, lane: collections.deque) -> None:
+        """
+        Merge the following text messages of the lane into request, while they fit in one message.
+        """
+        text = request.text
+        while lane:
+            following = lane[0]
+            if following.text is None or following.key != request.key:
+                break
+            if len(text) + 1 + len(following.text) > self.max_message_length:
+                break
+            lane.popleft()
+            text = f"{text} {following.text}"
+            request.futures.extend(following.futures)
+        if text != request.text:
+            logger.debug("Merged %s queued messages into one: %r", len(request.futures), text)
+            request.text = text
+            request.send = partial(request.text_sender, text)
+
+    async def _send(self, request: _OutboundRequest) -> None:
+        try:
+            response = await request.send()
+        except Exception as e:
+            for future in request.futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        if response.status_code == 429 and request.retries < self.max_retries:
+            request.retries += 1
+            delay = _retry_after(response, default=2 ** request.retries)
+            if self.metrics.enabled:
+                self.metrics.inc(OUTBOUND_RATE_LIMITED)
+            logger.warning("Rate limited (429). Pausing outbound queue for %.1f seconds.", delay)
+            self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+            self._bucket.tokens = 0
+            self._moderator_bucket.tokens = 0
+            self._lanes[request.priority].appendleft(request)
+            self._wakeup.set()
+            return
+        for future in request.futures:
+            if not future.done():
+                future.set_result(response)
+
+
+def _retry_after(response: requests.Response, default: float) -> float:
+    """
+    Parse the Retry-After header (seconds, or an http date) of a response.
+
+    :param response: 429 response
+    :param default: Seconds to use when the header is missing or invalid
+    :return: Seconds to wait before retrying
+    """
+    value = response.headers.get('Retry-After') if response.headers is not None else None
+    if value is None:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import re
+import time
+
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import AsyncIterator, Optional
+
+from .constants import KickPolicyException
+from .kick_metrics import POLICY_REJECTED
+from .kick_outbound import MAX_MESSAGE_LENGTH
+
+logger = logging.getLogger(__name__)
+
+REJECT_LENGTH = 'length'
+REJECT_EMOTES_ONLY = 'emotes_only'
+REJECT_LINKS = 'links'
+REJECT_SUBSCRIBERS_ONLY = 'subscribers_only'
+REJECT_FOLLOWERS_ONLY = 'followers_only'
+
+_REJECT_DESCRIPTIONS = {
+    REJECT_LENGTH: "message is longer than {max_length} characters",
+    REJECT_EMOTES_ONLY: "chat is in emote only mode",
+    REJECT_LINKS: "links are disabled in chat",
+    REJECT_SUBSCRIBERS_ONLY: "chat is in subscribers only mode",
+    REJECT_FOLLOWERS_ONLY: "chat is in followers only mode",
+}
+
+_EMOTES_ONLY_RE = re.compile(r'\s*(?:\[emote:\d+:[^\]]*\]\s*)+')
+_LINK_RE = re.compile(r'https?://|www\.|\b[\w-]+\.(?:com|net|org|tv|gg|io|co|me|ly|be|xyz)\b', re.IGNORECASE)
+
+
+class ChatPolicy:
+    """
+    Chatroom settings of a channel (slow mode, emote only, followers / subscribers only, links), enforced before
+    a message is sent, so messages kick would reject don't use a request (and the outbound rate limit).
+
+    Read from channel.chatroom_settings when the channel loads, and kept current by the ChatroomUpdatedEvents of the
+    chatroom. When the bot is a moderator (or the broadcaster), only the message length is checked.
+
+    :param channel: KickChannel the settings are for
+    :param enabled: False to send every message without checking or pacing it
+    """
+    def __init__(self, channel, enabled: bool = True) -> None:
+        self.channel = channel
+        self.enabled: bool = enabled
+        self.max_length: int = MAX_MESSAGE_LENGTH
+        self.slow_mode_interval: float = 0.0
+        self.emotes_only: bool = False
+        self.links_enabled: bool = True
+        self.subscribers_only: bool = False
+        self.followers_only: bool = False
+        self.followers_min_minutes: int = 0
+        self._last_sent_at: float = float('-inf')
+        self._slow_mode_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def bypass(self) -> bool:
+        """
+        Whether the bot isn't limited by the chatroom settings.
+        """
+        bot_settings = self.channel.bot_settings or {}
+        return bool(self.channel.is_mod or self.channel.is_super_admin or bot_settings.get('is_broadcaster'))
+
+    def refresh(self) -> None:
+        """
+        Read the settings from channel.chatroom_settings.
+        """
+        settings = self.channel.chatroom_settings or {}
+        slow_mode = settings.get('slow_mode')
+        if isinstance(slow_mode, dict):
+            interval = slow_mode.get('message_interval') if slow_mode.get('enabled') else 0
+        else:
+            interval = settings.get('message_interval') if slow_mode else 0
+        self.slow_mode_interval = float(interval or 0)
+        self.emotes_only = _enabled(settings.get('emotes_mode'))
+        self.links_enabled = settings.get('allow_link', settings.get('links_enabled', True)) is not False
+        self.subscribers_only = _enabled(settings.get('subscribers_mode'))
+        followers_mode = settings.get('followers_mode')
+        self.followers_only = _enabled(followers_mode)
+        if isinstance(followers_mode, dict):
+            min_minutes = followers_mode.get('min_duration')
+        else:
+            min_minutes = settings.get('following_min_duration')
+        self.followers_min_minutes = int(min_minutes or 0)
+
+    def update(self, data: dict) -> None:
+        """
+        Apply the data of a ChatroomUpdatedEvent to channel.chatroom_settings.
+
+        :param data: Event data, i.e: {'id': 1234, 'slow_mode': {'enabled': True, 'message_interval': 6}, ...}
+        """
+        settings = dict(self.channel.chatroom_settings or {})
+        settings.update((key, value) for key, value in data.items() if key != 'id')
+        self.channel.chatroom_settings = settings
+        self.refresh()
+        logger.info("Chatroom settings of %s updated: %r", self.channel.streamer_name, self)
+
+    def rejection(self, text: str) -> Optional[str]:
+        """
+        :param text: Message to send
+        :return: Reason the message would be rejected (one of the REJECT_ constants), or None if it can be sent
+        """
+        if len(text) > self.max_length:
+            return REJECT_LENGTH
+        if self.bypass:
+            return None
+        if self.emotes_only and not _EMOTES_ONLY_RE.fullmatch(text):
+            return REJECT_EMOTES_ONLY
+        if not self.links_enabled and _LINK_RE.search(text):
+            return REJECT_LINKS
+        bot_settings = self.channel.bot_settings or {}
+        if self.subscribers_only and 'subscription' in bot_settings and not bot_settings['subscription']:
+            return REJECT_SUBSCRIBERS_ONLY
+        if self.followers_only and not self._is_following(bot_settings):
+            return REJECT_FOLLOWERS_ONLY
+        return None
+
+    def check(self, text: str) -> None:
+        """
+        Raise KickPolicyException if the message would be rejected by kick.
+
+        :param text: Message to send
+        """
+        if not self.enabled:
+            return
+        reason = self.rejection(text)
+        if reason is None:
+            return
+        metrics = self.channel.bot.metrics
+        if metrics.enabled:
+            metrics.inc(POLICY_REJECTED, labels={'reason': reason})
+        description = _REJECT_DESCRIPTIONS[reason].format(max_length=self.max_length)
+        raise KickPolicyException(reason, f"Message not sent to {self.channel.streamer_name}, {description}.")
+
+    @asynccontextmanager
+    async def pacing(self) -> AsyncIterator[None]:
+        """
+        Held while sending a message. In slow mode, messages to the channel are sent one at a time,
+        slow_mode_interval seconds after the previous one was sent.
+        """
+        if not self.enabled or not self.slow_mode_interval or self.bypass:
+            try:
+                yield
+            finally:
+                self._last_sent_at = time.monotonic()
+            return
+        if self._slow_mode_lock is None:
+            self._slow_mode_lock = asyncio.Lock()
+        async with self._slow_mode_lock:
+            delay = self._last_sent_at + self.slow_mode_interval - time.monotonic()
+            if delay > 0:
+                logger.debug("Slow mode in %s. Waiting %.1f seconds to send.", self.channel.streamer_name, delay)
+                await asyncio.sleep(delay)
+            try:
+                yield
+            finally:
+                self._last_sent_at = time.monotonic()
+
+    def _is_following(self, bot_settings: dict) -> bool:
+        """
+        Whether the bot can chat in followers only mode. True when the bot settings don't say.
+        """
+        if 'is_following' not in bot_settings:
+            return True
+        if not bot_settings['is_following']:
+            return False
+        following_since = bot_settings.get('following_since')
+        if not self.followers_min_minutes or not following_since:
+            return True
+        try:
+            since = datetime.fromisoformat(following_since.replace('Z', '+00:00'))
+        except (AttributeError, ValueError):
+            return True
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return (datetime.now(timezone.utc) - since).total_seconds() >= self.followers_min_minutes * 60
+
+    def __repr__(self) -> str:
+        return (f"ChatPolicy(slow_mode_interval={self.slow_mode_interval}, emotes_only={self.emotes_only}, "
+                f"links_enabled={self.links_enabled}, subscribers_only={self.subscribers_only}, "
+                f"followers_only={self.followers_only}, bypass={self.bypass})")
+
+
+def _enabled(mode) -> bool:
+    """
+    Settings are either {'enabled': bool, ...} or a plain bool.
+    """
+    if isinstance(mode, dict):
+        return bool(mode.get('enabled'))
+    return bool(mode)
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional
+from requests.cookies import RequestsCookieJar
+
+from .constants import KickAuthException
+from .kick_client import KickClient
+from .kick_session import SessionCache
+
+logger = logging.getLogger(__name__)
+
+CLEARANCE_COOKIES = ('cf_clearance', '__cf_bm', '__cfruid', '_cfuvid')
+
+
+class KickClientPool:
+    """
+    Logged in clients for many bot accounts in one process.
+
+    The clients share one http executor (instead of a thread pool per account), the session cache, and the
+    cloudflare clearance cookies of the first login, so later logins don't hit the cloudflare check again.
+    Each account keeps its own tls_client session and cookies: tls_client merges the cookies of every request
+    into its session, so a shared session would leak auth cookies between accounts.
+
+    :param accounts: (username, password) of each bot account
+    :param http_workers: Threads shared by all clients for non-blocking requests
+    :param session_cache: Session cache shared by all clients
+    :param max_concurrent_logins: Maximum amount of accounts logging in at the same time
+    :param login_stagger: Seconds between the start of two logins
+    """
+    def __init__(self,
+                 accounts: list[tuple[str, str]],
+                 http_workers: int = 16,
+                 session_cache: Optional[SessionCache] = None,
+                 max_concurrent_logins: int = 4,
+                 login_stagger: float = 0.5) -> None:
+        self.accounts: list[tuple[str, str]] = list(accounts)
+        self.session_cache: Optional[SessionCache] = session_cache
+        self.max_concurrent_logins: int = max_concurrent_logins
+        self.login_stagger: float = login_stagger
+        self.clearance: RequestsCookieJar = RequestsCookieJar()
+        self.clients: dict[str, KickClient] = {}
+        self.failed: dict[str, Exception] = {}
+        self._executor = ThreadPoolExecutor(max_workers=http_workers, thread_name_prefix="kickbot-http")
+
+    def login_all(self) -> dict[str, KickClient]:
+        """
+        Blocking version of async_login_all.
+        """
+        return asyncio.run(self.async_login_all())
+
+    async def async_login_all(self) -> dict[str, KickClient]:
+        """
+        Log in every account. The first account logs in alone, to get the cloudflare clearance cookies the other
+        accounts reuse. The rest log in concurrently, starting login_stagger seconds apart.
+        Accounts that fail to log in are logged and kept in self.failed.
+
+        :return: Logged in clients, by username
+        """
+        pending = [account for account in self.accounts if account[0] not in self.clients]
+        if not pending:
+            return self.clients
+        await self._login(*pending[0])
+        semaphore = asyncio.Semaphore(self.max_concurrent_logins)
+
+        async def staggered_login(delay: float, username: str, password: str) -> None:
+            await asyncio.sleep(delay)
+            async with semaphore:
+                await self._login(username, password)
+
+        await asyncio.gather(*(staggered_login(i * self.login_stagger, username, password)
+                               for i, (username, password) in enumerate(pending[1:])))
+        logger.info("Logged in %s/%s bot accounts", len(self.clients), len(self.accounts))
+        return self.clients
+
+    def get(self, username: str) -> KickClient:
+        client = self.clients.get(username)
+        if client is None:
+            raise KickAuthException(f"Account {username} is not logged in.")
+        return client
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+    def __len__(self) -> int:
+        return len(self.clients)
+
+    def __iter__(self) -> Iterator[KickClient]:
+        return iter(self.clients.values())
+
+    async def _login(self, username: str, password: str) -> None:
+        client = KickClient(username,
+                            password,
+                            session_cache=self.session_cache,
+                            executor=self._executor,
+                            cookies=self._clearance_copy(),
+                            login=False)
+        try:
+            await client.run_async(client.login)
+        except Exception as e:
+            logger.error("Failed to log in %s: %r", username, e)
+            self.failed[username] = e
+            return
+        self.failed.pop(username, None)
+        self.clients[username] = client
+        self._update_clearance(client.cookies)
+
+    def _clearance_copy(self) -> Optional[RequestsCookieJar]:
+        return self.clearance.copy() if len(self.clearance) else None
+
+    def _update_clearance(self, cookies: Optional[RequestsCookieJar]) -> None:
+        for cookie in cookies or []:
+            if cookie.name in CLEARANCE_COOKIES:
+                self.clearance.set_cookie(cookie)
@@ -0,0 +1,243 @@
+import collections
+import random
+import re
+import time
+
+from typing import NamedTuple, Optional
+
+from .kick_cooldown import ExpiringDict
+
+RAID_MESSAGE_RATE = 'message_rate'
+RAID_DUPLICATES = 'duplicates'
+RAID_NEW_CHATTERS = 'new_chatters'
+
+SHINGLE_SIZE = 4
+MINHASH_BANDS = 4
+MINHASH_ROWS = 2
+
+_EMOTE_RE = re.compile(r'\[emote:\d+:[^\]]*\]')
+_NOISE_RE = re.compile(r'[\W_]+')
+_MINHASH_MASKS = tuple(random.Random(0x6b69636b).getrandbits(64) for _ in range(MINHASH_BANDS * MINHASH_ROWS))
+
+
+class RaidEvent(NamedTuple):
+    kind: str
+    streamer: str
+    value: float
+    threshold: float
+    usernames: list[str]
+    at: float
+
+
+def content_bands(content: str, min_length: int = 8) -> Optional[tuple[int, ...]]:
+    """
+    Locality sensitive hash of a message: MinHash signature of its character shingles, split into bands.
+    Two messages share at least one band with high probability when their shingles are mostly the same
+    (jaccard similarity of about 0.5 or more), and rarely otherwise.
+
+    Emotes, case, whitespace and punctuation are ignored.
+
+    :param content: Message content
+    :param min_length: Messages shorter than this (after normalizing) return None, and aren't compared
+    :return: One hash per band, or None
+    """
+    text = _NOISE_RE.sub('', _EMOTE_RE.sub('', content).casefold())
+    if len(text) < min_length:
+        return None
+    shingles = {hash(text[i:i + SHINGLE_SIZE]) for i in range(len(text) - SHINGLE_SIZE + 1)}
+    signature = [min([shingle ^ mask for shingle in shingles]) for mask in _MINHASH_MASKS]
+    return tuple(hash((band, *signature[band * MINHASH_ROWS:(band + 1) * MINHASH_ROWS]))
+                 for band in range(MINHASH_BANDS))
+
+
+class _WindowMessage(NamedTuple):
+    at: float
+    username: str
+    bands: Optional[tuple[int, ...]]
+    is_duplicate: bool
+    is_new: bool
+
+
+class RaidDetector:
+    """
+    Streaming raid / spam detector for one channel. Tracks, over a sliding window of `window` seconds:
+
+    - message rate, compared to the normal rate of the chat (moving average over `baseline_seconds`)
+    - duplicate rate: messages that are near-duplicates (see content_bands) of an earlier message in the window
+    - new chatter rate: messages from users that didn't chat before (kick chat messages don't include the account age,
+      so first time chatters since the bot started are used instead)
+
+    Every update is amortized O(1), and memory is bounded by max_messages and max_chatters.
+    An event is returned once when a threshold is crossed, and again only after the value drops below it.
+
+    :param window: Sliding window in seconds
+    :param warmup: Seconds after the first message before message rate and new chatter events are returned,
+                   while the normal rate and the regular chatters are learned
+    :param min_rate: Messages per second the rate must reach for a message rate event
+    :param rate_multiplier: Times the normal message rate the rate must reach for a message rate event
+    :param baseline_seconds: Seconds the normal message rate is averaged over
+    :param duplicate_ratio: Fraction of messages in the window that are duplicates for a duplicates event
+    :param min_duplicates: Duplicate messages in the window needed for a duplicates event
+    :param new_chatter_ratio: Fraction of messages in the window from new chatters for a new chatters event
+    :param min_new_chatters: Messages from new chatters in the window needed for a new chatters event
+    :param chatter_memory: Seconds since their last message before a chatter counts as new again
+    :param max_messages: Maximum amount of messages kept in the window
+    :param max_chatters: Maximum amount of chatters remembered
+    """
+    def __init__(self,
+                 window: float = 10.0,
+                 warmup: float = 120.0,
+                 min_rate: float = 5.0,
+                 rate_multiplier: float = 4.0,
+                 baseline_seconds: float = 300.0,
+                 duplicate_ratio: float = 0.4,
+                 min_duplicates: int = 8,
+                 new_chatter_ratio: float = 0.6,
+                 min_new_chatters: int = 15,
+                 chatter_memory: float = 24 * 3600,
+                 max_messages: int = 50_000,
+                 max_chatters: int = 200_000) -> None:
+        self.window: float = window
+        self.warmup: float = warmup
+        self.min_rate: float = min_rate
+        self.rate_multiplier: float = rate_multiplier
+        self.baseline_seconds: float = baseline_seconds
+        self.duplicate_ratio: float = duplicate_ratio
+        self.min_duplicates: int = min_duplicates
+        self.new_chatter_ratio: float = new_chatter_ratio
+        self.min_new_chatters: int = min_new_chatters
+        self.max_messages: int = max_messages
+        self.baseline_rate: float = 0.0
+        self._messages: collections.deque[_WindowMessage] = collections.deque()
+        self._band_counts: dict[int, int] = {}
+        self._duplicates: int = 0
+        self._new_chatters: int = 0
+        self._chatters = ExpiringDict(chatter_memory, max_chatters)
+        self._started_at: Optional[float] = None
+        self._second: int = 0
+        self._second_count: int = 0
+        self._seconds_seen: int = 0
+        self._active: set[str] = set()
+
+    @property
+    def message_rate(self) -> float:
+        return len(self._messages) / self.window
+
+    def process(self, streamer: str, username: str, content: str, now: Optional[float] = None) -> list[RaidEvent]:
+        """
+        Add a chat message to the window.
+
+        :param streamer: Streamer the message was sent to (added to the events)
+        :param username: Sender of the message
+        :param content: Message content
+        :return: Events of the thresholds crossed by this message
+        """
+        now = time.monotonic() if now is None else now
+        if self._started_at is None:
+            self._started_at = now
+            self._second = int(now)
+        self._expire(now)
+        self._update_baseline(now)
+
+        bands = content_bands(content)
+        is_duplicate = False
+        if bands is not None:
+            band_counts = self._band_counts
+            for band in bands:
+                count = band_counts.get(band, 0)
+                if count:
+                    is_duplicate = True
+                band_counts[band] = count + 1
+        key = username.casefold()
+        is_new = self._chatters.get(key, None, now) is None
+        self._chatters.set(key, True, now)
+
+        self._messages.append(_WindowMessage(now, username, bands, is_duplicate, is_new))
+        self._duplicates += is_duplicate
+        self._new_chatters += is_new
+        if len(self._messages) > self.max_messages:
+            self._pop_oldest()
+        return self._check(streamer, now)
+
+    def _expire(self, now: float) -> None:
+        oldest = now - self.window
+        messages = self._messages
+        while messages and messages[0].at <= oldest:
+            self._pop_oldest()
+
+    def _pop_oldest(self) -> None:
+        message = self._messages.popleft()
+        self._duplicates -= message.is_duplicate
+        self._new_chatters -= message.is_new
+        if message.bands is not None:
+            band_counts = self._band_counts
+            for band in message.bands:
+                count = band_counts[band] - 1
+                if count:
+                    band_counts[band] = count
+                else:
+                    del band_counts[band]
+
+    def _update_baseline(self, now: float) -> None:
+        """
+        Exponential moving average of messages per second, updated once per second.
+        """
+        second = int(now)
+        if second != self._second:
+            for count in [self._second_count] + [0] * min(second - self._second - 1, int(self.baseline_seconds)):
+                self._seconds_seen += 1
+                alpha = max(1 / self._seconds_seen, 1 / self.baseline_seconds)
+                self.baseline_rate += alpha * (count - self.baseline_rate)
+            self._second = second
+            self._second_count = 0
+        self._second_count += 1
+
+    def _check(self, streamer: str, now: float) -> list[RaidEvent]:
+        events = []
+        total = len(self._messages)
+        warmed_up = now - self._started_at >= self.warmup
+
+        rate = total / self.window
+        rate_threshold = max(self.min_rate, self.baseline_rate * self.rate_multiplier)
+        self._trigger(events, RAID_MESSAGE_RATE, warmed_up and rate >= rate_threshold,
+                      streamer, rate, rate_threshold, now)
+
+        duplicates = self._duplicates
+        self._trigger(events, RAID_DUPLICATES,
+                      duplicates >= self.min_duplicates and duplicates >= total * self.duplicate_ratio,
+                      streamer, duplicates / total, self.duplicate_ratio, now)
+
+        new_chatters = self._new_chatters
+        self._trigger(events, RAID_NEW_CHATTERS,
+                      warmed_up and new_chatters >= self.min_new_chatters
+                      and new_chatters >= total * self.new_chatter_ratio,
+                      streamer, new_chatters / total, self.new_chatter_ratio, now)
+        return events
+
+    def _trigger(self,
+                 events: list[RaidEvent],
+                 kind: str,
+                 crossed: bool,
+                 streamer: str,
+                 value: float,
+                 threshold: float,
+                 now: float) -> None:
+        if not crossed:
+            self._active.discard(kind)
+            return
+        if kind in self._active:
+            return
+        self._active.add(kind)
+        events.append(RaidEvent(kind, streamer, value, threshold, self._usernames(kind), now))
+
+    def _usernames(self, kind: str) -> list[str]:
+        """
+        Senders involved in an event: senders of duplicate messages, or new chatters, in the window.
+        """
+        if kind == RAID_DUPLICATES:
+            names = (message.username for message in self._messages if message.is_duplicate)
+        elif kind == RAID_NEW_CHATTERS:
+            names = (message.username for message in self._messages if message.is_new)
+        else:
+            return []
+        return list(dict.fromkeys(names))
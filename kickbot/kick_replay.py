@@ -0,0 +1,398 @@
+"""
+Record the websocket frames a bot receives, and replay them into a bot offline (no login, no kick.com / pusher
+connection), to test handlers and measure their throughput and latency.
+
+    bot.start_recording('chat.jsonl.gz')
+    ...
+    bot = replay_bot('chat.jsonl.gz')
+    bot.add_command_handler('!hello', hello)
+    report = asyncio.run(replay(bot, 'chat.jsonl.gz', speed=10))
+"""
+import asyncio
+import gzip
+import json
+import logging
+import re
+import statistics
+import time
+import websockets
+
+from typing import Optional, Union
+from requests.cookies import RequestsCookieJar
+
+from .constants import KickBotException
+from .kick_client import KickClient
+
+logger = logging.getLogger(__name__)
+
+_STREAMER_INFO_RE = re.compile(r'/api/v2/channels/([^/]+)$')
+_CHATROOM_SETTINGS_RE = re.compile(r'/channels/([^/]+)/chatroom/settings$')
+_BOT_SETTINGS_RE = re.compile(r'/api/v2/channels/([^/]+)/me$')
+_LIVESTREAM_RE = re.compile(r'/api/v2/channels/([^/]+)/livestream$')
+_CHAT_CHANNEL_RE = re.compile(r'^chatrooms\.(\d+)\.v2$')
+
+
+class FrameRecorder:
+    """
+    Append-only recording of raw websocket frames, as gzip compressed json lines: {"t": seconds, "frame": raw frame}.
+    A line with the info / settings of the monitored channels is written first, so they can be served on replay.
+    Recording again to the same file appends a new gzip member (gzip readers read them as one stream).
+
+    :param path: File to append to, i.e: 'chat.jsonl.gz'
+    :param flush_every: Frames written between flushes to disk
+    """
+    def __init__(self, path: str, flush_every: int = 100) -> None:
+        self.path: str = path
+        self.flush_every: int = flush_every
+        self.frames: int = 0
+        self._file = gzip.open(path, 'at', encoding='utf-8')
+        self._started_at: float = time.monotonic()
+
+    def write_channels(self, channels: dict) -> None:
+        """
+        :param channels: KickChannels of the bot, by streamer slug
+        """
+        data = {
+            slug: {
+                'streamer_info': channel.streamer_info,
+                'chatroom_settings': channel.chatroom_settings,
+                'bot_settings': channel.bot_settings,
+            }
+            for slug, channel in channels.items()
+        }
+        self._file.write(json.dumps({'channels': data}) + '\n')
+
+    def record(self, raw_frame: Union[str, bytes]) -> None:
+        if isinstance(raw_frame, bytes):
+            raw_frame = raw_frame.decode('utf-8')
+        self._file.write(json.dumps({'t': round(time.monotonic() - self._started_at, 6), 'frame': raw_frame}) + '\n')
+        self.frames += 1
+        if self.frames % self.flush_every == 0:
+            self._file.flush()
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+
+def read_recording(path: str) -> tuple[dict, list[tuple[float, str]]]:
+    """
+    Read a recording made with FrameRecorder.
+
+    :param path: Recording file
+    :return: Channel info by streamer slug, and (seconds, raw frame) of every frame. Appended recordings follow
+             each other in time.
+    """
+    channels = {}
+    frames = []
+    offset = 0.0
+    last = 0.0
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if 'channels' in entry:
+                channels.update(entry['channels'])
+                offset = last
+                continue
+            last = offset + entry['t']
+            frames.append((last, entry['frame']))
+    return channels, frames
+
+
+class _ReplayResponse:
+    def __init__(self, status_code: int, data: Optional[dict] = None) -> None:
+        self.status_code: int = status_code
+        self._data: dict = data if data is not None else {}
+        self.headers: dict = {}
+        self.cookies = RequestsCookieJar()
+        self.text: str = json.dumps(self._data)
+
+    def json(self) -> dict:
+        return self._data
+
+
+class ReplayScraper:
+    """
+    Stands in for the tls_client session of a replay client. Serves the recorded channel info and settings,
+    and keeps every POST (messages, replies, bans) in self.posts instead of sending it.
+
+    :param channels: Channel info by streamer slug, from read_recording
+    :param response_delay: Seconds each POST takes, to simulate the latency of kick.com
+    """
+    def __init__(self, channels: dict, response_delay: float = 0.0) -> None:
+        self.channels: dict = channels
+        self.response_delay: float = response_delay
+        self.posts: list[tuple[str, Optional[dict]]] = []
+
+    def get(self, url: str, **kwargs) -> _ReplayResponse:
+        if 'viewer-count' in url:
+            return _ReplayResponse(200, {'data': {'viewer_count': 0}})
+        for pattern, key in ((_LIVESTREAM_RE, 'livestream'),
+                             (_BOT_SETTINGS_RE, 'bot_settings'),
+                             (_CHATROOM_SETTINGS_RE, 'chatroom_settings'),
+                             (_STREAMER_INFO_RE, 'streamer_info')):
+            match = pattern.search(url)
+            if match is None:
+                continue
+            channel = self.channels.get(match.group(1))
+            if channel is None:
+                return _ReplayResponse(404)
+            if key == 'chatroom_settings':
+                return _ReplayResponse(200, {'data': {'settings': channel.get(key) or {}}})
+            if key == 'livestream':
+                return _ReplayResponse(200, {'data': channel.get(key)})
+            return _ReplayResponse(200, channel.get(key) or {})
+        return _ReplayResponse(404)
+
+    def post(self, url: str, json: Optional[dict] = None, **kwargs) -> _ReplayResponse:
+        if self.response_delay:
+            time.sleep(self.response_delay)
+        self.posts.append((url, json))
+        return _ReplayResponse(200, {'status': {'error': False, 'code': 200}})
+
+
+def replay_client(channels: dict, response_delay: float = 0.0, bot_name: str = 'replay_bot') -> KickClient:
+    """
+    KickClient that isn't logged in, with a ReplayScraper instead of a tls_client session.
+    """
+    client = KickClient(bot_name, '', login=False)
+    client.scraper = ReplayScraper(channels, response_delay)
+    client.auth_token = 'replay'
+    client.xsrf = 'replay'
+    client.cookies = RequestsCookieJar()
+    client.bot_name = bot_name
+    client.user_id = 0
+    client.user_data = {'id': 0, 'username': bot_name}
+    return client
+
+
+def replay_bot(path: str, response_delay: float = 0.0, **bot_kwargs):
+    """
+    KickBot for replaying a recording, with every recorded streamer set. Add handlers, then run replay().
+
+    :param path: Recording file
+    :param response_delay: Seconds each POST (message, reply, ban) takes
+    :param bot_kwargs: Other KickBot arguments, i.e: max_workers
+    :return: KickBot
+    """
+    from .kick_bot import KickBot
+
+    channels, frames = read_recording(path)
+    if not channels:
+        channels = _channels_from_frames(frames)
+    bot = KickBot(client=replay_client(channels, response_delay), **bot_kwargs)
+    for slug in channels:
+        bot.set_streamer(slug)
+    return bot
+
+
+def _channels_from_frames(frames: list[tuple[float, str]]) -> dict:
+    """
+    Channel info for recordings without a channels line: one channel per chatroom found in the frames.
+    """
+    channels = {}
+    for _, raw_frame in frames:
+        match = _CHAT_CHANNEL_RE.match(json.loads(raw_frame).get('channel') or '')
+        if match is None:
+            continue
+        chatroom_id = int(match.group(1))
+        slug = f"chatroom-{chatroom_id}"
+        channels.setdefault(slug, {
+            'streamer_info': {'id': chatroom_id, 'slug': slug, 'chatroom': {'id': chatroom_id}},
+            'chatroom_settings': {},
+            'bot_settings': {'is_moderator': True, 'is_super_admin': False},
+        })
+    return channels
+
+
+class ReplayServer:
+    """
+    Local pusher websocket server, streaming the frames of a recording to every client that connects.
+    Protocol frames (connection established, subscriptions, pings) are answered live, and not replayed.
+
+    :param path: Recording file
+    :param speed: Replay speed, i.e: 1 for real time, 10 for 10x. 0 to send frames as fast as possible.
+    """
+    def __init__(self, path: str, speed: float = 1.0, host: str = '127.0.0.1', port: int = 0) -> None:
+        _, frames = read_recording(path)
+        self.frames: list[tuple[float, str]] = [(t, raw) for t, raw in frames if not _is_protocol_frame(raw)]
+        self.speed: float = speed
+        self.host: str = host
+        self.port: int = port
+        self.sent: int = 0
+        self.done = asyncio.Event()
+        self._server = None
+
+    @property
+    def uri(self) -> str:
+        return f"ws://{self.host}:{self.port}/app/replay?protocol=7&client=js&version=7.6.0&flash=false"
+
+    async def __aenter__(self) -> 'ReplayServer':
+        self._server = await websockets.serve(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _serve(self, sock) -> None:
+        needed = {json.loads(raw).get('channel') for _, raw in self.frames} - {None}
+        subscribed = set()
+        all_subscribed = asyncio.Event()
+        if not needed:
+            all_subscribed.set()
+
+        async def answer() -> None:
+            async for raw in sock:
+                frame = json.loads(raw)
+                match frame.get('event'):
+                    case 'pusher:subscribe':
+                        channel = frame['data']['channel']
+                        subscribed.add(channel)
+                        await sock.send(json.dumps({'event': 'pusher_internal:subscription_succeeded',
+                                                    'data': '{}', 'channel': channel}))
+                        if needed <= subscribed:
+                            all_subscribed.set()
+                    case 'pusher:ping':
+                        await sock.send(json.dumps({'event': 'pusher:pong', 'data': {}}))
+
+        await sock.send(json.dumps({'event': 'pusher:connection_established',
+                                    'data': json.dumps({'socket_id': '0.replay', 'activity_timeout': 120})}))
+        answer_task = asyncio.create_task(answer())
+        try:
+            await asyncio.wait_for(all_subscribed.wait(), timeout=10)
+        except asyncio.TimeoutError:
+            logger.warning("Replay client didn't subscribe to %s, streaming anyway", needed - subscribed)
+        try:
+            await self._stream(sock)
+        finally:
+            self.done.set()
+        # Keep the connection open (answering pings) until the client closes it
+        try:
+            await answer_task
+        except websockets.ConnectionClosed:
+            pass
+
+    async def _stream(self, sock) -> None:
+        start = time.monotonic()
+        first = self.frames[0][0] if self.frames else 0.0
+        for t, raw in self.frames:
+            if self.speed:
+                delay = (t - first) / self.speed - (time.monotonic() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await sock.send(raw)
+            self.sent += 1
+
+
+def _is_protocol_frame(raw_frame: str) -> bool:
+    event = json.loads(raw_frame).get('event') or ''
+    return event.startswith('pusher:') or event.startswith('pusher_internal:')
+
+
+class ReplayReport:
+    """
+    Throughput and latency of a replay. Latency is measured from a frame being read from the socket
+    to its handlers finishing.
+    """
+    def __init__(self, frames: int, dispatched: list[float], seconds: float, posts: int) -> None:
+        self.frames: int = frames
+        self.dispatched: int = len(dispatched)
+        self.seconds: float = seconds
+        self.posts: int = posts
+        latencies = sorted(dispatched)
+        self.latency_p50: float = statistics.median(latencies) if latencies else 0.0
+        self.latency_p99: float = latencies[int(len(latencies) * 0.99) - 1 if len(latencies) > 1 else 0] \
+            if latencies else 0.0
+        self.latency_max: float = latencies[-1] if latencies else 0.0
+
+    @property
+    def frames_per_second(self) -> float:
+        return self.frames / self.seconds if self.seconds else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            'frames': self.frames,
+            'dispatched': self.dispatched,
+            'seconds': round(self.seconds, 3),
+            'frames_per_second': round(self.frames_per_second, 1),
+            'latency_p50_ms': round(self.latency_p50 * 1000, 3),
+            'latency_p99_ms': round(self.latency_p99 * 1000, 3),
+            'latency_max_ms': round(self.latency_max * 1000, 3),
+            'posts': self.posts,
+        }
+
+    def __repr__(self) -> str:
+        return f"ReplayReport({self.as_dict()})"
+
+
+async def replay(bot, path: str, speed: float = 1.0) -> ReplayReport:
+    """
+    Replay a recording into a bot (from replay_bot) through a local ReplayServer, until every frame
+    has been sent and handled.
+
+    :param bot: KickBot with handlers added
+    :param path: Recording file
+    :param speed: Replay speed, i.e: 1 for real time, 10 for 10x. 0 to send frames as fast as possible.
+    :return: ReplayReport
+    """
+    received: dict[int, tuple[float, dict]] = {}
+    latencies: list[float] = []
+    frames_read = 0
+    handle_frame = bot.connection.on_frame
+    handle_chat_message = bot._handle_chat_message
+    handle_event = bot._handle_event
+
+    async def timed_handle_frame(frame: dict) -> bool:
+        nonlocal frames_read
+        frames_read += 1
+        # The entry keeps the frame alive (so its id isn't reused) until a handler wrapper or this removes it
+        received[id(frame)] = (time.perf_counter(), frame)
+        dispatched = False
+        try:
+            dispatched = await handle_frame(frame)
+        finally:
+            if not dispatched:
+                received.pop(id(frame), None)
+        return dispatched
+
+    def timed(handle):
+        async def wrapper(frame: dict) -> None:
+            try:
+                await handle(frame)
+            finally:
+                entry = received.pop(id(frame), None)
+                if entry is not None:
+                    latencies.append(time.perf_counter() - entry[0])
+        return wrapper
+
+    async with ReplayServer(path, speed=speed) as server:
+        bot.connection.uri = server.uri
+        bot.connection.on_frame = timed_handle_frame
+        bot._handle_chat_message = timed(handle_chat_message)
+        bot._handle_event = timed(handle_event)
+        start = time.perf_counter()
+        poll_task = asyncio.create_task(bot.async_poll())
+        try:
+            done_task = asyncio.create_task(server.done.wait())
+            await asyncio.wait([poll_task, done_task], return_when=asyncio.FIRST_COMPLETED)
+            if poll_task.done():
+                done_task.cancel()
+                poll_task.result()
+            # Each frame is read once, even when a redundant connection receives it on every socket
+            while frames_read < len(server.frames):
+                if poll_task.done():
+                    poll_task.result()
+                    raise KickBotException("The bot stopped polling before every frame was replayed.")
+                await asyncio.sleep(0.01)
+            await bot._dispatch_queue.join()
+            seconds = time.perf_counter() - start
+        finally:
+            await bot.connection.close()
+            await poll_task
+            bot.connection.on_frame = handle_frame
+            del bot._handle_chat_message, bot._handle_event
+    return ReplayReport(len(server.frames), latencies, seconds, len(bot.client.scraper.posts))
@@ -0,0 +1,263 @@
+import fnmatch
+import re
+
+from typing import Callable, NamedTuple, Optional
+
+from .constants import KickBotException
+from .kick_cooldown import Cooldown
+
+
+class Route(NamedTuple):
+    kind: str
+    trigger: str
+    handler: Callable
+    cooldown: Optional[Cooldown] = None
+
+
+class _TriggerTrie:
+    """
+    Character trie of triggers. Used as a prefix trie (prefix handlers), and with failure links
+    added by build_automaton, as an Aho-Corasick automaton (keyword handlers).
+    """
+    __slots__ = ('goto', 'fail', 'output')
+
+    def __init__(self) -> None:
+        self.goto: list[dict[str, int]] = [{}]
+        self.fail: list[int] = [0]
+        self.output: list[list[str]] = [[]]
+
+    def add(self, trigger: str) -> None:
+        node = 0
+        for char in trigger:
+            next_node = self.goto[node].get(char)
+            if next_node is None:
+                next_node = len(self.goto)
+                self.goto[node][char] = next_node
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            node = next_node
+        self.output[node].append(trigger)
+
+    def build_automaton(self) -> None:
+        """
+        Breadth first pass setting the failure link of every node, and merging the output of
+        the failure node into each node.
+        """
+        queue = list(self.goto[0].values())
+        for node in queue:
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fail = self.fail[node]
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[child] = self.goto[fail].get(char, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def prefixes_of(self, text: str) -> list[str]:
+        """
+        :return: Triggers that text starts with
+        """
+        found = []
+        node = 0
+        for char in text:
+            node = self.goto[node].get(char)
+            if node is None:
+                break
+            found.extend(self.output[node])
+        return found
+
+    def search(self, text: str) -> list[str]:
+        """
+        :return: Triggers found anywhere in text, each one once
+        """
+        found = {}
+        node = 0
+        goto, fail, output = self.goto, self.fail, self.output
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for trigger in output[node]:
+                found[trigger] = None
+        return list(found)
+
+
+class _PatternSet:
+    """
+    Regex patterns matched one at a time, so every pattern that matches is found. Patterns without groups are also
+    combined into one regex, used as a prefilter: when it doesn't match, none of them are tried one by one.
+    Patterns with groups are left out of it (their group names / numbers would clash), and always tried.
+    """
+    __slots__ = ('patterns', 'prefiltered', 'prefilter', 'match')
+
+    def __init__(self, patterns: dict[str, str], fullmatch: bool = False) -> None:
+        """
+        :param patterns: Regex by trigger, in the order the triggers were added
+        :param fullmatch: Whether a pattern has to match the whole text, instead of anywhere in it
+        """
+        self.patterns: list[tuple[str, re.Pattern]] = [
+            (trigger, re.compile(regex, re.IGNORECASE)) for trigger, regex in patterns.items()
+        ]
+        self.prefiltered: set[str] = {
+            trigger for trigger, compiled in self.patterns if _combinable(compiled)
+        }
+        self.prefilter: Optional[re.Pattern] = None
+        if self.prefiltered:
+            self.prefilter = re.compile('|'.join(f"(?:{patterns[trigger]})" for trigger in patterns
+                                                 if trigger in self.prefiltered), re.IGNORECASE)
+        self.match: Callable = re.Pattern.fullmatch if fullmatch else re.Pattern.search
+
+    def matches(self, text: str) -> list[str]:
+        """
+        :return: Triggers whose pattern matches the text, in the order they were added
+        """
+        skip_prefiltered = self.prefilter is not None and self.match(self.prefilter, text) is None
+        return [trigger for trigger, compiled in self.patterns
+                if not (skip_prefiltered and trigger in self.prefiltered) and self.match(compiled, text) is not None]
+
+
+def _combinable(compiled: re.Pattern) -> bool:
+    """
+    Whether a pattern can be part of a combined regex: no groups, and no global inline flags.
+    """
+    if compiled.groups:
+        return False
+    try:
+        re.compile(f"(?:)|(?:{compiled.pattern})")
+    except re.error:
+        return False
+    return True
+
+
+class CommandRouter:
+    """
+    Matches chat messages against every registered trigger:
+
+    - message: the whole message matches (case-insensitive)
+    - command: the first word matches (case-insensitive), aliases are registered as extra commands
+    - prefix: the message starts with the prefix (case-insensitive)
+    - keyword: the keyword appears anywhere in the message (case-insensitive)
+    - regex: the pattern matches anywhere in the message (case-insensitive)
+    - glob: the glob pattern (* ? [seq]) matches the whole message (case-insensitive)
+
+    Prefix and keyword triggers are compiled into a trie / Aho-Corasick automaton, so a message is matched in one
+    pass over its content, no matter how many are registered. Regex and glob triggers are matched one at a time,
+    behind one combined regex each that skips them when none can match. Triggers are compiled again on the first
+    match after a trigger is added.
+    """
+    def __init__(self) -> None:
+        self.messages: dict[str, Callable] = {}
+        self.commands: dict[str, Callable] = {}
+        self.prefixes: dict[str, Callable] = {}
+        self.keywords: dict[str, Callable] = {}
+        self.patterns: dict[str, Callable] = {}
+        self.globs: dict[str, Callable] = {}
+        self._prefix_trie: Optional[_TriggerTrie] = None
+        self._keyword_automaton: Optional[_TriggerTrie] = None
+        self._pattern_set: Optional[_PatternSet] = None
+        self._glob_set: Optional[_PatternSet] = None
+        self.cooldowns: dict[tuple[str, str], Cooldown] = {}
+        self._compiled: bool = True
+
+    def __bool__(self) -> bool:
+        return bool(self.messages or self.commands or self.prefixes or self.keywords or self.patterns or self.globs)
+
+    def add_message(self, message: str, handler: Callable, cooldown: Optional[Cooldown] = None) -> None:
+        self._add(self.messages, 'message', message.casefold(), handler, cooldown)
+
+    def add_command(self,
+                    command: str,
+                    handler: Callable,
+                    aliases: Optional[list[str]] = None,
+                    cooldown: Optional[Cooldown] = None) -> None:
+        commands = [command] + list(aliases or [])
+        for name in commands:
+            if name.casefold() in self.commands:
+                raise KickBotException(f"Command: {name.casefold()} already set in handled commands")
+        for name in commands:
+            self._add(self.commands, 'command', name.casefold(), handler, cooldown)
+
+    def add_prefix(self, prefix: str, handler: Callable, cooldown: Optional[Cooldown] = None) -> None:
+        self._add(self.prefixes, 'prefix', prefix.casefold(), handler, cooldown)
+
+    def add_keyword(self, keyword: str, handler: Callable, cooldown: Optional[Cooldown] = None) -> None:
+        self._add(self.keywords, 'keyword', keyword.casefold(), handler, cooldown)
+
+    def add_regex(self, pattern: str, handler: Callable, cooldown: Optional[Cooldown] = None) -> None:
+        try:
+            re.compile(pattern, re.IGNORECASE)
+        except re.error as e:
+            raise KickBotException(f"Invalid regex pattern {pattern!r}: {e}")
+        self._add(self.patterns, 'regex', pattern, handler, cooldown)
+
+    def add_glob(self, pattern: str, handler: Callable, cooldown: Optional[Cooldown] = None) -> None:
+        self._add(self.globs, 'glob', pattern.casefold(), handler, cooldown)
+
+    def match(self, content: str) -> list[Route]:
+        """
+        Find the handlers for a message.
+
+        A message trigger and a command trigger never both match, message triggers are checked first (as before).
+        Every matching prefix, keyword, regex, and glob trigger is returned after that.
+
+        :param content: Message content
+        :return: Matching routes
+        """
+        if not self._compiled:
+            self._compile()
+        routes = []
+        folded = content.casefold()
+        if folded in self.messages:
+            routes.append(self._route('message', folded, self.messages[folded]))
+        elif self.commands:
+            words = folded.split(maxsplit=1)
+            if words and words[0] in self.commands:
+                routes.append(self._route('command', words[0], self.commands[words[0]]))
+        if self._prefix_trie is not None:
+            routes.extend(self._route('prefix', prefix, self.prefixes[prefix])
+                          for prefix in self._prefix_trie.prefixes_of(folded))
+        if self._keyword_automaton is not None:
+            routes.extend(self._route('keyword', keyword, self.keywords[keyword])
+                          for keyword in self._keyword_automaton.search(folded))
+        if self._pattern_set is not None:
+            routes.extend(self._route('regex', pattern, self.patterns[pattern])
+                          for pattern in self._pattern_set.matches(content))
+        if self._glob_set is not None:
+            routes.extend(self._route('glob', glob, self.globs[glob]) for glob in self._glob_set.matches(folded))
+        return routes
+
+    def _route(self, kind: str, trigger: str, handler: Callable) -> Route:
+        return Route(kind, trigger, handler, self.cooldowns.get((kind, trigger)))
+
+    def _add(self,
+             triggers: dict[str, Callable],
+             kind: str,
+             trigger: str,
+             handler: Callable,
+             cooldown: Optional[Cooldown] = None) -> None:
+        if not trigger:
+            raise KickBotException(f"Invalid {kind} trigger. Must be a non empty string.")
+        if triggers.get(trigger) is not None:
+            raise KickBotException(f"{kind.capitalize()}: {trigger} already set in handled {kind}s")
+        triggers[trigger] = handler
+        if cooldown is not None:
+            self.cooldowns[(kind, trigger)] = cooldown
+        self._compiled = False
+
+    def _compile(self) -> None:
+        self._prefix_trie = None
+        if self.prefixes:
+            self._prefix_trie = _TriggerTrie()
+            for prefix in self.prefixes:
+                self._prefix_trie.add(prefix)
+        self._keyword_automaton = None
+        if self.keywords:
+            self._keyword_automaton = _TriggerTrie()
+            for keyword in self.keywords:
+                self._keyword_automaton.add(keyword)
+            self._keyword_automaton.build_automaton()
+        self._pattern_set = _PatternSet({pattern: pattern for pattern in self.patterns}) if self.patterns else None
+        self._glob_set = _PatternSet({glob: fnmatch.translate(glob) for glob in self.globs}, fullmatch=True) \
+            if self.globs else None
+        self._compiled = True
@@ -0,0 +1,282 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from .constants import KickBotException
+
+logger = logging.getLogger(__name__)
+
+
+class CronSpec:
+    """
+    Cron style schedule: 'minute hour day-of-month month day-of-week', evaluated in local time.
+
+    Each field supports '*', numbers, ranges 'a-b', lists 'a,b' and steps '*/n' or 'a-b/n'.
+    Day of week is 0-6 starting on sunday (7 is also sunday). As in cron, when both day-of-month and
+    day-of-week are restricted, a day matching either one is used.
+    """
+    _FIELDS = (('minute', 0, 59), ('hour', 0, 23), ('day', 1, 31), ('month', 1, 12), ('weekday', 0, 7))
+
+    def __init__(self, spec: str) -> None:
+        parts = spec.split()
+        if len(parts) != 5:
+            raise KickBotException(f"Invalid cron spec {spec!r}. Must have 5 fields.")
+        self.spec = spec
+        fields = [self._parse_field(part, low, high) for part, (_, low, high) in zip(parts, self._FIELDS)]
+        self.minutes, self.hours, self.days, self.months, weekdays = fields
+        self.weekdays = {day % 7 for day in weekdays}
+        self._any_day = parts[2] == '*'
+        self._any_weekday = parts[4] == '*'
+
+    def next_after(self, after: datetime) -> datetime:
+        """
+        First time matching the spec after the given time.
+
+        :param after: Time to start searching from
+        :return: Next matching time, to the minute
+        """
+        candidate = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 5)
+        while candidate < limit:
+            if candidate.month not in self.months:
+                year, month = divmod(candidate.month, 12)
+                candidate = candidate.replace(year=candidate.year + year, month=month + 1, day=1, hour=0, minute=0)
+                continue
+            if not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+                continue
+            if candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+                continue
+            return candidate
+        raise KickBotException(f"Cron spec {self.spec!r} never matches.")
+
+    def _day_matches(self, candidate: datetime) -> bool:
+        day_match = candidate.day in self.days
+        weekday_match = (candidate.isoweekday() % 7) in self.weekdays
+        if self._any_day:
+            return weekday_match
+        if self._any_weekday:
+            return day_match
+        return day_match or weekday_match
+
+    def _parse_field(self, field: str, low: int, high: int) -> set[int]:
+        values = set()
+        for item in field.split(','):
+            value_range, _, step = item.partition('/')
+            try:
+                step = int(step) if step else 1
+                if value_range == '*':
+                    start, end = low, high
+                elif '-' in value_range:
+                    start, end = (int(value) for value in value_range.split('-', 1))
+                else:
+                    start = int(value_range)
+                    end = high if step > 1 else start
+            except ValueError:
+                raise KickBotException(f"Invalid cron field {field!r} in {self.spec!r}")
+            if step < 1 or start < low or end > high or start > end:
+                raise KickBotException(f"Cron field {field!r} out of range ({low}-{high}) in {self.spec!r}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def __repr__(self) -> str:
+        return f"CronSpec({self.spec!r})"
+
+
+class TimedEvent:
+    """
+    A scheduled function. Returned by KickBot.add_timed_event / add_cron_event, and can be passed to
+    KickBot.cancel_timed_event.
+    """
+    __slots__ = ('id', 'function', 'interval', 'cron', 'jitter', 'next_run', 'runs', 'cancelled', '_base', '_task',
+                 '_cron_due', '_last_fired_minute')
+
+    def __init__(self,
+                 event_id: int,
+                 function: Callable,
+                 interval: Optional[float] = None,
+                 cron: Optional[CronSpec] = None,
+                 jitter: float = 0.0) -> None:
+        self.id: int = event_id
+        self.function: Callable = function
+        self.interval: Optional[float] = interval
+        self.cron: Optional[CronSpec] = cron
+        self.jitter: float = jitter
+        self.next_run: Optional[datetime] = None
+        self.runs: int = 0
+        self.cancelled: bool = False
+        self._base: float = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._cron_due: Optional[datetime] = None
+        self._last_fired_minute: Optional[datetime] = None
+
+    def __repr__(self) -> str:
+        schedule = f"every {self.interval}s" if self.cron is None else self.cron.spec
+        return f"TimedEvent(id={self.id}, function={self.function.__name__}, {schedule}, next_run={self.next_run})"
+
+
+class Scheduler:
+    """
+    Runs all timed events of the bot on the bots event loop, using a heap ordered by next run time.
+
+    Interval events run at a fixed rate: the next run is computed from the previous scheduled time,
+    not from when the function finished, so they don't drift. Jitter is added on top of the scheduled
+    time without moving it. A run is skipped if the previous run of the same event is still going.
+    """
+    def __init__(self, bot) -> None:
+        self.bot = bot
+        self._events: dict[int, TimedEvent] = {}
+        self._heap: list[tuple[float, int, TimedEvent]] = []
+        self._ids = itertools.count(1)
+        self._sequence = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def add_interval(self, interval: float, function: Callable, jitter: float = 0.0) -> TimedEvent:
+        """
+        Schedule a function to be called every `interval` seconds. The first call is one interval from now.
+
+        :param interval: Seconds between calls
+        :param function: Async function called with the bot
+        :param jitter: Maximum random seconds added to each call time
+        :return: The scheduled TimedEvent
+        """
+        event = TimedEvent(next(self._ids), function, interval=interval, jitter=jitter)
+        self._add(event)
+        return event
+
+    def add_cron(self, spec: str, function: Callable, jitter: float = 0.0) -> TimedEvent:
+        """
+        Schedule a function to be called at times matching a cron spec.
+
+        :param spec: Cron spec, i.e: '*/30 * * * *' (every 30 minutes)
+        :param function: Async function called with the bot
+        :param jitter: Maximum random seconds added to each call time
+        :return: The scheduled TimedEvent
+        """
+        event = TimedEvent(next(self._ids), function, cron=CronSpec(spec), jitter=jitter)
+        self._add(event)
+        return event
+
+    def cancel(self, event: TimedEvent | int) -> bool:
+        """
+        Cancel a timed event. Cancelled events are dropped from the heap when they come up.
+
+        :param event: TimedEvent or its id
+        :return: True if the event was scheduled
+        """
+        event_id = event.id if isinstance(event, TimedEvent) else event
+        event = self._events.pop(event_id, None)
+        if event is None:
+            return False
+        event.cancelled = True
+        return True
+
+    def events(self) -> list[TimedEvent]:
+        """
+        :return: Scheduled events, ordered by next run
+        """
+        return sorted(self._events.values(), key=lambda event: event.next_run)
+
+    async def run(self) -> None:
+        """
+        Run scheduled events until cancelled. Started by KickBot._poll
+        """
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        now = self._loop.time()
+        self._heap = []
+        for event in self._events.values():
+            self._schedule_first(event, now)
+        try:
+            while True:
+                await self._wait_for_next()
+                now = self._loop.time()
+                while self._heap and self._heap[0][0] <= now:
+                    _, _, event = heapq.heappop(self._heap)
+                    if event.cancelled:
+                        continue
+                    self._fire(event)
+                    self._schedule_next(event, now)
+        finally:
+            for event in self._events.values():
+                if event._task is not None:
+                    event._task.cancel()
+            self._loop = None
+
+    def _add(self, event: TimedEvent) -> None:
+        self._events[event.id] = event
+        if self._loop is not None:
+            self._schedule_first(event, self._loop.time())
+            self._wakeup.set()
+        else:
+            # Not running yet, run() makes the real schedule. This only orders events()
+            wall_now = datetime.now()
+            if event.cron is None:
+                event.next_run = wall_now + timedelta(seconds=event.interval)
+            else:
+                event.next_run = event.cron.next_after(wall_now)
+
+    async def _wait_for_next(self) -> None:
+        self._wakeup.clear()
+        timeout = None
+        if self._heap:
+            timeout = max(0.0, self._heap[0][0] - self._loop.time())
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _schedule_first(self, event: TimedEvent, now: float) -> None:
+        if event.cron is None:
+            event._base = now + event.interval
+        else:
+            event._base = self._next_cron_time(event, now)
+        self._push(event)
+
+    def _schedule_next(self, event: TimedEvent, now: float) -> None:
+        if event.cron is None:
+            missed = max(0, int((now - event._base) // event.interval))
+            event._base += event.interval * (missed + 1)
+        else:
+            event._last_fired_minute = event._cron_due
+            event._base = self._next_cron_time(event, now)
+        self._push(event)
+
+    def _next_cron_time(self, event: TimedEvent, now: float) -> float:
+        wall_now = datetime.now()
+        after = wall_now
+        # The loop timer can fire a little before the minute starts, or the clock can be set back,
+        # so the minute that just ran could come up again.
+        if event._last_fired_minute is not None and event._last_fired_minute > after:
+            after = event._last_fired_minute
+        event._cron_due = event.cron.next_after(after)
+        return now + (event._cron_due - wall_now).total_seconds()
+
+    def _push(self, event: TimedEvent) -> None:
+        due = event._base + (random.uniform(0, event.jitter) if event.jitter else 0.0)
+        event.next_run = datetime.now() + timedelta(seconds=due - self._loop.time())
+        heapq.heappush(self._heap, (due, next(self._sequence), event))
+
+    def _fire(self, event: TimedEvent) -> None:
+        if event._task is not None and not event._task.done():
+            logger.warning("Timed Event | Skipped '%s', previous run still going.", event.function.__name__)
+            return
+        event.runs += 1
+        event._task = asyncio.create_task(self._run_event(event))
+
+    async def _run_event(self, event: TimedEvent) -> None:
+        try:
+            await event.function(self.bot)
+            logger.info("Timed Event | Called Function: '%s'", event.function.__name__)
+        except Exception:
+            logger.exception("Timed Event | Error in function '%s'", event.function.__name__)
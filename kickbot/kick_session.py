@@ -0,0 +1,141 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import time
+
+from typing import Optional
+from requests.cookies import RequestsCookieJar, create_cookie
+
+from .constants import KickBotException
+from .kick_cache import default_cache_directory
+
+logger = logging.getLogger(__name__)
+
+SESSION_CACHE_VERSION = 1
+KEY_ITERATIONS = 100_000
+
+
+class SessionCache:
+    """
+    Encrypted on-disk cache of the bot's login session (auth token, xsrf token, cookies, and user data),
+    so restarts skip the login flow. Encrypted with a key derived from the account password.
+    Requires the cryptography package (pip install kickbot[session]).
+
+    :param directory: Directory the session files are stored in. Defaults to ~/.cache/kickbot
+    :param max_age: Seconds after login a cached session is replaced by a fresh login
+    :param refresh_margin: Cookies expiring within this many seconds are refreshed when the session is restored
+    """
+    def __init__(self,
+                 directory: Optional[str] = None,
+                 max_age: float = 7 * 24 * 3600,
+                 refresh_margin: float = 600.0) -> None:
+        try:
+            # Imported here, so importing kickbot doesn't load cryptography
+            from cryptography.fernet import Fernet, InvalidToken
+        except ImportError as e:
+            raise KickBotException("SessionCache requires the cryptography package. "
+                                   "Install it with: pip install kickbot[session]") from e
+        self._fernet = Fernet
+        self._invalid_token = InvalidToken
+        self.directory: str = directory or default_cache_directory()
+        self.max_age: float = max_age
+        self.refresh_margin: float = refresh_margin
+
+    def path(self, username: str) -> str:
+        name = hashlib.sha256(username.casefold().encode()).hexdigest()[:24]
+        return os.path.join(self.directory, f"{name}.session")
+
+    def load(self, username: str, password: str) -> Optional[dict]:
+        """
+        Read and decrypt the cached session of an account.
+
+        :param username: Email / username of the user bot
+        :param password: Password of the user bot
+        :return: Session dictionary, or None if there's no usable cached session
+        """
+        try:
+            with open(self.path(username), 'r') as f:
+                stored = json.load(f)
+            if stored.get('version') != SESSION_CACHE_VERSION:
+                return None
+            fernet = self._fernet(self._derive_key(password, base64.b64decode(stored['salt'])))
+            session = json.loads(fernet.decrypt(stored['data'].encode()))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, self._invalid_token) as e:
+            logger.warning("Ignoring unreadable session cache for %s: %r", username, e)
+            return None
+        if time.time() - session.get('created_at', 0) > self.max_age:
+            logger.info("Cached session is older than max_age. Logging in again...")
+            return None
+        return session
+
+    def save(self, username: str, password: str, session: dict) -> None:
+        """
+        Encrypt and write a session, readable only by the current user.
+
+        :param username: Email / username of the user bot
+        :param password: Password of the user bot
+        :param session: Session dictionary (auth_token, xsrf, cookies, user_data, created_at)
+        """
+        salt = os.urandom(16)
+        fernet = self._fernet(self._derive_key(password, salt))
+        stored = {
+            'version': SESSION_CACHE_VERSION,
+            'salt': base64.b64encode(salt).decode(),
+            'data': fernet.encrypt(json.dumps(session).encode()).decode(),
+        }
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        path = self.path(username)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(stored, f)
+        os.replace(tmp_path, path)
+
+    def clear(self, username: str) -> None:
+        try:
+            os.remove(self.path(username))
+        except FileNotFoundError:
+            pass
+
+    def needs_refresh(self, session: dict) -> bool:
+        """
+        :return: True if a cookie of the session expires within refresh_margin seconds
+        """
+        expiries = [cookie['expires'] for cookie in session.get('cookies', []) if cookie.get('expires')]
+        return bool(expiries) and min(expiries) - time.time() < self.refresh_margin
+
+    @staticmethod
+    def _derive_key(password: str, salt: bytes) -> bytes:
+        key = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, KEY_ITERATIONS)
+        return base64.urlsafe_b64encode(key)
+
+
+def cookies_to_list(cookies: RequestsCookieJar) -> list[dict]:
+    return [
+        {
+            'name': cookie.name,
+            'value': cookie.value,
+            'domain': cookie.domain,
+            'path': cookie.path,
+            'expires': cookie.expires,
+            'secure': cookie.secure,
+        }
+        for cookie in cookies
+    ]
+
+
+def cookies_from_list(cookies: list[dict]) -> RequestsCookieJar:
+    """
+    Rebuild a cookie jar, leaving out cookies that already expired.
+    """
+    jar = RequestsCookieJar()
+    now = time.time()
+    for cookie in cookies:
+        if cookie.get('expires') and cookie['expires'] <= now:
+            continue
+        jar.set_cookie(create_cookie(**cookie))
+    return jar
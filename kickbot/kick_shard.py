@@ -0,0 +1,402 @@
+import argparse
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+from datetime import datetime
+from typing import Any, Callable, Optional
+
+from .constants import KickBotException
+from .kick_bot import KickBot
+from .kick_client import KickClient
+from .kick_event import KickEvent, USER_BANNED, USER_UNBANNED
+from .kick_session import SessionCache
+
+logger = logging.getLogger(__name__)
+
+SHARD_BAN = 'ban'
+SHARD_UNBAN = 'unban'
+
+
+def load_callable(path: str) -> Callable:
+    """
+    Import a function from a 'package.module:function' path.
+
+    :param path: i.e: 'mybot.handlers:setup'
+    :return: The function
+    """
+    module_name, _, attribute = path.partition(':')
+    if not module_name or not attribute:
+        raise KickBotException(f"Invalid function path {path!r}. Must be 'module:function'.")
+    function = importlib.import_module(module_name)
+    for name in attribute.split('.'):
+        function = getattr(function, name)
+    if not callable(function):
+        raise KickBotException(f"{path!r} is not callable.")
+    return function
+
+
+def shard_streamers(streamers: list[str], shards: int) -> list[list[str]]:
+    """
+    Split the streamers over the shards, round robin.
+
+    :param streamers: Streamer usernames
+    :param shards: Amount of shards
+    :return: Streamers of each shard (empty shards are left out)
+    """
+    assignment = [streamers[i::shards] for i in range(shards)]
+    return [shard for shard in assignment if shard]
+
+
+class ShardLink:
+    """
+    The worker's end of the supervisor IPC channel, available as bot.shard in a sharded worker.
+
+    Bans and unbans in any worker's chatrooms (by the bot or by human moderators) are shared with every worker, so
+    handlers can check if a chatter was banned in another channel: bot.shard.banned_in(username).
+    Handlers can also publish their own messages to the other workers, and listen for them with add_listener.
+
+    :param shard_id: Index of this worker
+    :param shard_count: Amount of workers
+    :param inbox: Queue the supervisor sends messages of other workers to
+    :param outbox: Queue to the supervisor
+    """
+    def __init__(self, shard_id: int, shard_count: int, inbox, outbox) -> None:
+        self.shard_id: int = shard_id
+        self.shard_count: int = shard_count
+        self.bans: dict[str, dict[str, Optional[float]]] = {}
+        self._inbox = inbox
+        self._outbox = outbox
+        self._listeners: dict[str, list[Callable]] = {}
+        self._bot: Optional[KickBot] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def publish(self, kind: str, data: Any) -> None:
+        """
+        Send a message to every other worker. It's applied to this worker's state right away, but the listeners
+        of this worker aren't called.
+
+        :param kind: Message kind, i.e: 'ban', or one of your own
+        :param data: Picklable message data
+        """
+        self._apply(kind, data)
+        self._outbox.put((self.shard_id, kind, data))
+
+    def add_listener(self, kind: str, listener_function: Callable) -> None:
+        """
+        Add a function called for messages of kind published by other workers.
+
+        :param kind: Message kind, i.e: 'ban'
+        :param listener_function: Async function, i.e: async def on_ban(bot, data: dict)
+        """
+        self._listeners.setdefault(kind, []).append(listener_function)
+
+    def banned_in(self, username: str) -> list[str]:
+        """
+        Streamers (of any worker) in whose chat the user is currently banned or timed out.
+
+        :param username: Username of the chatter
+        """
+        now = time.time()
+        bans = self.bans.get(username.casefold(), {})
+        return [streamer for streamer, expires_at in bans.items() if expires_at is None or expires_at > now]
+
+    def attach(self, bot: KickBot) -> None:
+        """
+        Publish the ban / unban events of the bot's chatrooms.
+        """
+        self._bot = bot
+        bot.shard = self
+        bot.add_event_handler(USER_BANNED, self._on_ban_event)
+        bot.add_event_handler(USER_UNBANNED, self._on_ban_event)
+
+    def start(self) -> None:
+        """
+        Start receiving messages from the supervisor on the running event loop.
+        """
+        self._loop = asyncio.get_running_loop()
+        threading.Thread(target=self._read_inbox, name="kickbot-shard-inbox", daemon=True).start()
+
+    async def _on_ban_event(self, bot: KickBot, event: KickEvent) -> None:
+        user = event.data.get('user') or {}
+        username = user.get('username')
+        if not username:
+            return
+        data = {'streamer': event.streamer, 'username': username}
+        if event.event == USER_UNBANNED:
+            self.publish(SHARD_UNBAN, data)
+            return
+        data['expires_at'] = _ban_expires_at(event.data)
+        self.publish(SHARD_BAN, data)
+
+    def _read_inbox(self) -> None:
+        while True:
+            try:
+                message = self._inbox.get()
+            except (EOFError, OSError):
+                return
+            if message is None:
+                return
+            self._loop.call_soon_threadsafe(self._receive, *message)
+
+    def _receive(self, shard_id: int, kind: str, data: Any) -> None:
+        self._apply(kind, data)
+        for listener in self._listeners.get(kind, []):
+            self._loop.create_task(self._call_listener(listener, data))
+
+    async def _call_listener(self, listener: Callable, data: Any) -> None:
+        try:
+            await listener(self._bot, data)
+        except Exception:
+            logger.exception("Error in shard listener '%s'", listener.__name__)
+
+    def _apply(self, kind: str, data: Any) -> None:
+        if kind == SHARD_BAN:
+            self.bans.setdefault(data['username'].casefold(), {})[data['streamer']] = data.get('expires_at')
+        elif kind == SHARD_UNBAN:
+            bans = self.bans.get(data['username'].casefold())
+            if bans is not None:
+                bans.pop(data['streamer'], None)
+                if not bans:
+                    del self.bans[data['username'].casefold()]
+
+
+def _ban_expires_at(data: dict) -> Optional[float]:
+    """
+    Unix time a ban from a UserBannedEvent ends, None if it's permanent.
+    """
+    if data.get('permanent'):
+        return None
+    if data.get('duration'):
+        return time.time() + float(data['duration']) * 60
+    expires_at = data.get('expires_at')
+    if expires_at:
+        try:
+            return datetime.fromisoformat(expires_at.replace('Z', '+00:00')).timestamp()
+        except (AttributeError, ValueError):
+            pass
+    return None
+
+
+def _worker_client(username: str, session: dict) -> KickClient:
+    client = KickClient(username, '', login=False)
+    client.import_session(session)
+    return client
+
+
+def _run_worker(shard_id: int,
+                shard_count: int,
+                streamers: list[str],
+                setup: str,
+                username: str,
+                session: dict,
+                bot_options: dict,
+                inbox,
+                outbox) -> None:
+    """
+    Worker process: a KickBot for a share of the streamers, with the supervisor's login.
+    """
+    bot = KickBot(client=_worker_client(username, session), **bot_options)
+    for streamer in streamers:
+        bot.set_streamer(streamer)
+    link = ShardLink(shard_id, shard_count, inbox, outbox)
+    link.attach(bot)
+    load_callable(setup)(bot)
+    logger.info("Shard %s/%s started with %s streamers", shard_id + 1, shard_count, len(streamers))
+
+    async def run() -> None:
+        link.start()
+        await bot.async_poll()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+class _Shard:
+    def __init__(self, shard_id: int, streamers: list[str]) -> None:
+        self.shard_id: int = shard_id
+        self.streamers: list[str] = streamers
+        self.process: Optional[multiprocessing.Process] = None
+        self.inbox = None
+        self.started_at: float = 0.0
+        self.restarts: int = 0
+        self.restart_delay: float = 0.0
+        self.restart_at: Optional[float] = None
+
+
+class ShardSupervisor:
+    """
+    Runs the streamers on several worker processes (one KickBot each), so heavy handlers can use every core.
+
+    The supervisor logs in once, and hands the session to the workers. Each worker monitors a share of the
+    streamers on its own websocket, and calls the setup function ('module:function', imported in the worker)
+    to add its handlers: def setup(bot: KickBot) -> None. Handlers for a single streamer should only be added
+    when the streamer is in bot.channels.
+
+    Ban / unban events are relayed between the workers (see ShardLink, bot.shard), and workers that exit
+    are restarted, with a delay doubling up to max_restart_delay while they keep crashing.
+
+    :param username: Email / username of the user bot
+    :param password: Password of the user bot
+    :param streamers: Streamers to monitor
+    :param setup: Path of the function adding the handlers, i.e: 'mybot.handlers:setup'
+    :param shards: Amount of worker processes. Defaults to the amount of cpu cores.
+    :param session_cache: Session cache for the supervisor's login
+    :param bot_options: Other KickBot arguments for the workers (must be picklable), i.e: {'max_workers': 32}
+    :param min_restart_delay: Seconds before restarting a crashed worker
+    :param max_restart_delay: Maximum seconds before restarting a worker that keeps crashing
+    """
+    def __init__(self,
+                 username: str,
+                 password: str,
+                 streamers: list[str],
+                 setup: str,
+                 shards: Optional[int] = None,
+                 session_cache: Optional[SessionCache] = None,
+                 bot_options: Optional[dict] = None,
+                 min_restart_delay: float = 1.0,
+                 max_restart_delay: float = 60.0) -> None:
+        if not streamers:
+            raise KickBotException("At least one streamer is required.")
+        load_callable(setup)  # fail now, instead of in every worker
+        self.username: str = username
+        self.password: str = password
+        self.setup: str = setup
+        self.session_cache: Optional[SessionCache] = session_cache
+        self.bot_options: dict = bot_options or {}
+        self.min_restart_delay: float = min_restart_delay
+        self.max_restart_delay: float = max_restart_delay
+        self.shards: list[_Shard] = [_Shard(i, shard) for i, shard in
+                                     enumerate(shard_streamers(list(streamers), shards or os.cpu_count() or 1))]
+        self._context = multiprocessing.get_context('spawn')
+        self._outbox = None
+        self._session: Optional[dict] = None
+        self._bans: dict[tuple[str, str], tuple] = {}
+        self._stopping = threading.Event()
+
+    def run(self) -> None:
+        """
+        Log in, start the workers, and supervise them until stop() is called or the process is interrupted.
+        """
+        self._session = self._login()
+        self._outbox = self._context.Queue()
+        for shard in self.shards:
+            self._start(shard)
+        try:
+            while not self._stopping.is_set():
+                self._relay(timeout=0.2)
+                self._check_workers()
+        except KeyboardInterrupt:
+            logger.info("Stopping shards...")
+        finally:
+            self._stop_workers()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    def stats(self) -> list[dict]:
+        """
+        :return: Streamers, process id, liveness and restarts of each worker
+        """
+        return [{
+            'shard': shard.shard_id,
+            'streamers': shard.streamers,
+            'pid': shard.process.pid if shard.process is not None else None,
+            'alive': shard.process is not None and shard.process.is_alive(),
+            'restarts': shard.restarts,
+        } for shard in self.shards]
+
+    def _login(self) -> dict:
+        client = KickClient(self.username, self.password, session_cache=self.session_cache)
+        return client.export_session()
+
+    def _start(self, shard: _Shard) -> None:
+        shard.inbox = self._context.Queue()
+        now = time.time()
+        for message in list(self._bans.values()):
+            expires_at = message[2].get('expires_at')
+            if expires_at is None or expires_at > now:
+                shard.inbox.put(message)
+        shard.process = self._context.Process(
+            target=_run_worker,
+            args=(shard.shard_id, len(self.shards), shard.streamers, self.setup, self.username, self._session,
+                  self.bot_options, shard.inbox, self._outbox),
+            name=f"kickbot-shard-{shard.shard_id}",
+            daemon=True,
+        )
+        shard.process.start()
+        shard.started_at = time.monotonic()
+        shard.restart_at = None
+
+    def _relay(self, timeout: float) -> None:
+        """
+        Forward messages from one worker to every other worker, and keep the current bans for restarted workers.
+        """
+        try:
+            message = self._outbox.get(timeout=timeout)
+        except queue.Empty:
+            return
+        shard_id, kind, data = message
+        if kind == SHARD_BAN:
+            self._bans[(data['streamer'], data['username'].casefold())] = message
+        elif kind == SHARD_UNBAN:
+            self._bans.pop((data['streamer'], data['username'].casefold()), None)
+        for shard in self.shards:
+            if shard.shard_id != shard_id and shard.inbox is not None:
+                shard.inbox.put(message)
+
+    def _check_workers(self) -> None:
+        now = time.monotonic()
+        for shard in self.shards:
+            if shard.restart_at is not None:
+                if now >= shard.restart_at:
+                    shard.restarts += 1
+                    self._start(shard)
+                continue
+            if shard.process.is_alive():
+                continue
+            if now - shard.started_at > self.max_restart_delay:
+                shard.restart_delay = self.min_restart_delay
+            else:
+                shard.restart_delay = min(self.max_restart_delay, max(self.min_restart_delay, shard.restart_delay * 2))
+            logger.warning("Shard %s exited with code %s. Restarting in %.1f seconds",
+                           shard.shard_id, shard.process.exitcode, shard.restart_delay)
+            shard.inbox.close()
+            shard.inbox.cancel_join_thread()
+            shard.inbox = None
+            shard.restart_at = now + shard.restart_delay
+
+    def _stop_workers(self) -> None:
+        for shard in self.shards:
+            if shard.process is not None and shard.process.is_alive():
+                shard.process.terminate()
+        for shard in self.shards:
+            if shard.process is not None:
+                shard.process.join(timeout=5)
+            if shard.inbox is not None:
+                shard.inbox.cancel_join_thread()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Run a bot sharded over several processes. "
+                    "Credentials are read from the KICK_USERNAME and KICK_PASSWORD environment variables.")
+    parser.add_argument('--streamers', nargs='+', required=True, help="Streamers to monitor")
+    parser.add_argument('--setup', required=True, help="Function adding the handlers, i.e: mybot.handlers:setup")
+    parser.add_argument('--shards', type=int, default=None, help="Worker processes (default: cpu cores)")
+    args = parser.parse_args()
+    username, password = os.environ.get('KICK_USERNAME'), os.environ.get('KICK_PASSWORD')
+    if not username or not password:
+        parser.error("KICK_USERNAME and KICK_PASSWORD must be set.")
+    ShardSupervisor(username, password, args.streamers, args.setup, shards=args.shards).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import time
+
+from typing import Callable, NamedTuple, Optional
+
+from .constants import KickBotException
+from .kick_event import STREAMER_IS_LIVE, STOP_STREAM_BROADCAST, LIVESTREAM_UPDATED
+from .kick_helper import get_livestream
+
+logger = logging.getLogger(__name__)
+
+STREAM_LIVE = 'live'
+STREAM_OFFLINE = 'offline'
+VIEWER_THRESHOLD = 'viewer_threshold'
+
+# Pusher events (channel.{id}) that make the tracker update right away, instead of on the next poll
+STREAM_EVENTS = frozenset((STREAMER_IS_LIVE, STOP_STREAM_BROADCAST, LIVESTREAM_UPDATED))
+
+# Seconds after a live / offline event during which polls can't undo it (the api lags behind the events)
+EVENT_GRACE = 60.0
+
+
+class StreamState(NamedTuple):
+    is_live: bool
+    viewers: int = 0
+    title: Optional[str] = None
+    category: Optional[str] = None
+    started_at: Optional[str] = None
+    livestream_id: Optional[int] = None
+    checked_at: float = 0.0
+
+
+class StreamHandler(NamedTuple):
+    kind: str
+    function: Callable
+    threshold: int = 0
+
+
+class StreamTracker:
+    """
+    Polls the livestream of a channel in the background, and keeps the latest StreamState in self.state,
+    so reading the live status / viewers / title doesn't make a request.
+
+    Live streams are polled every live_interval seconds, offline streams every offline_interval seconds, and failed
+    polls back off up to max_interval. StreamerIsLive / StopStreamBroadcast / LivestreamUpdated pusher events update
+    the state as soon as they're received, and the stream is polled again event_delay seconds later.
+
+    Live / offline / viewer threshold handlers are called when the state changes. The first state polled is the
+    starting point, so a stream already live when the bot starts doesn't call the live handlers.
+    """
+    def __init__(self,
+                 channel,
+                 live_interval: float = 30.0,
+                 offline_interval: float = 120.0,
+                 max_interval: float = 600.0,
+                 event_delay: float = 5.0) -> None:
+        if live_interval <= 0 or offline_interval <= 0:
+            raise KickBotException("Stream poll intervals must be greater than 0.")
+        self.channel = channel
+        self.live_interval: float = live_interval
+        self.offline_interval: float = offline_interval
+        self.max_interval: float = max(max_interval, live_interval, offline_interval)
+        self.event_delay: float = event_delay
+        self.state: Optional[StreamState] = None
+        self.handlers: list[StreamHandler] = []
+        self.polls: int = 0
+        self.errors: int = 0
+        self._poll_at: float = 0.0
+        self._event_at: float = float('-inf')
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._handler_tasks: set[asyncio.Task] = set()
+
+    @property
+    def interval(self) -> float:
+        """
+        Seconds until the next poll: shorter while live, doubled for each failed poll in a row.
+        """
+        interval = self.live_interval if self.state is not None and self.state.is_live else self.offline_interval
+        if self.errors:
+            return min(self.max_interval, interval * 2 ** self.errors)
+        return interval
+
+    def start(self) -> asyncio.Task:
+        """
+        Start polling on the running event loop. Started by KickBot._poll
+        """
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return self._task
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def poll(self) -> StreamState:
+        """
+        Request the livestream now, and update the state.
+
+        :return: The new state
+        """
+        livestream = await self.channel.client.run_async(get_livestream, self.channel)
+        self.polls += 1
+        self.errors = 0
+        state = _state_from_livestream(livestream, self.state)
+        if (self.state is not None and state.is_live != self.state.is_live
+                and time.monotonic() - self._event_at < EVENT_GRACE):
+            logger.debug("Ignoring stale poll of %s: %r", self.channel.streamer_name, state)
+            return self.state
+        self.update(state)
+        return self.state
+
+    def handle_event(self, event: str, data: dict) -> None:
+        """
+        Update the state from a StreamerIsLive / StopStreamBroadcast / LivestreamUpdated event, and poll again
+        event_delay seconds later for the viewer count.
+        """
+        livestream = data.get('livestream') if isinstance(data.get('livestream'), dict) else {}
+        if event == STREAMER_IS_LIVE:
+            livestream = {**livestream, 'is_live': True}
+        if event != LIVESTREAM_UPDATED:
+            self._event_at = time.monotonic()
+        if event == STOP_STREAM_BROADCAST:
+            self.update(StreamState(False, checked_at=time.time()))
+        elif event == STREAMER_IS_LIVE or (self.state is not None and self.state.is_live):
+            self.update(_state_from_livestream(livestream, self.state))
+        if self._wakeup is not None:
+            self._poll_at = min(self._poll_at, asyncio.get_running_loop().time() + self.event_delay)
+            self._wakeup.set()
+
+    def update(self, state: StreamState) -> None:
+        """
+        Set the state, and call the handlers of what changed.
+        """
+        previous, self.state = self.state, state
+        if previous is None:
+            return
+        if state.is_live != previous.is_live:
+            logger.info("%s is %s", self.channel.streamer_name, 'live' if state.is_live else 'offline')
+            kind = STREAM_LIVE if state.is_live else STREAM_OFFLINE
+            for handler in self._handlers(kind):
+                self._call(handler, kind)
+        if state.viewers > previous.viewers:
+            for handler in self._handlers(VIEWER_THRESHOLD):
+                if previous.viewers < handler.threshold <= state.viewers:
+                    self._call(handler, f"viewers>={handler.threshold}")
+
+    def _handlers(self, kind: str) -> list[StreamHandler]:
+        return [handler for handler in self.handlers + self.channel.bot.stream_handlers if handler.kind == kind]
+
+    def _call(self, handler: StreamHandler, trigger: str) -> None:
+        task = asyncio.get_running_loop().create_task(
+            self.channel.bot._handle_stream_change(self.channel, handler.function, self.state, trigger))
+        self._handler_tasks.add(task)
+        task.add_done_callback(self._handler_tasks.discard)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await self.poll()
+            except Exception as e:
+                self.errors += 1
+                logger.warning("Failed to poll the stream of %s, retrying in %.0f seconds: %s",
+                               self.channel.streamer_name, self.interval, e)
+            self._poll_at = loop.time() + self.interval
+            while (delay := self._poll_at - loop.time()) > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+
+    def __repr__(self) -> str:
+        return f"StreamTracker({self.channel.streamer_name!r}, state={self.state})"
+
+
+def _state_from_livestream(livestream: Optional[dict], previous: Optional[StreamState]) -> StreamState:
+    """
+    Build a state from a livestream dictionary (the livestream endpoint, or the livestream of a pusher event).
+    Values missing from it are kept from the previous state.
+    """
+    if not livestream:
+        return StreamState(False, checked_at=time.time())
+    if previous is None or not previous.is_live:
+        previous = StreamState(True)
+    viewers = livestream.get('viewers', livestream.get('viewer_count'))
+    category = livestream.get('category')
+    if category is None and livestream.get('categories'):
+        category = livestream['categories'][0]
+    return StreamState(
+        is_live=livestream.get('is_live', True) is not False,
+        viewers=int(viewers) if viewers is not None else previous.viewers,
+        title=livestream.get('session_title', previous.title),
+        category=category.get('name') if isinstance(category, dict) else previous.category,
+        started_at=livestream.get('created_at', livestream.get('start_time', previous.started_at)),
+        livestream_id=livestream.get('id', previous.livestream_id),
+        checked_at=time.time(),
+    )
@@ -17,4 +17,10 @@ setup(
     url="https://github.com/lukemvc/kickbot",
     packages=find_packages(),
     install_requires=requirements,
+    extras_require={
+        "fast": ["orjson>=3.8"],
+        "session": ["cryptography>=41.0"],
+        "browser": ["selenium==4.12.0", "undetected-chromedriver==3.5.3"],
+        "otel": ["opentelemetry-api>=1.20"],
+    },
 )
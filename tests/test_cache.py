@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+
+from kickbot.kick_cache import Cache, CacheBackend, MemoryCache
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_incomplete_backend_fails_on_creation():
+    class GetOnly(CacheBackend):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        GetOnly()
+
+
+def test_entries_expire_after_ttl():
+    clock = Clock()
+    cache = MemoryCache(clock=clock)
+    cache.set('key', 'value', ttl=10)
+    clock.now += 9.9
+    assert cache.get('key') == 'value'
+    clock.now += 0.1
+    assert cache.get('key') is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = MemoryCache(max_size=2)
+    cache.set('a', 1, ttl=60)
+    cache.set('b', 2, ttl=60)
+    cache.get('a')
+    cache.set('c', 3, ttl=60)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+
+def test_hits_misses_and_failed_lookups():
+    cache = Cache(MemoryCache())
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return {'id': 1} if len(loads) > 1 else None
+
+    assert cache.get_or_load('key', loader, ttl=60) is None
+    assert cache.get_or_load('key', loader, ttl=60) == {'id': 1}
+    assert cache.get_or_load('key', loader, ttl=60) == {'id': 1}
+    assert len(loads) == 2
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert cache.stats() == {'hits': 1, 'misses': 2, 'coalesced': 0, 'hit_rate': 0.3333, 'size': 1}
+
+
+def test_disabled_cache_always_loads():
+    cache = Cache(enabled=False)
+    assert cache.get_or_load('key', lambda: 1, ttl=60) == 1
+    assert cache.get_or_load('key', lambda: 2, ttl=60) == 2
+
+
+def test_concurrent_lookups_send_one_request():
+    async def main():
+        cache = Cache()
+        requests = []
+
+        async def loader():
+            requests.append(1)
+            await asyncio.sleep(0.05)
+            return {'viewers': 5}
+
+        results = await asyncio.gather(*(cache.async_get_or_load('key', loader, ttl=60) for _ in range(200)))
+        return cache, requests, results
+
+    cache, requests, results = asyncio.run(main())
+    assert len(requests) == 1
+    assert all(result == {'viewers': 5} for result in results)
+    assert (cache.misses, cache.coalesced) == (1, 199)
+
+
+def test_cancelled_caller_doesnt_cancel_other_callers():
+    async def main():
+        cache = Cache()
+        requests = []
+
+        async def loader():
+            requests.append(1)
+            await asyncio.sleep(0.05)
+            return 'value'
+
+        first = asyncio.ensure_future(cache.async_get_or_load('key', loader, ttl=60))
+        await asyncio.sleep(0)
+        others = [asyncio.ensure_future(cache.async_get_or_load('key', loader, ttl=60)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        first.cancel()
+        results = await asyncio.gather(*others)
+        return first, results, requests, cache
+
+    first, results, requests, cache = asyncio.run(main())
+    assert first.cancelled()
+    assert results == ['value'] * 3
+    assert len(requests) == 1
+    assert cache.backend.get('key') == 'value'
+
+
+def test_failed_lookup_raises_for_every_caller():
+    async def main():
+        cache = Cache()
+
+        async def loader():
+            await asyncio.sleep(0.01)
+            raise ValueError('upstream error')
+
+        results = await asyncio.gather(*(cache.async_get_or_load('key', loader, ttl=60) for _ in range(3)),
+                                       return_exceptions=True)
+        return results, cache
+
+    results, cache = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert not cache._in_flight
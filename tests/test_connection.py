@@ -0,0 +1,267 @@
+import asyncio
+import json
+
+import pytest
+
+from kickbot import kick_connection
+from kickbot.constants import KickBotException
+from kickbot.kick_connection import PusherConnection, RedundantConnection, _frame_key
+
+CHANNEL = 'chatrooms.1.v2'
+
+
+def established(activity_timeout: float = 120) -> str:
+    return json.dumps({'event': 'pusher:connection_established',
+                       'data': json.dumps({'socket_id': '1.1', 'activity_timeout': activity_timeout})})
+
+
+class FakeSocket:
+    """
+    Websocket returning the given frames, then waiting for more. An OSError in the frames drops the connection.
+    Subscribes are answered like pusher does, the first fail_subscribe of them with a subscription error.
+    """
+    def __init__(self, frames: list, fail_subscribe: int = 0) -> None:
+        self.frames: asyncio.Queue = asyncio.Queue()
+        for frame in frames:
+            self.frames.put_nowait(frame)
+        self.fail_subscribe: int = fail_subscribe
+        self.sent: list[dict] = []
+        self.closed = False
+
+    async def __aenter__(self) -> 'FakeSocket':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.closed = True
+
+    async def recv(self) -> str:
+        frame = await self.frames.get()
+        if isinstance(frame, Exception):
+            raise frame
+        return frame
+
+    async def send(self, raw: str) -> None:
+        command = json.loads(raw)
+        self.sent.append(command)
+        if command['event'] == 'pusher:subscribe':
+            channel = command['data']['channel']
+            if self.fail_subscribe:
+                self.fail_subscribe -= 1
+                reply = {'event': 'pusher:subscription_error', 'channel': channel, 'data': {'status': 500}}
+            else:
+                reply = {'event': 'pusher_internal:subscription_succeeded', 'channel': channel, 'data': '{}'}
+            self.frames.put_nowait(json.dumps(reply))
+
+    async def close(self) -> None:
+        self.closed = True
+        self.frames.put_nowait(OSError('closed'))
+
+    def sent_events(self) -> list[str]:
+        return [command['event'] for command in self.sent]
+
+
+class FakeServer:
+    """
+    Replaces websockets.connect, handing out the given sockets (or raising the given exceptions) in order.
+    """
+    def __init__(self, monkeypatch, *sockets) -> None:
+        self.sockets = list(sockets)
+        self.connects = 0
+        monkeypatch.setattr(kick_connection.websockets, 'connect', self.connect)
+
+    def connect(self, uri: str):
+        self.connects += 1
+        sock = self.sockets.pop(0)
+        if isinstance(sock, Exception):
+            raise sock
+        return sock
+
+
+def make_connection(frames: list = None, **options) -> PusherConnection:
+    frames = frames if frames is not None else []
+
+    async def on_frame(frame: dict) -> None:
+        frames.append(frame)
+    return PusherConnection('ws://test', lambda: [CHANNEL], on_frame, **options)
+
+
+async def run_until(connection: PusherConnection, condition, timeout: float = 2.0) -> bool:
+    """
+    Run the connection until condition() is true, then close it.
+
+    :return: Whether the condition was met
+    """
+    task = asyncio.ensure_future(connection.run())
+    try:
+        for _ in range(int(timeout / 0.01)):
+            if condition() or task.done():
+                break
+            await asyncio.sleep(0.01)
+        return bool(condition())
+    finally:
+        await connection.close()
+        await asyncio.wait_for(task, 1)
+
+
+def test_reconnects_and_resubscribes(monkeypatch):
+    first = FakeSocket([established(), OSError('dropped')])
+    second = FakeSocket([established()])
+    FakeServer(monkeypatch, first, second)
+    connection = make_connection(min_backoff=0.01)
+
+    asyncio.run(run_until(connection, lambda: CHANNEL in connection.subscribed and connection.reconnects))
+    assert connection.connects == 2
+    assert connection.reconnects == 1
+    assert first.sent_events() == ['pusher:subscribe']
+    assert second.sent_events() == ['pusher:subscribe']
+
+
+def test_reconnect_backoff_doubles_up_to_max(monkeypatch):
+    delays = []
+    monkeypatch.setattr(kick_connection.random, 'uniform', lambda low, high: delays.append((low, high)) or 0)
+    server = FakeServer(monkeypatch, *[OSError('refused')] * 5, FakeSocket([established()]))
+    connection = make_connection(min_backoff=1, max_backoff=4)
+
+    asyncio.run(run_until(connection, lambda: connection.is_connected))
+    assert server.connects == 6
+    assert delays == [(0.5, 1), (1, 2), (2, 4), (2, 4), (2, 4)]
+
+
+def test_ping_answered_by_pong_keeps_connection(monkeypatch):
+    sock = FakeSocket([established(activity_timeout=0.05)])
+    FakeServer(monkeypatch, sock)
+    connection = make_connection(pong_timeout=0.5)
+
+    async def main():
+        task = asyncio.ensure_future(connection.run())
+        await asyncio.sleep(0.1)
+        sock.frames.put_nowait(json.dumps({'event': 'pusher:pong', 'data': {}}))
+        await asyncio.sleep(0.02)
+        connected = connection.is_connected
+        await connection.close()
+        await asyncio.wait_for(task, 1)
+        return connected
+
+    assert asyncio.run(main())
+    assert 'pusher:ping' in sock.sent_events()
+    assert connection.reconnects == 0
+
+
+def test_no_pong_reconnects(monkeypatch):
+    first = FakeSocket([established(activity_timeout=0.05)])
+    second = FakeSocket([established()])
+    FakeServer(monkeypatch, first, second)
+    connection = make_connection(pong_timeout=0.05, min_backoff=0.01)
+
+    asyncio.run(run_until(connection, lambda: connection.reconnects))
+    assert 'pusher:ping' in first.sent_events()
+    assert connection.reconnects == 1
+
+
+def test_server_ping_is_answered(monkeypatch):
+    sock = FakeSocket([established(), json.dumps({'event': 'pusher:ping', 'data': {}})])
+    FakeServer(monkeypatch, sock)
+    connection = make_connection()
+
+    asyncio.run(run_until(connection, lambda: 'pusher:pong' in sock.sent_events()))
+    assert 'pusher:pong' in sock.sent_events()
+
+
+def test_error_code_4000_stops(monkeypatch):
+    error = json.dumps({'event': 'pusher:error', 'data': {'code': 4001, 'message': 'App disabled'}})
+    FakeServer(monkeypatch, FakeSocket([established(), error]))
+    connection = make_connection()
+
+    with pytest.raises(KickBotException):
+        asyncio.run(asyncio.wait_for(connection.run(), 2))
+
+
+def test_error_code_4100_reconnects(monkeypatch):
+    error = json.dumps({'event': 'pusher:error', 'data': json.dumps({'code': 4200, 'message': 'Reconnect'})})
+    FakeServer(monkeypatch, FakeSocket([established(), error]), FakeSocket([established()]))
+    connection = make_connection(min_backoff=0.01)
+
+    asyncio.run(run_until(connection, lambda: connection.reconnects))
+    assert connection.reconnects == 1
+
+
+def test_other_and_unreadable_errors_are_ignored(monkeypatch):
+    frames = []
+    sock = FakeSocket([
+        established(),
+        json.dumps({'event': 'pusher:error', 'data': {'code': None, 'message': 'Unknown'}}),
+        json.dumps({'event': 'pusher:error', 'data': '{not json'}),
+        json.dumps({'event': 'pusher:error', 'data': '[1, 2]'}),
+        '{truncated',
+        json.dumps({'event': 'App\\Events\\ChatMessageEvent', 'channel': CHANNEL, 'data': '{}'}),
+    ])
+    FakeServer(monkeypatch, sock)
+    connection = make_connection(frames)
+
+    asyncio.run(run_until(connection, lambda: frames))
+    assert [frame['event'] for frame in frames] == ['App\\Events\\ChatMessageEvent']
+    assert connection.reconnects == 0
+
+
+def test_subscription_error_retries_channel(monkeypatch):
+    sock = FakeSocket([established()], fail_subscribe=2)
+    FakeServer(monkeypatch, sock)
+    connection = make_connection(min_backoff=0.01)
+
+    assert asyncio.run(run_until(connection, lambda: CHANNEL in connection.subscribed))
+    assert sock.sent_events() == ['pusher:subscribe'] * 3
+    assert connection.reconnects == 0
+
+
+def chat_frame(message_id: str, channel: str = CHANNEL, content: str = 'hi') -> dict:
+    data = json.dumps({'id': message_id, 'content': content}, separators=(',', ':'))
+    return {'event': 'App\\Events\\ChatMessageEvent', 'channel': channel, 'data': data}
+
+
+def test_frame_key_includes_channel():
+    assert _frame_key(chat_frame('abc')) == (CHANNEL, 'abc')
+    assert _frame_key(chat_frame('abc')) != _frame_key(chat_frame('abc', channel='chatrooms.2.v2'))
+    other = {'event': 'App\\Events\\FollowersUpdated', 'channel': 'channel.1', 'data': {'followers': 5}}
+    assert _frame_key(other) != _frame_key(dict(other, channel='channel.2'))
+
+
+def test_redundant_connection_delivers_each_frame_once():
+    frames = []
+
+    async def on_frame(frame: dict) -> None:
+        frames.append(frame)
+
+    async def main():
+        connection = RedundantConnection('ws://test', lambda: [CHANNEL], on_frame, copies=3)
+        first, second = chat_frame('one'), chat_frame('two')
+        other_channel = chat_frame('one', channel='chatrooms.2.v2')
+        for index, frame in [(0, first), (1, first), (2, other_channel), (0, other_channel),
+                             (1, second), (2, first), (0, second), (2, second)]:
+            await connection._on_frame(index, frame)
+        return connection
+
+    connection = asyncio.run(main())
+    assert [(frame['channel'], json.loads(frame['data'])['id']) for frame in frames] == [
+        (CHANNEL, 'one'), ('chatrooms.2.v2', 'one'), (CHANNEL, 'two')]
+    assert connection.firsts == [1, 1, 1]
+    assert connection.duplicates == 5
+
+
+def test_redundant_connection_delivers_repeated_frames():
+    # The same event sent twice (i.e: a repeated follower count) is delivered twice,
+    # once each connection has seen it more often than it was delivered
+    frames = []
+
+    async def on_frame(frame: dict) -> None:
+        frames.append(frame)
+
+    async def main():
+        connection = RedundantConnection('ws://test', lambda: [CHANNEL], on_frame)
+        update = {'event': 'App\\Events\\FollowersUpdated', 'channel': 'channel.1', 'data': '{"followers":5}'}
+        for index in (0, 0, 1, 1, 1):
+            await connection._on_frame(index, dict(update))
+        return connection
+
+    connection = asyncio.run(main())
+    assert len(frames) == 3
+    assert connection.duplicates == 2
@@ -0,0 +1,90 @@
+import pytest
+
+from kickbot.constants import KickBotException
+from kickbot.kick_cooldown import Cooldown, ExpiringDict, COOLDOWN_READY, COOLDOWN_NOTIFY, COOLDOWN_SILENT
+
+
+def test_expiring_dict_expires_entries():
+    entries = ExpiringDict(ttl=10)
+    entries.set('a', 1, now=0)
+    entries.set('b', 2, now=5)
+    assert entries.get('a', now=9.9) == 1
+    assert entries.get('a', 'missing', now=10) == 'missing'
+    entries.expire(now=15)
+    assert len(entries) == 0
+
+
+def test_expiring_dict_set_again_extends_ttl():
+    entries = ExpiringDict(ttl=10)
+    entries.set('a', 1, now=0)
+    entries.set('a', 2, now=8)
+    assert entries.get('a', now=15) == 2
+
+
+def test_expiring_dict_is_bounded():
+    entries = ExpiringDict(ttl=60, max_size=3)
+    for i in range(1000):
+        entries.set(i, i, now=i / 1000)
+    assert len(entries) == 3
+    assert [entries.get(i, now=1) for i in (996, 997, 998, 999)] == [None, 997, 998, 999]
+
+
+def test_global_cooldown():
+    cooldown = Cooldown(seconds=30)
+    assert cooldown.hit('a', now=0) == COOLDOWN_READY
+    assert cooldown.hit('b', now=10) == COOLDOWN_SILENT
+    assert cooldown.hit('b', now=30) == COOLDOWN_READY
+
+
+def test_per_user_cooldown():
+    cooldown = Cooldown(per_user=60)
+    assert cooldown.hit('a', now=0) == COOLDOWN_READY
+    assert cooldown.hit('b', now=1) == COOLDOWN_READY
+    assert cooldown.hit('a', now=59) == COOLDOWN_SILENT
+    assert cooldown.hit('a', now=60) == COOLDOWN_READY
+
+
+def test_rate_limit_allows_burst_then_paces():
+    # 3 per 60 seconds: one every 20 seconds, with a burst of 3
+    cooldown = Cooldown(rate=3, per=60)
+    assert [cooldown.hit('a', now=t) for t in (0, 1, 2, 3)] == [COOLDOWN_READY] * 3 + [COOLDOWN_SILENT]
+    assert cooldown.hit('b', now=3) == COOLDOWN_READY
+    assert cooldown.hit('a', now=19.9) == COOLDOWN_SILENT
+    assert cooldown.hit('a', now=20) == COOLDOWN_READY
+    assert cooldown.hit('a', now=21) == COOLDOWN_SILENT
+    # A user idle for the whole window gets the full burst back
+    assert [cooldown.hit('a', now=200 + t) for t in range(4)] == [COOLDOWN_READY] * 3 + [COOLDOWN_SILENT]
+
+
+def test_notifies_once_then_stays_silent():
+    cooldown = Cooldown(seconds=30, message="On cooldown")
+    assert cooldown.hit('a', now=0) == COOLDOWN_READY
+    assert cooldown.hit('b', now=1) == COOLDOWN_NOTIFY
+    assert cooldown.hit('b', now=2) == COOLDOWN_SILENT
+    assert cooldown.hit('c', now=2) == COOLDOWN_NOTIFY
+    assert cooldown.hit('b', now=30) == COOLDOWN_READY
+    assert cooldown.hit('c', now=31) == COOLDOWN_NOTIFY
+
+
+def test_no_message_never_notifies():
+    cooldown = Cooldown(seconds=30)
+    assert cooldown.hit('a', now=0) == COOLDOWN_READY
+    assert cooldown.hit('a', now=1) == COOLDOWN_SILENT
+
+
+def test_tracked_users_are_bounded():
+    cooldown = Cooldown(per_user=60, max_users=100)
+    for user in range(10_000):
+        cooldown.hit(user, now=0)
+    assert len(cooldown._user_ready_at) == 100
+
+
+@pytest.mark.parametrize('options', [
+    {'seconds': -1},
+    {'rate': 3},
+    {'rate': 0, 'per': 10},
+    {'rate': 1, 'per': 0},
+])
+def test_invalid_cooldowns(options):
+    with pytest.raises(KickBotException):
+        Cooldown(**options)
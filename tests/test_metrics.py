@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+
+from kickbot.kick_client import KickClient
+from kickbot.kick_metrics import (
+    PrometheusMetrics,
+    Sample,
+    GAUGE,
+    FRAMES_RECEIVED,
+    HTTP_REQUEST_SECONDS,
+    HTTP_RESPONSES,
+)
+
+
+def test_render_mixed_and_none_labels():
+    metrics = PrometheusMetrics(buckets=(0.1, 1.0))
+    metrics.inc(FRAMES_RECEIVED, labels={'event': 'a'})
+    metrics.inc(FRAMES_RECEIVED, labels={'event': None})
+    metrics.inc(FRAMES_RECEIVED, labels={'event': 3})
+    metrics.inc(FRAMES_RECEIVED)
+    metrics.observe(HTTP_REQUEST_SECONDS, 0.5, labels={'endpoint': None})
+    metrics.observe(HTTP_REQUEST_SECONDS, 0.05, labels={'endpoint': '/api'})
+    metrics.add_collector(lambda: [Sample('kickbot_test_gauge', GAUGE, 2, {'bot': None})])
+
+    lines = metrics.render().splitlines()
+    assert lines[:5] == [
+        f'# TYPE {FRAMES_RECEIVED} counter',
+        f'{FRAMES_RECEIVED} 1',
+        f'{FRAMES_RECEIVED}{{event=""}} 1',
+        f'{FRAMES_RECEIVED}{{event="3"}} 1',
+        f'{FRAMES_RECEIVED}{{event="a"}} 1',
+    ]
+    assert f'{HTTP_REQUEST_SECONDS}_bucket{{endpoint="",le="1"}} 1' in lines
+    assert f'{HTTP_REQUEST_SECONDS}_count{{endpoint="/api"}} 1' in lines
+    assert 'kickbot_test_gauge{bot=""} 2' in lines
+
+
+def test_blocking_requests_are_recorded():
+    metrics = PrometheusMetrics()
+    client = KickClient('bot', '', login=False, metrics=metrics)
+    client.scraper = SimpleNamespace(get=lambda url, **kwargs: SimpleNamespace(status_code=200))
+    client.get('https://kick.com/api/v2/channels/123/me')
+
+    rendered = metrics.render()
+    assert f'{HTTP_RESPONSES}{{method="GET",endpoint="/api/v2/channels/{{id}}/me",status="200"}} 1' in rendered
+    assert f'{HTTP_REQUEST_SECONDS}_count{{method="GET",endpoint="/api/v2/channels/{{id}}/me"}} 1' in rendered
@@ -0,0 +1,74 @@
+import asyncio
+
+from types import SimpleNamespace
+
+from kickbot.kick_moderator import Moderator
+from kickbot.kick_outbound import PRIORITY_MODERATOR
+
+
+class FakeOutbound:
+    """
+    Outbound queue answering ban requests with the given status codes (or exceptions) per username,
+    recording the bans and how many were in flight at once.
+    """
+    def __init__(self, responses: dict = None) -> None:
+        self.responses: dict = responses or {}
+        self.bans: list[tuple[str, dict]] = []
+        self.in_flight: int = 0
+        self.max_in_flight: int = 0
+
+    async def submit(self, send, priority: int):
+        assert priority == PRIORITY_MODERATOR
+        _, username = send.args
+        self.bans.append((username, send.keywords))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            self.in_flight -= 1
+        result = self.responses.get(username, 200)
+        if isinstance(result, Exception):
+            raise result
+        return SimpleNamespace(status_code=result)
+
+
+def make_moderator(outbound: FakeOutbound) -> Moderator:
+    return Moderator(SimpleNamespace(outbound=outbound))
+
+
+def test_usernames_deduplicated_case_insensitive():
+    outbound = FakeOutbound()
+    report = asyncio.run(make_moderator(outbound).bulk_ban(['Spammer', '@spammer', ' SPAMMER ', 'other', '@', '']))
+    assert [username for username, _ in outbound.bans] == ['Spammer', 'other']
+    assert report.duplicates == ['spammer', 'SPAMMER']
+    assert report.succeeded == ['Spammer', 'other']
+    assert len(report) == 2
+
+
+def test_at_sign_is_stripped():
+    outbound = FakeOutbound()
+    report = asyncio.run(make_moderator(outbound).bulk_timeout([' @raider1', '@Raider2'], minutes=10))
+    assert outbound.bans == [('raider1', {'minutes': 10}), ('Raider2', {'minutes': 10})]
+    assert report.action == 'timeout 10m'
+    assert report.succeeded == ['raider1', 'Raider2']
+
+
+def test_concurrency_is_bounded():
+    outbound = FakeOutbound()
+    report = asyncio.run(make_moderator(outbound).bulk_ban([f'raider{i}' for i in range(50)], concurrency=5))
+    assert outbound.max_in_flight == 5
+    assert len(report.succeeded) == 50
+    assert all(keywords == {'is_permanent': True} for _, keywords in outbound.bans)
+
+
+def test_failures_are_reported_in_order():
+    outbound = FakeOutbound({'b': 403, 'c': OSError('connection reset')})
+    report = asyncio.run(make_moderator(outbound).bulk_ban(['a', 'b', 'c', 'd']))
+    assert list(report.results) == ['a', 'b', 'c', 'd']
+    assert report.succeeded == ['a', 'd']
+    failed = {result.username: result for result in report.failed}
+    assert (failed['b'].status_code, failed['b'].error) == (403, 'Status Code: 403')
+    assert failed['c'].status_code is None
+    assert failed['c'].error == "OSError('connection reset')"
+    assert 'succeeded=2, failed=2, duplicates=0' in repr(report)
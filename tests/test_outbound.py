@@ -0,0 +1,153 @@
+import asyncio
+import time
+
+from types import SimpleNamespace
+
+from kickbot.kick_outbound import OutboundQueue, PRIORITY_CHAT, PRIORITY_MODERATOR, PRIORITY_REPLY
+
+
+def response(status_code: int = 200, headers: dict = None):
+    return SimpleNamespace(status_code=status_code, headers=headers or {})
+
+
+class Recorder:
+    """
+    Send functions recording the order (and time) requests are sent in.
+    """
+    def __init__(self) -> None:
+        self.sent: list[tuple[str, float]] = []
+
+    def send(self, name: str, status_code: int = 200):
+        async def send():
+            self.sent.append((name, time.monotonic()))
+            return response(status_code)
+        return send
+
+    async def send_text(self, text: str):
+        self.sent.append((text, time.monotonic()))
+        return response()
+
+    @property
+    def names(self) -> list[str]:
+        return [name for name, _ in self.sent]
+
+
+def test_lanes_sent_in_priority_order():
+    async def main():
+        queue = OutboundQueue(rate=100, burst=10)
+        recorder = Recorder()
+        await asyncio.gather(
+            queue.submit(recorder.send('chat'), PRIORITY_CHAT),
+            queue.submit(recorder.send('reply'), PRIORITY_REPLY),
+            queue.submit(recorder.send('ban'), PRIORITY_MODERATOR),
+        )
+        return recorder.names
+
+    assert asyncio.run(main()) == ['ban', 'reply', 'chat']
+
+
+def test_moderator_lane_not_blocked_by_chat_bucket():
+    async def main():
+        queue = OutboundQueue(rate=1, burst=1)
+        recorder = Recorder()
+        first = asyncio.ensure_future(queue.submit(recorder.send('chat 1')))
+        second = asyncio.ensure_future(queue.submit(recorder.send('chat 2')))
+        await asyncio.sleep(0.05)
+        start = time.monotonic()
+        await queue.submit(recorder.send('ban'), PRIORITY_MODERATOR)
+        ban_seconds = time.monotonic() - start
+        await asyncio.gather(first, second)
+        return recorder.names, ban_seconds
+
+    names, ban_seconds = asyncio.run(main())
+    assert names == ['chat 1', 'ban', 'chat 2']
+    assert ban_seconds < 0.5
+
+
+def test_token_bucket_paces_requests():
+    async def main():
+        queue = OutboundQueue(rate=20, burst=2)
+        recorder = Recorder()
+        start = time.monotonic()
+        await asyncio.gather(*(queue.submit(recorder.send(str(i))) for i in range(6)))
+        return [sent_at - start for _, sent_at in recorder.sent]
+
+    times = asyncio.run(main())
+    # 2 requests of burst, then one every 1 / 20 seconds
+    assert times[1] < 0.03
+    assert times[-1] >= 0.18
+    assert all(later - earlier >= 0.04 for earlier, later in zip(times[1:], times[2:]))
+
+
+def test_rate_limited_request_is_retried_first():
+    async def main():
+        queue = OutboundQueue(rate=100, burst=10)
+        sent = []
+        responses = [response(429, {'Retry-After': '0.2'}), response(200)]
+
+        async def limited():
+            sent.append(('limited', time.monotonic()))
+            return responses.pop(0)
+
+        async def other():
+            sent.append(('other', time.monotonic()))
+            return response(200)
+
+        start = time.monotonic()
+        first = asyncio.ensure_future(queue.submit(limited))
+        await asyncio.sleep(0.05)
+        second = asyncio.ensure_future(queue.submit(other))
+        results = await asyncio.gather(first, second)
+        return [name for name, _ in sent], [sent_at - start for _, sent_at in sent], results
+
+    names, times, results = asyncio.run(main())
+    assert names == ['limited', 'limited', 'other']
+    assert times[1] >= 0.19
+    assert [result.status_code for result in results] == [200, 200]
+
+
+def test_rate_limited_request_gives_up_after_max_retries():
+    async def main():
+        queue = OutboundQueue(rate=100, burst=10, max_retries=2)
+        calls = []
+
+        async def limited():
+            calls.append(1)
+            return response(429, {'Retry-After': '0'})
+
+        return await queue.submit(limited), len(calls)
+
+    result, calls = asyncio.run(main())
+    assert result.status_code == 429
+    assert calls == 3
+
+
+def test_messages_queued_while_waiting_are_coalesced():
+    async def main():
+        queue = OutboundQueue(rate=2, burst=1, coalesce=True)
+        recorder = Recorder()
+        first = asyncio.ensure_future(queue.submit_text('one', recorder.send_text, key=1))
+        await asyncio.sleep(0.01)
+        second = asyncio.ensure_future(queue.submit_text('two', recorder.send_text, key=1))
+        await asyncio.sleep(0.1)
+        # Queued while the chat lane waits for a token, merged into the waiting message
+        third = asyncio.ensure_future(queue.submit_text('three', recorder.send_text, key=1))
+        await asyncio.gather(first, second, third)
+        return recorder.names
+
+    assert asyncio.run(main()) == ['one', 'two three']
+
+
+def test_coalescing_merges_consecutive_messages_of_a_key():
+    async def main():
+        queue = OutboundQueue(rate=1, burst=1, coalesce=True, max_message_length=12)
+        recorder = Recorder()
+        first = asyncio.ensure_future(queue.submit_text('one', recorder.send_text, key=1))
+        await asyncio.sleep(0.01)
+        results = await asyncio.gather(first, *(queue.submit_text(text, recorder.send_text, key=1)
+                                                for text in ('two', 'three', 'four')))
+        return recorder.names, results
+
+    names, results = asyncio.run(main())
+    assert names == ['one', 'two three', 'four']
+    assert results[1] is results[2]
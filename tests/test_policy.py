@@ -0,0 +1,46 @@
+import json
+import os
+
+from types import SimpleNamespace
+
+from kickbot.kick_policy import ChatPolicy, REJECT_FOLLOWERS_ONLY, REJECT_LINKS
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), os.pardir, 'examples')
+
+
+def load_example(name: str) -> dict:
+    with open(os.path.join(EXAMPLES, name), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def make_policy(chatroom_settings: dict, bot_settings: dict = None) -> ChatPolicy:
+    channel = SimpleNamespace(streamer_name='streamer', chatroom_settings=chatroom_settings,
+                              bot_settings=bot_settings or {}, is_mod=False, is_super_admin=False)
+    policy = ChatPolicy(channel)
+    policy.refresh()
+    return policy
+
+
+def test_reads_example_chatroom_settings():
+    policy = make_policy(load_example('chatroom_settings_example.json'))
+    assert policy.links_enabled is False
+    assert policy.slow_mode_interval == 0
+    assert policy.rejection("see https://example.com") == REJECT_LINKS
+    assert policy.rejection("hello") is None
+
+
+def test_reads_following_min_duration():
+    settings = {**load_example('chatroom_settings_example.json'), 'followers_mode': True,
+                'following_min_duration': 10}
+    policy = make_policy(settings, {'is_following': True, 'following_since': '2999-01-01T00:00:00Z'})
+    assert policy.followers_min_minutes == 10
+    assert policy.rejection("hello") == REJECT_FOLLOWERS_ONLY
+
+
+def test_chatroom_updated_event_keys():
+    policy = make_policy(load_example('chatroom_settings_example.json'))
+    policy.update({'id': 1, 'followers_mode': {'enabled': True, 'min_duration': 30},
+                   'slow_mode': {'enabled': True, 'message_interval': 6}})
+    assert policy.followers_only is True
+    assert policy.followers_min_minutes == 30
+    assert policy.slow_mode_interval == 6
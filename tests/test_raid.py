@@ -0,0 +1,90 @@
+import random
+
+from kickbot.kick_raid import RaidDetector, RAID_DUPLICATES, RAID_MESSAGE_RATE, RAID_NEW_CHATTERS, content_bands
+
+_rng = random.Random(0)
+WORDS = [''.join(_rng.choices('abcdefghijklmnopqrstuvwxyz', k=_rng.randint(3, 8))) for _ in range(2000)]
+
+
+def ordinary_chat(detector: RaidDetector, start: float, seconds: int, users: int = 50, seed: int = 1) -> list:
+    """
+    One message per second from a group of regulars, each a different sentence.
+    """
+    rng = random.Random(seed)
+    events = []
+    for second in range(seconds):
+        content = ' '.join(rng.choices(WORDS, k=6))
+        events += detector.process('streamer', f'regular{rng.randrange(users)}', content, now=start + second)
+    return events
+
+
+def raid(detector: RaidDetector, start: float, chatters: int = 60, per_second: int = 12) -> list:
+    """
+    New chatters posting variations of the same raid message.
+    """
+    events = []
+    for i in range(chatters):
+        content = f'RAID {"!" * (i % 3)} from BigStreamer [emote:{i}:wave] let\'s go{" x" if i % 2 else ""}'
+        events += detector.process('streamer', f'raider{i}', content, now=start + i / per_second)
+    return events
+
+
+def test_content_bands_ignore_emotes_case_and_punctuation():
+    assert content_bands('Hello there, World! [emote:123:wave]') == content_bands('hello   THERE world')
+    assert content_bands('hello there world') != content_bands('something else entirely')
+    assert content_bands('hi :)') is None
+
+
+def test_ordinary_chat_fires_nothing():
+    detector = RaidDetector(warmup=60)
+    assert ordinary_chat(detector, start=0, seconds=600) == []
+    assert 0.8 < detector.baseline_rate < 1.2
+
+
+def test_raid_fires_each_event_once():
+    detector = RaidDetector(warmup=60)
+    ordinary_chat(detector, start=0, seconds=300)
+    events = raid(detector, start=300)
+    assert sorted(event.kind for event in events) == [RAID_DUPLICATES, RAID_MESSAGE_RATE, RAID_NEW_CHATTERS]
+    by_kind = {event.kind: event for event in events}
+    assert all(name.startswith('raider') for name in by_kind[RAID_NEW_CHATTERS].usernames)
+    assert all(name.startswith('raider') for name in by_kind[RAID_DUPLICATES].usernames)
+    assert by_kind[RAID_MESSAGE_RATE].usernames == []
+    assert all(event.streamer == 'streamer' for event in events)
+
+
+def test_raid_during_warmup_only_fires_duplicates():
+    detector = RaidDetector(warmup=60)
+    events = raid(detector, start=0)
+    assert [event.kind for event in events] == [RAID_DUPLICATES]
+
+
+def test_event_fires_again_after_dropping_below_threshold():
+    detector = RaidDetector(warmup=60)
+    ordinary_chat(detector, start=0, seconds=300)
+    assert raid(detector, start=300)
+    assert ordinary_chat(detector, start=320, seconds=60, seed=2) == []
+    # The raiders aren't new chatters any more, so only the duplicates and the rate fire
+    events = raid(detector, start=400)
+    assert sorted(event.kind for event in events) == [RAID_DUPLICATES, RAID_MESSAGE_RATE]
+
+
+def test_memory_is_bounded():
+    detector = RaidDetector(window=60, max_messages=100, max_chatters=50)
+    rng = random.Random(3)
+    for i in range(20_000):
+        detector.process('streamer', f'user{i}', ' '.join(rng.choices(WORDS, k=4)), now=i / 1000)
+    assert len(detector._messages) == 100
+    assert len(detector._chatters) == 50
+    assert len(detector._band_counts) <= 100 * 4
+    assert detector._duplicates == sum(message.is_duplicate for message in detector._messages)
+    assert detector._new_chatters == sum(message.is_new for message in detector._messages)
+
+
+def test_window_expires_messages():
+    detector = RaidDetector(window=10)
+    raid(detector, start=0)
+    detector.process('streamer', 'late', 'nothing to see here', now=100)
+    assert len(detector._messages) == 1
+    assert detector._band_counts.keys() == set(content_bands('nothing to see here'))
+    assert detector._duplicates == 0
@@ -0,0 +1,97 @@
+import pytest
+
+from kickbot.constants import KickBotException
+from kickbot.kick_router import CommandRouter
+
+
+def handler(*args) -> None:
+    pass
+
+
+def triggers(router: CommandRouter, content: str) -> list[tuple[str, str]]:
+    return [(route.kind, route.trigger) for route in router.match(content)]
+
+
+def test_message_matches_whole_message_before_commands():
+    router = CommandRouter()
+    router.add_message('Hello World', handler)
+    router.add_command('hello', handler)
+    assert triggers(router, 'hello world') == [('message', 'hello world')]
+    assert triggers(router, 'HELLO there') == [('command', 'hello')]
+    assert triggers(router, 'say hello') == []
+
+
+def test_command_aliases():
+    router = CommandRouter()
+    router.add_command('!time', handler, aliases=['!t'])
+    assert triggers(router, '!T now') == [('command', '!t')]
+    with pytest.raises(KickBotException):
+        router.add_command('!clock', handler, aliases=['!time'])
+
+
+def test_every_matching_prefix_and_keyword():
+    router = CommandRouter()
+    router.add_prefix('!so', handler)
+    router.add_prefix('!so @', handler)
+    router.add_keyword('free', handler)
+    router.add_keyword('free followers', handler)
+    router.add_keyword('followers', handler)
+    assert triggers(router, '!SO @streamer free followers') == [
+        ('prefix', '!so'), ('prefix', '!so @'),
+        ('keyword', 'free'), ('keyword', 'free followers'), ('keyword', 'followers'),
+    ]
+    assert triggers(router, 'nothing here') == []
+
+
+def test_overlapping_regex_patterns_all_match():
+    router = CommandRouter()
+    router.add_regex(r'https?://\S+', handler)
+    router.add_regex(r'discord\.gg', handler)
+    router.add_regex(r'\bABC\b', handler)
+    assert triggers(router, 'see https://discord.gg/abc') == [
+        ('regex', r'https?://\S+'), ('regex', r'discord\.gg'), ('regex', r'\bABC\b'),
+    ]
+    assert triggers(router, 'no links') == []
+
+
+def test_regex_patterns_with_groups():
+    router = CommandRouter()
+    router.add_regex(r'(?P<x>foo)', handler)
+    router.add_regex(r'(?P<x>bar)', handler)
+    router.add_regex(r'(\w)\1{3}', handler)
+    router.add_regex(r'(?i)spam', handler)
+    assert triggers(router, 'foo bar') == [('regex', '(?P<x>foo)'), ('regex', '(?P<x>bar)')]
+    assert triggers(router, 'aaaa SPAM') == [('regex', r'(\w)\1{3}'), ('regex', '(?i)spam')]
+    assert triggers(router, 'abab') == []
+
+
+def test_invalid_regex_is_rejected():
+    router = CommandRouter()
+    with pytest.raises(KickBotException):
+        router.add_regex('(unclosed', handler)
+
+
+def test_overlapping_globs_all_match():
+    router = CommandRouter()
+    router.add_glob('*a*', handler)
+    router.add_glob('*b*', handler)
+    router.add_glob('a?', handler)
+    assert triggers(router, 'AB') == [('glob', '*a*'), ('glob', '*b*'), ('glob', 'a?')]
+    assert triggers(router, 'abc') == [('glob', '*a*'), ('glob', '*b*')]
+    assert triggers(router, 'xyz') == []
+
+
+def test_triggers_added_after_matching():
+    router = CommandRouter()
+    router.add_regex('one', handler)
+    assert triggers(router, 'one two') == [('regex', 'one')]
+    router.add_regex('two', handler)
+    router.add_glob('*two', handler)
+    assert triggers(router, 'one two') == [('regex', 'one'), ('regex', 'two'), ('glob', '*two')]
+
+
+def test_duplicate_trigger_is_rejected():
+    router = CommandRouter()
+    router.add_keyword('Spam', handler)
+    with pytest.raises(KickBotException):
+        router.add_keyword('spam', handler)
@@ -0,0 +1,132 @@
+import asyncio
+
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from kickbot import kick_scheduler
+from kickbot.constants import KickBotException
+from kickbot.kick_scheduler import CronSpec, Scheduler
+
+
+class WallClock(datetime):
+    """
+    datetime whose now() returns a settable time.
+    """
+    current = datetime(2024, 1, 1, 12, 0, 30)
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.current
+
+
+@pytest.fixture
+def wall_clock(monkeypatch):
+    monkeypatch.setattr(kick_scheduler, 'datetime', WallClock)
+    WallClock.current = datetime(2024, 1, 1, 12, 0, 30)
+    return WallClock
+
+
+async def noop(bot) -> None:
+    pass
+
+
+def test_cron_fields():
+    spec = CronSpec('*/15 9-17/4 1,15 * 1-5')
+    assert spec.minutes == {0, 15, 30, 45}
+    assert spec.hours == {9, 13, 17}
+    assert spec.days == {1, 15}
+    assert spec.months == set(range(1, 13))
+    assert spec.weekdays == {1, 2, 3, 4, 5}
+    assert CronSpec('0 0 * * 7').weekdays == {0}
+    assert CronSpec('5/20 * * * *').minutes == {5, 25, 45}
+
+
+@pytest.mark.parametrize('spec', ['* * * *', '60 * * * *', '* 24 * * *', '0 0 0 * *', '*/0 * * * *',
+                                  '5-1 * * * *', 'a * * * *', '0 0 30 2 *'])
+def test_invalid_cron_specs(spec):
+    with pytest.raises(KickBotException):
+        CronSpec(spec).next_after(datetime(2024, 1, 1))
+
+
+def test_cron_next_after():
+    after = datetime(2024, 1, 31, 23, 59, 30)
+    assert CronSpec('* * * * *').next_after(after) == datetime(2024, 2, 1, 0, 0)
+    assert CronSpec('30 8 * * *').next_after(after) == datetime(2024, 2, 1, 8, 30)
+    assert CronSpec('0 0 1 1 *').next_after(after) == datetime(2025, 1, 1, 0, 0)
+    assert CronSpec('0 0 29 2 *').next_after(after) == datetime(2024, 2, 29, 0, 0)
+    # 2024-02-01 is a thursday: when both are restricted either day matches
+    assert CronSpec('0 0 * * 6').next_after(after) == datetime(2024, 2, 3, 0, 0)
+    assert CronSpec('0 0 15 * 6').next_after(after) == datetime(2024, 2, 3, 0, 0)
+    assert CronSpec('0 0 15 * *').next_after(after) == datetime(2024, 2, 15, 0, 0)
+
+
+def test_events_ordered_before_start(wall_clock):
+    scheduler = Scheduler(bot=None)
+    hourly = scheduler.add_cron('0 * * * *', noop)
+    slow = scheduler.add_interval(600, noop)
+    fast = scheduler.add_interval(60, noop)
+    assert scheduler.events() == [fast, slow, hourly]
+    assert fast.next_run == datetime(2024, 1, 1, 12, 1, 30)
+    assert hourly.next_run == datetime(2024, 1, 1, 13, 0)
+
+
+def test_cron_minute_that_ran_is_not_run_again(wall_clock):
+    scheduler = Scheduler(bot=None)
+    scheduler._loop = SimpleNamespace(time=lambda: 0.0)
+    scheduler._wakeup = asyncio.Event()
+    event = scheduler.add_cron('* * * * *', noop)
+    assert event._base == 30
+    # The timer fires just before the wall clock reaches 12:01
+    wall_clock.current = datetime(2024, 1, 1, 12, 0, 59, 999000)
+    scheduler._schedule_next(event, 29.999)
+    assert event._cron_due == datetime(2024, 1, 1, 12, 2)
+    assert event._base == pytest.approx(90)
+    # The clock is set back after the 12:02 run
+    wall_clock.current = datetime(2024, 1, 1, 12, 1, 30)
+    scheduler._schedule_next(event, 90)
+    assert event._cron_due == datetime(2024, 1, 1, 12, 3)
+
+
+def test_interval_events_run_until_cancelled():
+    async def main():
+        scheduler = Scheduler(bot='bot')
+        calls = []
+
+        async def record(bot) -> None:
+            calls.append(bot)
+
+        event = scheduler.add_interval(0.02, record)
+        task = asyncio.ensure_future(scheduler.run())
+        await asyncio.sleep(0.11)
+        scheduler.cancel(event)
+        runs = len(calls)
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return calls, runs, scheduler
+
+    calls, runs, scheduler = asyncio.run(main())
+    assert 4 <= runs <= 5
+    assert len(calls) == runs
+    assert set(calls) == {'bot'}
+    assert scheduler.events() == []
+
+
+def test_run_is_skipped_while_previous_run_is_going():
+    async def main():
+        scheduler = Scheduler(bot=None)
+
+        async def slow(bot) -> None:
+            await asyncio.sleep(0.05)
+
+        event = scheduler.add_interval(0.02, slow)
+        task = asyncio.ensure_future(scheduler.run())
+        await asyncio.sleep(0.13)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return event.runs
+
+    # Due at 0.02, 0.04, ... 0.12 but each run takes 0.05
+    assert 2 <= asyncio.run(main()) <= 3